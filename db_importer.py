@@ -6,178 +6,1372 @@ django.setup()
 
 import time
 import gzip
+import io
+import re
 import csv
+import json
+import resource
+import tempfile
 import sqlite3
+import argparse
+import multiprocessing
+import uuid
 import pandas as pd
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
 
 from django.conf import settings
 from django.db.models import NOT_PROVIDED
 
-from main.models import CancerType, Variant
-from main.utils import get_worst_csq_term
-
-# VCF cancer patient count INFO field prefixes and their respective 
-# VariantCancerTypePatientCount model field names
-CANCER_PC_PREFIXES = {
-    'SameNucleotideChange': 'same_nucleotide_change_pc',
-    'SameAminoAcidChange': 'same_amino_acid_change_pc',
-    'SameOrDownstreamTruncatingVariantsPerAA': \
-        'same_or_downstream_truncating_variants_per_aa_pc',
-    'NestedInframeDeletionsPerAA': 'nested_inframe_deletions_per_aa_pc',
+from main.cache import clear_result_cache
+from main.column_index import remove_old_column_indexes, write_column_index
+from main.dataset import get_import_report_path
+from main.lookups import SHARD_ID_STRIDE
+from main.models import VARIANT_INTERVAL_TABLE, Variant
+from main.utils import (
+    CHROMOSOMES, VEP_CSQ_TERMS, format_hgvs, get_allele_type, get_consequence_category,
+    get_chrom_index_sql, get_variant_end_pos, get_worst_csq_term,
+    pack_cancer_type_pcs
+)
+from main.vcf import (
+    CANCER_PC_PREFIXES, VcfInfoParser, read_vcf_header, read_vcf_info_ids,
+    split_vcf_by_chrom
+)
+
+# Number of VCF variants inserted to the database in one transaction
+# (and parsed by one worker process in the parallel import mode).
+BATCH_SIZE = 10000
+
+# VCF INFO parser used by parse_vcf_lines, whether patient counts are
+# packed into the variant rows, and the arguments they were set from.
+# Set by _init_vcf_parser in the main and worker processes.
+_INFO_PARSER = None
+_PACKED_COUNTS = False
+_INFO_PARSER_ARGS = ()
+
+# "id", "chrom", "pos", "ref", and "alt" variant model fields
+#  are populated from non-INFO VCF fields, display fields, search fields
+#  and packed patient counts are derived from the VCF data and only fields
+#  populated from the VCF INFO column have help text (see Variant
+#  model docstring).
+VARIANT_INFO_FIELDS = [
+    f for f in Variant._meta.concrete_fields
+    if f.help_text
+]
+# Variant and variant cancer type patient count table columns in the
+# same order as the values in the rows built by parse_vcf_lines.
+VARIANT_COLUMNS = ['id', 'chrom', 'pos', 'ref', 'alt'] + \
+    [f.attname for f in VARIANT_INFO_FIELDS] + \
+    list(Variant.DISPLAY_FIELDS) + list(Variant.SEARCH_FIELDS) + \
+    ['cancer_type_counts']
+CANCER_PC_COLUMNS = ['id', 'variant_id', 'cancer_type_id'] + \
+    list(CANCER_PC_PREFIXES.values())
+
+# Tables that are repopulated by the importer. The rest of the database
+# tables (e.g. Django migrations) are copied to a shadow database as is.
+IMPORTED_TABLES = (
+    'main_variant',
+    'main_variant_cancer_type_patient_count',
+    'main_cancer_type',
+    'main_dataset_metadata',
+    'main_gene_alias',
+    VARIANT_INTERVAL_TABLE,
+)
+
+# Dataset metadata key of the import checkpoint. It is written in the
+# same transaction as each batch of variants and deleted together with
+# the rest of the metadata when the import is completed.
+CHECKPOINT_KEY = 'import_checkpoint'
+
+# Tables stored in every chromosome shard database (see --sharded).
+# Cancer types are copied to the shards, so patient counts can be
+# joined with them in the shard.
+SHARD_TABLES = (
+    'main_cancer_type',
+    'main_variant',
+    'main_variant_cancer_type_patient_count',
+    VARIANT_INTERVAL_TABLE,
+)
+
+# Tables whose secondary indexes are dropped during a bulk load and
+# rebuilt once all rows are inserted.
+BULK_LOAD_TABLES = (
+    'main_variant',
+    'main_variant_cancer_type_patient_count',
+)
+# Connection settings used during a bulk load. The rollback journal is
+# kept in memory and writes are not synced to disk, so the database
+# must be re-imported if the import is interrupted.
+BULK_LOAD_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    # Negative value is the page cache size in KiB (256 MiB).
+    'cache_size': -262144,
+}
+# Default SQLite settings restored after a bulk load.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'temp_store': 'DEFAULT',
+    'cache_size': -2000,
 }
-# A dict template for VariantCancerTypePatientCount row data without
-# variant and cancer foreign keys. Ensures that the order of column
-# names and values in SQL queries are in the same order.
-CANCER_PC_DICT = dict.fromkeys(CANCER_PC_PREFIXES.values(), 0)
 
 
-def get_db() -> sqlite3.Connection:
+class ImportReport:
+    """
+    Collect import instrumentation and write it as a JSON report, e.g.
+
+        report = ImportReport()
+        with report('Import variants'):
+            import_vcf_variants(db, report=report)
+        report.print_report()
+        report.write(path)
+
+    Phase times are wall-clock times of the reset_db steps. Stage times
+    split the VCF import into decompression, parsing, row building and
+    SQLite insert time. Parsing and row building times are summed over
+    the worker processes, so they can exceed the wall-clock time.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.stages = dict.fromkeys(
+            ('decompress', 'parse', 'build_rows', 'insert'), 0.0)
+        self.vcf_bytes = 0
+        self.vcf_compressed_bytes = 0
+        self.rows = 0
+        self.samples = []
+        self._last_sample = (self.start, 0, 0, 0)
+
+    @contextmanager
+    def __call__(self, name: str):
+        """Time the code block and add its time to the phase total."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (self.phases.get(name, 0)
+                + time.perf_counter() - start)
+
+    def add_stage_times(self, **seconds) -> None:
+        """Add seconds to the VCF import stage totals."""
+        for stage, value in seconds.items():
+            self.stages[stage] += value
+
+    def sample(self, rows: int) -> None:
+        """
+        Record throughput since the previous sample after a batch of
+        variant rows has been inserted.
+
+        Parameters
+        ----------
+        rows : int
+            Number of inserted variant rows in the batch.
+
+        Returns
+        -------
+        None
+        """
+        self.rows += rows
+        now = time.perf_counter()
+        last_time, last_rows, last_bytes, last_compressed = self._last_sample
+        interval = (now - last_time) or 1e-9
+        self.samples.append({
+            'elapsed_seconds': round(now - self.start, 3),
+            'rows': self.rows,
+            'rows_per_second': round((self.rows - last_rows) / interval, 1),
+            'bytes_per_second': round(
+                (self.vcf_bytes - last_bytes) / interval, 1),
+            'compressed_bytes_per_second': round(
+                (self.vcf_compressed_bytes - last_compressed) / interval, 1),
+        })
+        self._last_sample = (now, self.rows, self.vcf_bytes,
+                             self.vcf_compressed_bytes)
+
+    def print_report(self) -> None:
+        """Print time of each phase and stage in the order they were started."""
+        print('Import phase times:')
+        for name, seconds in self.phases.items():
+            print(f'  {name}: {seconds:.2f} seconds')
+        if self.rows:
+            print('VCF import stage times:')
+            for name, seconds in self.stages.items():
+                print(f'  {name}: {seconds:.2f} seconds')
+        print(f'Peak memory: {get_peak_rss_mb():.1f} MB')
+
+    def write(self, path, db, **details) -> dict:
+        """
+        Write the report as JSON.
+
+        Parameters
+        ----------
+        path : str or Path
+            Report file path.
+        db : sqlite3.Connection
+            Imported database used to count the table rows and to get
+            the dataset metadata.
+        **details
+            Additional report items, e.g. import options.
+
+        Returns
+        -------
+        dict
+            The written report.
+        """
+        total_seconds = time.perf_counter() - self.start
+        report = {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now(timezone.utc).isoformat(
+                timespec='seconds'),
+            **dict(db.execute(
+                'SELECT key, value FROM main_dataset_metadata')),
+            **details,
+            'total_seconds': round(total_seconds, 3),
+            'peak_rss_mb': round(get_peak_rss_mb(), 1),
+            'vcf_bytes': self.vcf_bytes,
+            'vcf_compressed_bytes': self.vcf_compressed_bytes,
+            'rows_per_second': round(self.rows / total_seconds, 1),
+            'phase_seconds': {
+                name: round(seconds, 3) for name, seconds in self.phases.items()
+            },
+            'stage_seconds': {
+                name: round(seconds, 3) for name, seconds in self.stages.items()
+            },
+            'table_rows': {
+                table: db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in IMPORTED_TABLES
+            },
+            'throughput_samples': self.samples,
+        }
+        # Write the report to a temporary file first, so readers never
+        # see a partially written report.
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps(report, indent=2) + '\n')
+        os.replace(tmp_path, path)
+        return report
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Get peak resident set size of the current process and of its largest
+    finished child process (e.g. VCF parser workers) in MB.
+
+    Returns
+    -------
+    float
+    """
+    # ru_maxrss is in kilobytes on Linux (and in bytes on macOS).
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / scale
+
+
+def get_db(db_path=None) -> sqlite3.Connection:
+    """
+    Get SQLite DB connection or exit with error.
+
+    Parameters
+    ----------
+    db_path: str or Path, optional
+        Database file path. Defaults to the Django default database.
+    
+    Returns
+    -------
+    sqlite3.Connection        
+    """
+    if db_path is None:
+        db_path = settings.DATABASES['default']['NAME']
+    try:
+        return sqlite3.connect(db_path)
+    except sqlite3.Error as e:
+        sys.exit(f'Failed to connect to database: {e}')
+
+
+def get_shadow_db_path(db_path) -> Path:
+    """
+    Get the path of the shadow database that is built next to the live
+    database and then swapped in.
+
+    Parameters
+    ----------
+    db_path: str or Path
+        Live database file path.
+
+    Returns
+    -------
+    Path
+    """
+    db_path = Path(db_path)
+    return db_path.with_name(f'{db_path.name}.shadow')
+
+
+def is_virtual_shadow_table(name: str, schema: list) -> bool:
+    """
+    Check if a table stores the data of a virtual table (e.g. the
+    "_node", "_parent" and "_rowid" tables of an R*Tree). These tables
+    are created by SQLite together with their virtual table.
+
+    Parameters
+    ----------
+    name: str
+        Table name.
+    schema: list
+        (type, name, sql) tuples of the database sqlite_master objects.
+
+    Returns
+    -------
+    bool
+    """
+    return any(
+        sql.upper().startswith('CREATE VIRTUAL TABLE')
+        and name.startswith(f'{table_name}_')
+        for obj_type, table_name, sql in schema if obj_type == 'table'
+    )
+
+
+def create_shadow_db(db_path, copy_data: bool = False) -> sqlite3.Connection:
+    """
+    Create an empty shadow database with the same schema as the live
+    database. All tables that are not repopulated by the importer
+    (e.g. Django migrations) are copied with their data.
+
+    Parameters
+    ----------
+    db_path: str or Path
+        Live database file path.
+    copy_data: bool
+        Copy all tables data including the imported tables (e.g. to
+        apply VCF changes to a copy of the live database).
+
+    Returns
+    -------
+    sqlite3.Connection
+        Shadow database connection.
+    """
+    if not Path(db_path).is_file():
+        sys.exit(f'Live database was not found: {db_path}\n'
+                 'Please run "python manage.py migrate" first.')
+
+    shadow_path = get_shadow_db_path(db_path)
+    # Remove leftovers of a previous failed import.
+    for path in (shadow_path, Path(f'{shadow_path}-journal')):
+        path.unlink(missing_ok=True)
+
+    db = get_db(shadow_path)
+    if copy_data:
+        live_db = get_db(db_path)
+        live_db.backup(db)
+        live_db.close()
+        return db
+
+    cur = db.cursor()
+    cur.execute('ATTACH DATABASE ? AS live', (str(db_path),))
+    # Create tables before indexes. SQLite internal objects (e.g.
+    # sqlite_sequence) are created and populated automatically.
+    schema = cur.execute(
+        "SELECT type, name, sql FROM live.sqlite_master "
+        "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY type = 'table' DESC, rowid"
+    ).fetchall()
+    schema = [(obj_type, name, sql) for obj_type, name, sql in schema
+              if obj_type != 'table'
+              or not is_virtual_shadow_table(name, schema)]
+    for obj_type, name, sql in schema:
+        cur.execute(sql)
+    for obj_type, name, sql in schema:
+        if obj_type == 'table' and name not in IMPORTED_TABLES:
+            cur.execute(f'INSERT INTO main."{name}" SELECT * FROM live."{name}"')
+    db.commit()
+    cur.execute('DETACH DATABASE live')
+    return db
+
+
+def create_shard_db(db_path, shard_path) -> sqlite3.Connection:
+    """
+    Create a chromosome shard database with the SHARD_TABLES schema of
+    the default database and a copy of its cancer types.
+
+    Parameters
+    ----------
+    db_path: str or Path
+        Default database file path.
+    shard_path: Path
+        Shard database file path.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Shard database connection.
+    """
+    for path in (shard_path, Path(f'{shard_path}-journal')):
+        path.unlink(missing_ok=True)
+    shard_path.parent.mkdir(parents=True, exist_ok=True)
+
+    db = get_db(shard_path)
+    cur = db.cursor()
+    cur.execute('ATTACH DATABASE ? AS default_db', (str(db_path),))
+    schema = cur.execute(
+        "SELECT sql FROM default_db.sqlite_master WHERE sql IS NOT NULL "
+        f"AND tbl_name IN ({', '.join(['?'] * len(SHARD_TABLES))}) "
+        "ORDER BY type = 'table' DESC, rowid",
+        SHARD_TABLES
+    ).fetchall()
+    for sql, in schema:
+        cur.execute(sql)
+    cur.execute('INSERT INTO main.main_cancer_type '
+                'SELECT * FROM default_db.main_cancer_type')
+    db.commit()
+    cur.execute('DETACH DATABASE default_db')
+    return db
+
+
+def open_shadow_db(db_path) -> sqlite3.Connection:
+    """
+    Open the shadow database of an interrupted import or exit with error.
+
+    Parameters
+    ----------
+    db_path: str or Path
+        Live database file path.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Shadow database connection.
+    """
+    shadow_path = get_shadow_db_path(db_path)
+    if not shadow_path.is_file():
+        sys.exit(f'Shadow database was not found: {shadow_path}\n'
+                 'Please re-run the script without --resume.')
+    return get_db(shadow_path)
+
+
+def validate_db(db) -> None:
+    """
+    Check that a newly built database is consistent and populated or
+    exit with error.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
+    Returns
+    -------
+    None
+    """
+    cur = db.cursor()
+    integrity = cur.execute('PRAGMA quick_check').fetchone()[0]
+    if integrity != 'ok':
+        sys.exit(f'Database integrity check failed: {integrity}')
+    if cur.execute('PRAGMA foreign_key_check').fetchone():
+        sys.exit('Database foreign key check failed.')
+    for table_name in ('main_cancer_type', 'main_variant'):
+        if not cur.execute(f'SELECT 1 FROM {table_name} LIMIT 1').fetchone():
+            sys.exit(f'Database validation failed: {table_name} is empty.')
+    # Variants of tables remade by migrations lose their triggers.
+    variant_count, = cur.execute('SELECT COUNT(*) FROM main_variant').fetchone()
+    interval_count, = cur.execute(
+        f'SELECT COUNT(*) FROM {VARIANT_INTERVAL_TABLE}').fetchone()
+    if interval_count != variant_count:
+        sys.exit('Database validation failed: the variant interval index '
+                 f'has {interval_count} rows for {variant_count} variants.')
+
+
+def swap_db(shadow_path, db_path) -> None:
+    """
+    Atomically replace the live database with the shadow database.
+    Running web workers keep reading the old file until they reconnect
+    at the start of their next request.
+
+    Parameters
+    ----------
+    shadow_path: str or Path
+        Shadow database file path.
+    db_path: str or Path
+        Live database file path.
+
+    Returns
+    -------
+    None
+    """
+    check_swappable(shadow_path, db_path)
+    os.replace(shadow_path, db_path)
+
+
+def check_swappable(shadow_path, db_path) -> None:
+    """
+    Check that the live database can be replaced with the shadow
+    database or exit with error.
+
+    Parameters
+    ----------
+    shadow_path: str or Path
+        Shadow database file path.
+    db_path: str or Path
+        Live database file path.
+
+    Returns
+    -------
+    None
+    """
+    # A journal file of the live database would be applied to the new
+    # database by the next connection and corrupt it.
+    for suffix in ('-journal', '-wal'):
+        if Path(f'{db_path}{suffix}').exists():
+            sys.exit(f'Live database has an active "{suffix}" file; the '
+                     f'new database was left at {shadow_path}')
+
+
+def set_pragmas(db, pragmas: dict) -> None:
+    """
+    Apply SQLite connection settings.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+    pragmas: dict
+        PRAGMA names (keys) and values (values).
+
+    Returns
+    -------
+    None
+    """
+    db.commit()
+    for name, value in pragmas.items():
+        db.execute(f'PRAGMA {name} = {value}')
+
+
+def drop_secondary_indexes(db) -> list:
+    """
+    Drop all explicitly created indexes (including unique constraints
+    and foreign key indexes) and triggers (e.g. the variant interval
+    index triggers) of the bulk loaded tables.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
+    Returns
+    -------
+    list
+        SQL statements that recreate the dropped indexes and triggers.
+    """
+    indexes = db.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE type IN ('index', 'trigger') "
+        f"AND sql IS NOT NULL AND tbl_name IN "
+        f"({', '.join(['?'] * len(BULK_LOAD_TABLES))})",
+        BULK_LOAD_TABLES
+    ).fetchall()
+    for obj_type, name, sql in indexes:
+        db.execute(f'DROP {obj_type.upper()} "{name}"')
+    db.commit()
+    return [sql for obj_type, name, sql in indexes]
+
+
+def create_indexes(db, indexes_sql: list) -> None:
+    """
+    Create indexes and triggers dropped by drop_secondary_indexes or
+    exit with error (e.g. if the loaded data violates a unique
+    constraint). The variant interval index, which is not maintained
+    while its triggers are dropped, is rebuilt.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+    indexes_sql : list
+        SQL statements that create the indexes and triggers.
+
+    Returns
+    -------
+    None
+    """
+    try:
+        for sql in indexes_sql:
+            # Indexes may already exist if a previous run was interrupted
+            # while rebuilding them.
+            db.execute(re.sub(
+                r'^CREATE (UNIQUE INDEX|INDEX|TRIGGER) (?!IF NOT EXISTS )',
+                r'CREATE \1 IF NOT EXISTS ', sql))
+        if any(sql.startswith('CREATE TRIGGER') for sql in indexes_sql):
+            rebuild_variant_intervals(db)
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        sys.exit(f'Failed to rebuild database indexes: "{e}"')
+
+
+def rebuild_variant_intervals(db) -> None:
+    """
+    Repopulate the variant interval R*Tree (VARIANT_INTERVAL_TABLE) from
+    the variant table. Intervals are inserted in chromosome and position
+    order, which builds a more compact tree than unordered inserts.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
+    Returns
+    -------
+    None
+    """
+    chrom_index = get_chrom_index_sql('chrom')
+    db.execute(f'DELETE FROM {VARIANT_INTERVAL_TABLE}')
+    db.execute(
+        f'INSERT INTO {VARIANT_INTERVAL_TABLE} '
+        f'SELECT id, chrom_index, chrom_index, pos, end_pos FROM ('
+        f'SELECT id, {chrom_index} AS chrom_index, pos, '
+        'MAX(pos, end_pos) AS end_pos FROM main_variant) '
+        'ORDER BY chrom_index, pos'
+    )
+
+
+def truncate_table(db, table_name):
+    """
+    Delete all records in a table and reset the primary key counter.
+
+    Parameters
+    ----------
+    table_name: str
+        Name of the database table that has to be cleared.
+    
+    Returns
+    -------
+    None
+    """
+    cur = db.cursor()
+
+    # Safety: restrict to known tables only.
+    if table_name not in IMPORTED_TABLES:
+        sys.exit(f'Unsafe table name: {table_name}')
+
+    # Truncate table (DELETE without WHERE = TRUNCATE in SQLite).
+    cur.execute(f"DELETE FROM {table_name}")
+    # Reset table primary key.
+    cur.execute(f"DELETE FROM sqlite_sequence WHERE name='{table_name}'")
+    db.commit()
+
+
+def read_cancer_types_csv() -> list:
+    """
+    Read cancer types from cancer_types csv or exit with error.
+
+    Returns
+    -------
+    list
+        (display name, VCF name, is HaemOnc, is solid, total patient
+        count) tuples.
+    """
+    if not settings.GENIE_CANCER_TYPES_CSV.is_file():
+        sys.exit(('DB reset was cancelled; GENIE cancer types csv file '
+            'was not found:\n') + str(settings.GENIE_CANCER_TYPES_CSV))
+
+    df = pd.read_csv(settings.GENIE_CANCER_TYPES_CSV)
+
+    required_cols = {
+        'display_name',
+        'vcf_name',
+        'is_haemonc',
+        'is_solid',
+        'total_patient_count'
+    }
+    missing = required_cols - set(df.columns)
+    if missing:
+        sys.exit(f'Cancer types CSV missing columns: {", ".join(missing)}')
+
+    return df.apply(
+        lambda row: (
+            row['display_name'],
+            row['vcf_name'],
+            bool(int(row['is_haemonc'])),
+            bool(int(row['is_solid'])),
+            int(row['total_patient_count'])
+        ),
+        axis=1
+    ).tolist()
+
+
+def import_cancer_types(db) -> None:
+    """
+    Populate cancer types table from cancer_types csv.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
+    Returns
+    -------
+    None
+    """
+    cancer_types = read_cancer_types_csv()
+    truncate_table(db, 'main_cancer_type')
+
+    # Cancer types are inserted with the importer connection (not the
+    # Django ORM), so they are written to the shadow database if used.
+    db.executemany(
+        'INSERT INTO main_cancer_type (cancer_type, cancer_type_vcf, '
+        'is_haemonc, is_solid, total_patient_count) VALUES (?, ?, ?, ?, ?)',
+        cancer_types
+    )
+    db.commit()
+
+
+def sync_cancer_types(db) -> None:
+    """
+    Update existing cancer types (matched by their VCF names) and add
+    new cancer types from cancer_types csv without changing their ids.
+    Cancer types that are no longer in the csv are deleted by
+    diff_vcf_variants (see delete_stale_cancer_types).
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
+    Returns
+    -------
+    None
+    """
+    cur = db.cursor()
+    for display_name, vcf_name, is_haemonc, is_solid, total in \
+            read_cancer_types_csv():
+        cur.execute(
+            'UPDATE main_cancer_type SET cancer_type = ?, is_haemonc = ?, '
+            'is_solid = ?, total_patient_count = ? WHERE cancer_type_vcf = ?',
+            (display_name, is_haemonc, is_solid, total, vcf_name)
+        )
+        if not cur.rowcount:
+            cur.execute(
+                'INSERT INTO main_cancer_type (cancer_type, cancer_type_vcf, '
+                'is_haemonc, is_solid, total_patient_count) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (display_name, vcf_name, is_haemonc, is_solid, total)
+            )
+    db.commit()
+
+
+def delete_stale_cancer_types(cur) -> int:
+    """
+    Delete the cancer types that are no longer in cancer_types csv and
+    their variant cancer type patient counts (see sync_cancer_types).
+    Run by diff_vcf_variants in its transaction.
+
+    Parameters
+    ----------
+    cur: 
+        sqlite3.Cursor
+
+    Returns
+    -------
+    int
+        Number of deleted cancer types.
+    """
+    vcf_names = [row[1] for row in read_cancer_types_csv()]
+    stale_ids = ('SELECT id FROM main.main_cancer_type WHERE cancer_type_vcf '
+                 f'NOT IN ({", ".join(["?"] * len(vcf_names))})')
+    cur.execute('DELETE FROM main.main_variant_cancer_type_patient_count '
+                f'WHERE cancer_type_id IN ({stale_ids})', vcf_names)
+    cur.execute(f'DELETE FROM main.main_cancer_type WHERE id IN ({stale_ids})',
+                vcf_names)
+    return cur.rowcount
+
+
+def read_gene_aliases_tsv(gene_symbols: set) -> dict:
+    """
+    Read HGNC approved, previous and alias gene symbols of the variant
+    table gene symbols from the gene aliases TSV or exit with error.
+
+    Parameters
+    ----------
+    gene_symbols : set
+        Upper-cased gene symbols used in the variant table.
+
+    Returns
+    -------
+    dict
+        Upper-cased aliases (keys) and the variant table gene symbols
+        they resolve to (values). Aliases that are variant table gene
+        symbols themselves or resolve to several gene symbols with the
+        same priority (approved symbol, previous symbol, alias symbol)
+        are left out.
+    """
+    if not settings.GENE_ALIASES_TSV.is_file():
+        sys.exit(('DB reset was cancelled; gene aliases TSV file was not '
+            'found:\n') + str(settings.GENE_ALIASES_TSV))
+
+    df = pd.read_csv(settings.GENE_ALIASES_TSV, sep='\t', dtype=str,
+                     keep_default_na=False)
+    required_cols = {'symbol', 'prev_symbol', 'alias_symbol'}
+    missing = required_cols - set(df.columns)
+    if missing:
+        sys.exit(f'Gene aliases TSV missing columns: {", ".join(missing)}')
+
+    # Aliases (keys) and {priority: gene symbols} (values).
+    candidates = {}
+    for symbol, prev_symbols, alias_symbols in df[
+            ['symbol', 'prev_symbol', 'alias_symbol']].itertuples(index=False):
+        names = [(0, symbol.strip().upper())]
+        for priority, value in ((1, prev_symbols), (2, alias_symbols)):
+            # Multiple symbols are separated by "|" in HGNC files.
+            names += [(priority, name.strip().strip('"').upper())
+                      for name in value.split('|') if name.strip()]
+        # The variant table may use the approved or an older symbol.
+        gene_symbol = next(
+            (name for _, name in names if name in gene_symbols), None)
+        if gene_symbol is None:
+            continue
+        for priority, name in names:
+            if name != gene_symbol and name not in gene_symbols:
+                candidates.setdefault(name, {})\
+                    .setdefault(priority, set()).add(gene_symbol)
+
+    aliases = {}
+    for alias, symbols_by_priority in candidates.items():
+        symbols = symbols_by_priority[min(symbols_by_priority)]
+        if len(symbols) == 1:
+            aliases[alias] = symbols.pop()
+    return aliases
+
+
+def import_gene_aliases(db, variant_db_paths: list = None) -> None:
+    """
+    Populate gene aliases table from the gene aliases TSV (if it is set
+    in the settings) for the gene symbols used in the variant table.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+    variant_db_paths: list, optional
+        Paths of the databases with the variant table (e.g. shards).
+        Defaults to the db connection database.
+
+    Returns
+    -------
+    None
+    """
+    truncate_table(db, 'main_gene_alias')
+    if not settings.GENE_ALIASES_TSV:
+        return
+
+    gene_symbols = set()
+    if variant_db_paths is None:
+        variant_dbs = [db]
+    else:
+        variant_dbs = [get_db(path) for path in variant_db_paths]
+    for variant_db in variant_dbs:
+        gene_symbols.update(gene for gene, in variant_db.execute(
+            'SELECT DISTINCT gene_symbol_upper FROM main_variant'))
+        if variant_db is not db:
+            variant_db.close()
+    gene_symbols.discard('')
+
+    db.executemany(
+        'INSERT INTO main_gene_alias (alias, gene_symbol) VALUES (?, ?)',
+        read_gene_aliases_tsv(gene_symbols).items()
+    )
+    db.commit()
+
+
+def import_dataset_metadata(db) -> dict:
+    """
+    Populate dataset metadata table with the GENIE version and a new
+    unique build id, which allows web workers to identify the data.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
+    Returns
+    -------
+    dict
+        Dataset metadata keys and values.
+    """
+    truncate_table(db, 'main_dataset_metadata')
+    metadata = {
+        'genie_version': settings.GENIE_VERSION,
+        'build_id': uuid.uuid4().hex,
+        'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    db.executemany(
+        'INSERT INTO main_dataset_metadata (key, value) VALUES (?, ?)',
+        metadata.items()
+    )
+    db.commit()
+    return metadata
+
+
+def get_vcf_identity(vcf_path) -> dict:
+    """
+    Get the GENIE VCF path, size and modification time, which are used to
+    check that an import is resumed with the same VCF.
+
+    Parameters
+    ----------
+    vcf_path : Path
+        Path to the GENIE VCF.
+
+    Returns
+    -------
+    dict
+    """
+    stat = os.stat(vcf_path)
+    return {'path': str(vcf_path), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns}
+
+
+def read_checkpoint(db) -> dict:
     """
-    Get SQLite DB connection or exit with error.
-    
+    Read the import checkpoint of an interrupted import.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+
     Returns
     -------
-    sqlite3.Connection        
+    dict
+        Import checkpoint (see new_checkpoint) or None if the last
+        import was completed.
     """
-    try:
-        return sqlite3.connect(settings.DATABASES['default']['NAME'])
-    except sqlite3.Error as e:
-        sys.exit(f'Failed to connect to database: {e}')
+    row = db.execute('SELECT value FROM main_dataset_metadata WHERE key = ?',
+                     (CHECKPOINT_KEY,)).fetchone()
+    return json.loads(row[0]) if row else None
 
 
-def truncate_table(db, table_name):
+def write_checkpoint(cur, checkpoint: dict) -> None:
     """
-    Delete all records in a table and reset the primary key counter.
+    Write the import checkpoint. The caller commits the transaction, so
+    the checkpoint is committed together with the imported rows.
 
     Parameters
     ----------
-    table_name: str
-        Name of the database table that has to be cleared.
-    
+    cur: 
+        sqlite3.Cursor
+    checkpoint: dict
+        Import checkpoint (see new_checkpoint).
+
     Returns
     -------
     None
     """
-    cur = db.cursor()
+    checkpoint['updated_at'] = datetime.now(timezone.utc).isoformat(
+        timespec='seconds')
+    cur.execute(
+        'INSERT OR REPLACE INTO main_dataset_metadata (key, value) '
+        'VALUES (?, ?)', (CHECKPOINT_KEY, json.dumps(checkpoint))
+    )
 
-    # Safety: restrict to known tables only.
-    allowed = {
-        'main_variant',
-        'main_variant_cancer_type_patient_count',
-        'main_cancer_type',
-    }
-    if table_name not in allowed:
-        sys.exit(f'Unsafe table name: {table_name}')
 
-    # Truncate table (DELETE without WHERE = TRUNCATE in SQLite).
-    cur.execute(f"DELETE FROM {table_name}")
-    # Reset table primary key.
-    cur.execute(f"DELETE FROM sqlite_sequence WHERE name='{table_name}'")
-    db.commit()
+def new_checkpoint(packed_counts: bool, indexes_sql: list,
+        bulk_load: bool = False) -> dict:
+    """
+    Create an import checkpoint before any variants are imported.
+
+    Parameters
+    ----------
+    packed_counts: bool
+        Whether patient counts are packed in the variant table.
+    indexes_sql: list
+        SQL statements that recreate indexes dropped for a bulk load.
+    bulk_load: bool
+        Whether the import uses the non-durable bulk load settings.
+
+    Returns
+    -------
+    dict
+        VCF identity, import options, the number of committed batches,
+        the number of committed variants and the last committed VCF
+        line number.
+    """
+    return {
+        'vcf': get_vcf_identity(settings.GENIE_VCF),
+        'packed_counts': packed_counts,
+        'indexes_sql': indexes_sql,
+        'bulk_load': bulk_load,
+        'batch': 0,
+        'variants': 0,
+        'vcf_line': len(read_vcf_header(settings.GENIE_VCF)),
+    }
 
 
-def import_cancer_types(db) -> None:
+def check_checkpoint(checkpoint: dict, packed_counts: bool) -> None:
     """
-    Populate cancer types table from cancer_types csv.
+    Check that an interrupted import can be resumed with the current
+    VCF and options or exit with error.
 
     Parameters
     ----------
-    db: 
-        sqlite3.Connection
+    checkpoint: dict
+        Import checkpoint read from the database.
+    packed_counts: bool
+        Whether patient counts are packed in the variant table.
 
     Returns
     -------
     None
     """
+    if checkpoint is None:
+        sys.exit('There is no interrupted import to resume. Please re-run '
+                 'the script without --resume.')
+    if checkpoint['vcf'] != get_vcf_identity(settings.GENIE_VCF):
+        sys.exit('The GENIE VCF has changed since the interrupted import '
+                 f'({checkpoint["vcf"]["path"]}). Please re-run the script '
+                 'without --resume.')
+    if checkpoint.get('bulk_load'):
+        # Bulk loads do not sync or journal their writes, so the database
+        # of a killed bulk load may be corrupt.
+        sys.exit('The interrupted import was a --bulk-load, which cannot '
+                 'be resumed. Please re-run the script without --resume.')
+    if checkpoint['packed_counts'] != packed_counts:
+        sys.exit('--packed-counts must be used if and only if it was used '
+                 'by the interrupted import.')
 
-    if not settings.GENIE_CANCER_TYPES_CSV.is_file():
-        sys.exit(('DB reset was cancelled; GENIE cancer types csv file '
-            'was not found:\n') + str(settings.GENIE_CANCER_TYPES_CSV))
-        
-    truncate_table(db, 'main_cancer_type')
-    
-    df = pd.read_csv(settings.GENIE_CANCER_TYPES_CSV)
 
-    required_cols = {
-        'display_name',
-        'vcf_name',
-        'is_haemonc',
-        'is_solid',
-        'total_patient_count'
-    }
-    missing = required_cols - set(df.columns)
-    if missing:
-        sys.exit(f'Cancer types CSV missing columns: {", ".join(missing)}')
+def _init_vcf_parser(info_ids: list, info_fields: list,
+        cancer_type_ids: dict, packed_counts: bool = False) -> None:
+    """
+    Compile the VCF INFO parser used by parse_vcf_lines and store it in
+    module globals. Used as the process pool worker initializer.
 
-    cancer_types = df.apply(
-        lambda row: CancerType(
-            cancer_type=row['display_name'],
-            cancer_type_vcf=row['vcf_name'],
-            is_haemonc=bool(int(row['is_haemonc'])),
-            is_solid=bool(int(row['is_solid'])),
-            total_patient_count=int(row['total_patient_count'])
-        ),
-        axis=1
-    ).tolist()
-    CancerType.objects.bulk_create(cancer_types)
+    Parameters
+    ----------
+    info_ids : list
+        INFO IDs declared in the VCF header.
+    info_fields : list
+        (VCF INFO key, default value) tuples in the same order as the
+        variant table INFO columns in the SQL query.
+    cancer_type_ids : dict
+        Cancer type VCF names (keys) and their database ids (values).
+    packed_counts : bool
+        Pack variant cancer type patient counts into the variant rows
+        instead of building variant cancer type patient count rows.
+
+    Returns
+    -------
+    None
+    """
+    global _INFO_PARSER, _PACKED_COUNTS, _INFO_PARSER_ARGS
+    _INFO_PARSER_ARGS = (info_ids, info_fields, cancer_type_ids, packed_counts)
+    _INFO_PARSER = VcfInfoParser(info_ids, info_fields, cancer_type_ids)
+    _PACKED_COUNTS = packed_counts
 
 
-def import_vcf_variants(db) -> None:
+def _verify_csqs(csqs: str) -> None:
     """
-    Import data from the GENIE VCF to the variant and variant cancer
-    type patient count tables.
+    Verify that there are no unexpected VEP consequences.
 
     Parameters
     ----------
-    db: 
-        sqlite3.Connection
+    csqs : str
+        VEP consequences delimited by '&' e.g.
+        "non_coding_transcript_exon_variant&non_coding_transcript_variant"
 
     Returns
     -------
-    None    
+    None
+
+    Raises
+    ------
+    ValueError
+        If the most severe consequence cannot be identified.
     """
+    most_severe_csq = get_worst_csq_term(csqs)
+    if not most_severe_csq:
+        raise ValueError('Failed to identify the most severe consequence from '
+            f'"{csqs}". Ensure consequences are delimited by "&" (or ",") '
+            'and that all terms are present in VEP_CSQ_TERMS.')
 
-    if not settings.GENIE_VCF.is_file():
-        sys.exit('DB reset was cancelled; GENIE VCF file was not found:\n' + \
-            str(settings.GENIE_VCF))
 
-    # Get database cursor
-    cur = db.cursor()
-    # Enable foreign key checks
-    cur.execute("PRAGMA foreign_keys = ON;")
-    db.commit()
-    
-    # Delete all previous variant and variant cancer type patient count records.
-    truncate_table(db, 'main_variant_cancer_type_patient_count')
-    truncate_table(db, 'main_variant')
-
-    # "id", "chrom", "pos", "ref", and "alt" variant model fields
-    #  are populated from non-INFO VCF fields.
-    info_fields = [
-        f for f in Variant._meta.concrete_fields
-        if f.attname not in ('id', 'chrom', 'pos', 'ref', 'alt')
+def parse_vcf_lines(first_var_id: int, lines: list) -> tuple:
+    """
+    Parse a chunk of GENIE VCF data lines into ready-to-insert variant
+    and variant cancer type patient count rows. The function only
+    depends on the data set by _init_vcf_parser, so it can run in
+    process pool workers.
+
+    Parameters
+    ----------
+    first_var_id : int
+        Database id of the first variant in the chunk. Variant ids are
+        assigned sequentially, so they do not depend on the worker that
+        parsed the chunk.
+    lines : list
+        VCF data lines (without header lines).
+
+    Returns
+    -------
+    tuple
+        main_variant rows (lists),
+        main_variant_cancer_type_patient_count rows (lists) and
+        a dict with parse and build_rows stage times in seconds.
+
+    Raises
+    ------
+    ValueError
+        If a line contains an unexpected consequence or cancer type.
+    """
+    # Lines are parsed first and rows are built in a second pass, so
+    # the stages can be timed without timing every line.
+    start = time.perf_counter()
+    parse_info = _INFO_PARSER.parse
+    records = [
+        # Non-INFO variant model fields data, decoded VCF INFO column
+        # variant INFO values (in the same order as the model attribute
+        # names in the SQL query) and cancer type patient counts.
+        (row[0], int(row[1]), row[3], row[4], *parse_info(row[7]))
+        for row in csv.reader(lines, delimiter='\t')
     ]
+    parsed = time.perf_counter()
+
+    var_rows = []
+    cancer_pc_rows = []
+    csq_slot = _INFO_PARSER.slots['Consequence']
+    hgvs_c_slot = _INFO_PARSER.slots['HGVSc']
+    hgvs_p_slot = _INFO_PARSER.slots['HGVSp']
+    gene_slot = _INFO_PARSER.slots['Hugo_Symbol']
+    for var_id, (chrom, pos, ref, alt, info_values, var_cancer_pcs) in \
+            enumerate(records, first_var_id):
+        # Ensure that there are no unexpected VEP csqs (an empty worst
+        # consequence term is returned for unknown terms).
+        csqs = info_values[csq_slot]
+        worst_csq = get_worst_csq_term(csqs, raw=1) if csqs else ''
+        if csqs and not worst_csq:
+            _verify_csqs(csqs)
+
+        # Construct a variant row with values from the VCF, the
+        # display-ready values in Variant.DISPLAY_FIELDS order and the
+        # Variant.SEARCH_FIELDS values.
+        hgvs_p = info_values[hgvs_p_slot]
+        db_row = [var_id, chrom, pos, ref, alt] + info_values
+        db_row.extend((
+            get_allele_type(ref, alt),
+            VEP_CSQ_TERMS.get(worst_csq, ''),
+            get_consequence_category(worst_csq, hgvs_p),
+            format_hgvs(info_values[hgvs_c_slot]),
+            format_hgvs(hgvs_p),
+            (info_values[gene_slot] or '').upper(),
+            get_variant_end_pos(pos, ref),
+        ))
+        if _PACKED_COUNTS:
+            # Store patient counts in the variant row only.
+            db_row.append(pack_cancer_type_pcs(var_cancer_pcs))
+            var_rows.append(db_row)
+            continue
+        db_row.append(None)
+        var_rows.append(db_row)
+
+        # Construct variant cancer type rows in the same order as the
+        # model attribute names in the SQL query. The first item is
+        # "None" for the auto-generated ID.
+        for cancer_type_id, pcs in var_cancer_pcs.items():
+            cancer_pc_rows.append([None, var_id, cancer_type_id] + pcs)
+
+    stage_times = {
+        'parse': parsed - start,
+        'build_rows': time.perf_counter() - parsed,
+    }
+    return var_rows, cancer_pc_rows, stage_times
+
+
+def read_vcf_chunks(vcf_path, chunk_size: int = BATCH_SIZE, report=None,
+        skip: int = 0, first_var_id: int = 1):
+    """
+    Read GENIE VCF data lines in chunks.
+
+    Parameters
+    ----------
+    vcf_path : Path
+        Path to the bgzipped/gzipped GENIE VCF.
+    chunk_size : int
+        Maximum number of data lines per chunk.
+    report : ImportReport, optional
+        Report that gets the decompression time and the number of read
+        (compressed and uncompressed) VCF bytes.
+    skip : int
+        Number of data lines to skip (e.g. lines that were imported
+        before an import was interrupted).
+    first_var_id : int
+        Database id of the first VCF variant (e.g. the first variant id
+        of a chromosome shard).
+
+    Yields
+    ------
+    tuple
+        Database id of the first variant in the chunk and a list of
+        the chunk VCF data lines.
+    """
+    # A counter used as database variant IDs for foreign key insertion.
+    # Although it is generally not a good idea to process foreign keys
+    # independently from the source table, it is safe to do so in this
+    # case. The variant table is truncated and its primary key is reset
+    # before import, so variant counter will correspond to variant id.
+    var_id = first_var_id + skip
+    lines = []
+    with open(vcf_path, 'rb') as raw, gzip.GzipFile(fileobj=raw) as gz, \
+            io.TextIOWrapper(gz, encoding='utf-8', newline='') as f:
+
+        def _record_read(start: float) -> None:
+            """Add the chunk read time and VCF file offsets to the report."""
+            if report is not None:
+                report.add_stage_times(decompress=time.perf_counter() - start)
+                report.vcf_bytes = gz.tell()
+                report.vcf_compressed_bytes = raw.tell()
+
+        start = time.perf_counter()
+        for line in f:
+            # Skip header rows and already imported data lines.
+            if line.startswith('#'):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            lines.append(line)
+            if len(lines) == chunk_size:
+                _record_read(start)
+                yield var_id, lines
+                var_id += len(lines)
+                lines = []
+                start = time.perf_counter()
+        _record_read(start)
+    if lines:
+        yield var_id, lines
+
+
+def parse_vcf_chunks(chunks, workers: int = 1):
+    """
+    Parse VCF chunks, optionally in a pool of worker processes, and
+    yield the results in the original chunk order.
+
+    Parameters
+    ----------
+    chunks : iterable
+        (first variant id, lines) tuples as yielded by read_vcf_chunks.
+    workers : int
+        Number of parser processes. 1 parses in the current process.
+
+    Yields
+    ------
+    tuple
+        main_variant rows, main_variant_cancer_type_patient_count rows
+        and parse stage times of each chunk.
+    """
+    if workers < 2:
+        for first_var_id, lines in chunks:
+            yield parse_vcf_lines(first_var_id, lines)
+        return
+
+    with multiprocessing.Pool(workers, initializer=_init_vcf_parser,
+            initargs=_INFO_PARSER_ARGS) as pool:
+        # Only a few chunks per worker are read ahead, so the memory
+        # use does not depend on the VCF size.
+        pending = deque()
+        for first_var_id, lines in chunks:
+            pending.append(
+                pool.apply_async(parse_vcf_lines, (first_var_id, lines)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def get_insert_queries(var_table: str = 'main_variant',
+        cancer_pc_table: str = 'main_variant_cancer_type_patient_count') -> tuple:
+    """
+    Create SQL queries that insert rows built by parse_vcf_lines.
+
+    Parameters
+    ----------
+    var_table : str
+        Name of the table with the variant table columns.
+    cancer_pc_table : str
+        Name of the table with the variant cancer type patient count
+        table columns.
 
+    Returns
+    -------
+    tuple
+        Variant and variant cancer type patient count INSERT queries.
+    """
     # Create an SQL queries with variant table column names and
     # CANCER_PC_PREFIXES keys/values to ensure that the data is inserted
     # into the right columns.
-    var_sql_column_names = ', '.join(
-        ['id', 'chrom', 'pos', 'ref', 'alt'] + [f.attname for f in info_fields]
-    )
-    var_sql_column_values = ', '.join(['?'] * (5 + len(info_fields)))
-    var_sql_query = (f'INSERT INTO main_variant ({var_sql_column_names}) '
+    var_sql_column_names = ', '.join(VARIANT_COLUMNS)
+    var_sql_column_values = ', '.join(['?'] * len(VARIANT_COLUMNS))
+    var_sql_query = (f'INSERT INTO {var_table} ({var_sql_column_names}) '
                  f'VALUES ({var_sql_column_values})')
 
-    var_cancer_pc_sql_column_names = ', '.join(
-        ['id', 'variant_id', 'cancer_type_id']
-        + list(CANCER_PC_PREFIXES.values())
-    )
+    var_cancer_pc_sql_column_names = ', '.join(CANCER_PC_COLUMNS)
     var_cancer_pc_sql_column_values = \
-        ', '.join(['?'] * (3 + len(CANCER_PC_PREFIXES)))
+        ', '.join(['?'] * len(CANCER_PC_COLUMNS))
     var_cancer_pc_sql_query = (
-        'INSERT INTO main_variant_cancer_type_patient_count '
+        f'INSERT INTO {cancer_pc_table} '
         f'({var_cancer_pc_sql_column_names}) '
                  f'VALUES ({var_cancer_pc_sql_column_values})')
+    return var_sql_query, var_cancer_pc_sql_query
+
+
+def insert_vcf_variants(db, var_sql_query: str, var_cancer_pc_sql_query: str,
+        workers: int = 1, report: ImportReport = None,
+        packed_counts: bool = False, checkpoint: dict = None,
+        vcf_path=None, first_var_id: int = 1) -> int:
+    """
+    Parse the GENIE VCF and insert its variant and variant cancer type
+    patient count rows in batches.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+    var_sql_query : str
+        Variant rows INSERT query (see get_insert_queries).
+    var_cancer_pc_sql_query : str
+        Variant cancer type patient count rows INSERT query.
+    workers: int
+        Number of processes used to parse the VCF. Database writes are
+        always done by the current process in the VCF order.
+    report: ImportReport, optional
+        Report that gets the import stage times and throughput samples.
+    packed_counts: bool
+        Store variant cancer type patient counts packed in the variant
+        rows instead of the variant cancer type patient count table.
+    checkpoint: dict, optional
+        Import checkpoint that is updated in the same transaction as
+        each batch. The VCF lines of the variants it lists as imported
+        are skipped.
+    vcf_path: Path, optional
+        Path to the VCF. Defaults to the GENIE VCF.
+    first_var_id: int
+        Database id of the first VCF variant.
+
+    Returns
+    -------
+    int
+        Number of imported variants (including the skipped variants).
+    """
+    if vcf_path is None:
+        vcf_path = settings.GENIE_VCF
+    if not vcf_path.is_file():
+        sys.exit('DB reset was cancelled; GENIE VCF file was not found:\n' + \
+            str(vcf_path))
+
+    if report is None:
+        report = ImportReport()
+    cur = db.cursor()
 
     def _insert_batch(var_batch_data: list, cancer_pc_batch_data: list):
         """
@@ -195,185 +1389,610 @@ def import_vcf_variants(db) -> None:
         -------
         None
         """
+        start = time.perf_counter()
         try:
             cur.execute('BEGIN')
             cur.executemany(var_sql_query, var_batch_data)
             cur.executemany(var_cancer_pc_sql_query, cancer_pc_batch_data)
+            if checkpoint is not None:
+                checkpoint['batch'] += 1
+                checkpoint['variants'] += len(var_batch_data)
+                checkpoint['vcf_line'] += len(var_batch_data)
+                write_checkpoint(cur, checkpoint)
             db.commit()
         except Exception as e:
             print(f'Failed to insert a batch of variant records: "{e}"')
             db.rollback()
             sys.exit('Please fix the problem and re-run the script.')
+        report.add_stage_times(insert=time.perf_counter() - start)
 
-    def _verify_csqs(csqs: str) -> None:
-        """
-        Verify that there are no unexpected VEP consequences.
-
-        Parameters
-        ----------
-        csqs : str
-            VEP consequences delimited by '&' e.g.
-            "non_coding_transcript_exon_variant&non_coding_transcript_variant"
-        
-        Returns
-        -------
-        None
-        """
-        most_severe_csq = get_worst_csq_term(csqs)
-        if not most_severe_csq:
-            sys.exit('Failed to identify the most severe consequence from '
-                f'"{csqs}". Ensure consequences are delimited by "&" (or ",") '
-                'and that all terms are present in VEP_CSQ_TERMS.')
+    # Get cancer type db ids.
+    cancer_type_ids = dict(
+        cur.execute('SELECT cancer_type_vcf, id FROM main_cancer_type')
+    )
 
-    def _is_cancer_type_count_key(key: str) -> bool:
-        """
-        Check whether VCF INFO key is a cancer patient count INFO field
-        (e.g. SameAminoAcidChange_All_Cancers_Count_N_208523).
-        Duplicate patient IDs and count fields that start with the 
-        same prefixes are ignored.
-        Parameters
-        ----------
-        key: str
-            VCF INFO key.
-        
-        Returns
-        -------
-        Bool
-        """
-        if (key.startswith(tuple(CANCER_PC_PREFIXES.keys())) and
-                not key.endswith('_Patient_IDs') and
-                not key.endswith('_Duplicate_Patient_Count')):
-            return True
-        else:
-            return False     
+    # Compile the INFO parser from the VCF header INFO IDs and VCF INFO
+    # fields names from the variant model help text. If INFO key is
+    # missing and model field has default - use it.
+    _init_vcf_parser(
+        read_vcf_info_ids(vcf_path),
+        [(f.help_text,
+          f.get_default() if f.default is not NOT_PROVIDED else None)
+         for f in VARIANT_INFO_FIELDS],
+        cancer_type_ids,
+        packed_counts
+    )
 
     # Counter to store the total number of processed variants.
-    count = 0
-    # A list to store variant rows for insertion to the database.
-    var_batch_data = []
-    cancer_pc_batch_data = []
+    count = checkpoint['variants'] if checkpoint else 0
+    chunks = read_vcf_chunks(vcf_path, report=report, skip=count,
+                             first_var_id=first_var_id)
+    try:
+        for var_batch_data, cancer_pc_batch_data, stage_times in \
+                parse_vcf_chunks(chunks, workers):
+            report.add_stage_times(**stage_times)
+            # Insert a batch of variant rows to the database.
+            _insert_batch(var_batch_data, cancer_pc_batch_data)
+            report.sample(len(var_batch_data))
+            count += len(var_batch_data)
+            print(f'Processed {count} variants')
+    except ValueError as e:
+        sys.exit(str(e))
+    return count
 
-    # Get cancer type db ids.
-    cancer_type_ids = {}
-    cancers = CancerType.objects.all()
-    for cancer in cancers:
-        cancer_type_ids[cancer.cancer_type_vcf] = cancer.id
 
-    # A counter used as database variant IDs for foreign key insertion.
-    # Although it is generally not a good idea to process foreign keys
-    # independently from the source table, it is safe to do so in this
-    # case. This function truncates variant table and resets its
-    # primary key, so variant counter will correspond to variant id. 
-    var_id = 1
-    with gzip.open(settings.GENIE_VCF, mode='rt', encoding='utf-8', 
-            newline='') as f:
-        reader = csv.reader(f, delimiter='\t')
-
-        # Loop through the VCF file rows.
-        for row in reader:
-            # Skip header rows.
-            if row[0].startswith('#'):
-                continue
-            
-            # Get non-INFO variant model fields data.
-            chrom = row[0]
-            pos = int(row[1])
-            ref = row[3]
-            alt = row[4]
-
-            # Parse VCF INFO column and store results in a dict.
-            # Note: the current GENIE VCF has no flag INFO fields.
-            info_dict = {}
-            for info_item in row[7].split(';'):
-                if '=' in info_item:
-                    key, val = info_item.split('=', 1)
-                    # Remove total patient count ending which can vary
-                    # in different GENIE VCF versions.
-                    if _is_cancer_type_count_key(key):
-                         key = key.split('_Count_')[0]
-                    info_dict[key] = val
-
-                    if key == 'Consequence':
-                        # Ensure that there are no unexpected VEP csqs.
-                        _verify_csqs(val)
-
-            # Construct a variant row with values from the VCF in the
-            # same order as the model attribute names in the SQL query.
-            # The first item is "None" for the auto-generated ID.
-            db_row = [var_id, chrom, pos, ref, alt]
-            for f in info_fields:
-                # Get VCF INFO fields name from the variant model help text.
-                val = info_dict.get(f.help_text, None)
-                # If INFO key is missing and model field has default - use it.
-                if val is None and f.default is not NOT_PROVIDED:
-                    val = f.get_default()
-                db_row.append(val)
-            var_batch_data.append(db_row)
-
-            # Process variant cancer type patient counts.
-            var_cancer_pcs = {}
-            for key, val in info_dict.items():
-                # Skip VCF fields with 0 patient counts. CANCER_PC_DICT
-                # has default 0 values for each patient count type, so
-                # a record is inserted if at least one of the counts is
-                # not 0.
-                if val == '0':
-                    continue
-                # Variant cancer type patient counts names have the
-                # following format:
-                # {COUNT_TYPE}_{CANCER_TYPE}_Count_N_{TOTAL_PATIENT_COUNT}
-                if _is_cancer_type_count_key(key):
-                    pc_type_vcf, cancer_type_vcf = key.split('_', 1)
-                    if cancer_type_vcf not in var_cancer_pcs:
-                        var_cancer_pcs[cancer_type_vcf] = dict(CANCER_PC_DICT)
-                    pc_type = CANCER_PC_PREFIXES[pc_type_vcf]
-                    var_cancer_pcs[cancer_type_vcf][pc_type] = int(val)
-            
-            # Construct a variant cancer type row with values from the 
-            # VCF in the same order as the model attribute names in the 
-            # SQL query. The first item is "None" for the auto-generated ID.
-            for cancer, pcs in var_cancer_pcs.items():
-                if cancer not in cancer_type_ids:
-                    sys.exit(f'Unknown cancer type in VCF: "{cancer}". '
-                             'Ensure it exists in data/cancer_types.csv')
-                db_row = [None, var_id, cancer_type_ids[cancer]] + \
-                    list(pcs.values())
-                cancer_pc_batch_data.append(db_row)
+def import_vcf_variants(db, workers: int = 1,
+        report: ImportReport = None, packed_counts: bool = False,
+        checkpoint: dict = None, resume: bool = False) -> None:
+    """
+    Import data from the GENIE VCF to the variant and variant cancer
+    type patient count tables.
 
-            # Insert a batch of variant rows to the database.
-            if len(var_batch_data) > 9999:
-                _insert_batch(var_batch_data, cancer_pc_batch_data)
-                count += len(var_batch_data)
-                print(f'Processed {count} variants')
-                var_batch_data = []
-                cancer_pc_batch_data = []
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+    workers: int
+        Number of processes used to parse the VCF.
+    report: ImportReport, optional
+        Report that gets the import stage times and throughput samples.
+    packed_counts: bool
+        Store variant cancer type patient counts packed in the variant
+        rows instead of the variant cancer type patient count table.
+    checkpoint: dict, optional
+        Import checkpoint updated after each batch (see new_checkpoint).
+    resume: bool
+        Continue an interrupted import from the checkpoint instead of
+        re-importing all variants.
+
+    Returns
+    -------
+    None    
+    """
+    if checkpoint is None:
+        checkpoint = new_checkpoint(packed_counts, [])
+
+    # Enable foreign key checks
+    db.execute("PRAGMA foreign_keys = ON;")
+    db.commit()
+
+    if resume:
+        print(f'Resuming the import after batch {checkpoint["batch"]} '
+              f'(VCF line {checkpoint["vcf_line"]}, '
+              f'{checkpoint["variants"]} variants).')
+        # Batches are committed together with the checkpoint, but remove
+        # any rows after it to be safe.
+        db.execute('DELETE FROM main_variant_cancer_type_patient_count '
+                   'WHERE variant_id > ?', (checkpoint['variants'],))
+        db.execute('DELETE FROM main_variant WHERE id > ?',
+                   (checkpoint['variants'],))
+    else:
+        # Delete all previous variant and variant cancer type patient
+        # count records.
+        truncate_table(db, 'main_variant_cancer_type_patient_count')
+        truncate_table(db, 'main_variant')
+    # Record the import options (e.g. dropped indexes) before the first
+    # batch is imported.
+    write_checkpoint(db.cursor(), checkpoint)
+    db.commit()
+
+    insert_vcf_variants(db, *get_insert_queries(), workers=workers,
+                        report=report, packed_counts=packed_counts,
+                        checkpoint=checkpoint)
 
-            # Increase variant primary key
-            var_id += 1
 
-    # Insert any remaining variant records (i.e. < 10,000).
-    if var_batch_data:
-        _insert_batch(var_batch_data, cancer_pc_batch_data)
-        count += len(var_batch_data)
-        print(f'Processed {count} variants')
+def diff_vcf_variants(db, workers: int = 1,
+        report: ImportReport = None) -> None:
+    """
+    Update the variant and variant cancer type patient count tables to
+    match the GENIE VCF by inserting, updating and deleting only the
+    changed rows. Variants are matched by chrom, pos, ref and alt, so
+    the ids of existing variants do not change.
+
+    Parameters
+    ----------
+    db: 
+        sqlite3.Connection
+    workers: int
+        Number of processes used to parse the VCF.
+    report: ImportReport, optional
+        Report that gets the import stage times and throughput samples.
+
+    Returns
+    -------
+    None
+    """
+    cur = db.cursor()
+    cur.execute("PRAGMA foreign_keys = ON;")
+
+    # Load the VCF into temporary staging tables with the same columns.
+    # Staged variant ids are VCF line numbers and db_id is the id of
+    # the matching variant in the variant table.
+    for table_name in ('main_variant', 'main_variant_cancer_type_patient_count'):
+        cur.execute(f'DROP TABLE IF EXISTS temp.staged_{table_name}')
+        cur.execute(f'CREATE TEMP TABLE staged_{table_name} AS '
+                    f'SELECT * FROM main.{table_name} WHERE 0')
+    cur.execute('ALTER TABLE temp.staged_main_variant ADD COLUMN db_id INTEGER')
+    db.commit()
+    staged_count = insert_vcf_variants(
+        db,
+        *get_insert_queries('temp.staged_main_variant',
+            'temp.staged_main_variant_cancer_type_patient_count'),
+        workers=workers,
+        report=report
+    )
 
+    print('Comparing the VCF with the database...')
+    # Variant columns that are not part of the chrom/pos/ref/alt key.
+    info_columns = VARIANT_COLUMNS[5:]
+    key_match = ' AND '.join(
+        f'v.{col} = s.{col}' for col in ('chrom', 'pos', 'ref', 'alt'))
+    match_db_ids = ('UPDATE temp.staged_main_variant AS s SET db_id = '
+        f'(SELECT v.id FROM main.main_variant AS v WHERE {key_match})')
+    pc_columns = list(CANCER_PC_PREFIXES.values())
+    pc_key_match = ('p.variant_id = s.variant_id '
+                    'AND p.cancer_type_id = s.cancer_type_id')
+    summary = {}
+    try:
+        cur.execute('CREATE UNIQUE INDEX temp.staged_variant_locus ON '
+                    'staged_main_variant (chrom, pos, ref, alt)')
+        cur.execute('CREATE INDEX temp.staged_variant_id ON '
+                    'staged_main_variant (id)')
+        cur.execute(match_db_ids)
+        cur.execute('CREATE INDEX temp.staged_variant_db_id ON '
+                    'staged_main_variant (db_id)')
+        db.commit()
+
+        # Apply all changes in one transaction, so the web workers see
+        # either the old or the new data.
+        cur.execute('BEGIN')
+        cur.execute(
+            f'UPDATE main.main_variant AS v SET ({", ".join(info_columns)}) = '
+            f'({", ".join("s." + col for col in info_columns)}) '
+            'FROM temp.staged_main_variant AS s WHERE s.db_id = v.id AND ('
+            + ' OR '.join(f'v.{col} IS NOT s.{col}' for col in info_columns)
+            + ')'
+        )
+        summary['variants updated'] = cur.rowcount
+        cur.execute(
+            f'INSERT INTO main.main_variant ({", ".join(VARIANT_COLUMNS[1:])}) '
+            f'SELECT {", ".join(VARIANT_COLUMNS[1:])} '
+            'FROM temp.staged_main_variant WHERE db_id IS NULL ORDER BY id'
+        )
+        summary['variants inserted'] = cur.rowcount
+        cur.execute(match_db_ids + ' WHERE s.db_id IS NULL')
+
+        # Replace staged patient count variant ids with database ids.
+        cur.execute(
+            'UPDATE temp.staged_main_variant_cancer_type_patient_count AS p '
+            'SET variant_id = (SELECT s.db_id FROM temp.staged_main_variant '
+            'AS s WHERE s.id = p.variant_id)'
+        )
+        cur.execute('CREATE INDEX temp.staged_pc_key ON '
+            'staged_main_variant_cancer_type_patient_count '
+            '(variant_id, cancer_type_id)')
+        cur.execute(
+            'DELETE FROM main.main_variant_cancer_type_patient_count AS p '
+            'WHERE NOT EXISTS (SELECT 1 FROM '
+            'temp.staged_main_variant_cancer_type_patient_count AS s '
+            f'WHERE {pc_key_match})'
+        )
+        summary['patient counts deleted'] = cur.rowcount
+        cur.execute(
+            'UPDATE main.main_variant_cancer_type_patient_count AS p '
+            f'SET ({", ".join(pc_columns)}) = '
+            f'({", ".join("s." + col for col in pc_columns)}) '
+            'FROM temp.staged_main_variant_cancer_type_patient_count AS s '
+            f'WHERE {pc_key_match} AND ('
+            + ' OR '.join(f'p.{col} IS NOT s.{col}' for col in pc_columns)
+            + ')'
+        )
+        summary['patient counts updated'] = cur.rowcount
+        cur.execute(
+            'INSERT INTO main.main_variant_cancer_type_patient_count '
+            f'({", ".join(CANCER_PC_COLUMNS[1:])}) '
+            f'SELECT {", ".join("s." + col for col in CANCER_PC_COLUMNS[1:])} '
+            'FROM temp.staged_main_variant_cancer_type_patient_count AS s '
+            'WHERE NOT EXISTS (SELECT 1 FROM '
+            f'main.main_variant_cancer_type_patient_count AS p WHERE {pc_key_match}) '
+            'ORDER BY s.variant_id, s.cancer_type_id'
+        )
+        summary['patient counts inserted'] = cur.rowcount
+
+        cur.execute(
+            'DELETE FROM main.main_variant AS v WHERE NOT EXISTS (SELECT 1 '
+            'FROM temp.staged_main_variant AS s WHERE s.db_id = v.id)'
+        )
+        summary['variants deleted'] = cur.rowcount
+        summary['cancer types deleted'] = delete_stale_cancer_types(cur)
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        sys.exit(f'Failed to apply the VCF changes to the database: "{e}"')
+
+    summary['variants unchanged'] = (staged_count
+        - summary['variants inserted'] - summary['variants updated'])
+    print('Change summary:')
+    for name, value in summary.items():
+        print(f'  {name}: {value}')
 
-def reset_db():
+
+def reset_db(workers: int = 1, shadow: bool = False, bulk_load: bool = False,
+        diff: bool = False, packed_counts: bool = False, resume: bool = False,
+        column_index: bool = False):
     """
     Repopulate NHS GENIE database.
+
+    Parameters
+    ----------
+    workers: int
+        Number of processes used to parse the VCF.
+    shadow: bool
+        Build the database in a shadow file next to the live database,
+        validate it and atomically swap it with the live database.
+    bulk_load: bool
+        Drop secondary indexes and use bulk load connection settings
+        during the import, then rebuild indexes, ANALYZE and VACUUM.
+    diff: bool
+        Apply only the differences between the VCF and the database
+        instead of re-importing all variants.
+    packed_counts: bool
+        Store variant cancer type patient counts packed in the variant
+        table instead of the variant cancer type patient count table.
+    resume: bool
+        Continue an interrupted import from its last committed batch.
+    column_index: bool
+        Write the column index of the variant table (main/column_index.py).
     
     Returns
     -------
     None
     """
-    start = time.perf_counter()
-    db = get_db()
-    import_cancer_types(db)
-    import_vcf_variants(db)
-    end = time.perf_counter()
+    report = ImportReport()
+    db_path = settings.DATABASES['default']['NAME']
+    with report('Create shadow database' if shadow else 'Connect'):
+        if shadow and resume:
+            db = open_shadow_db(db_path)
+        elif shadow:
+            db = create_shadow_db(db_path, copy_data=diff)
+        else:
+            db = get_db()
+    # Checkpoint of an interrupted import (if any). Indexes dropped by an
+    # interrupted bulk load are rebuilt by this import.
+    checkpoint = read_checkpoint(db)
+    if resume:
+        check_checkpoint(checkpoint, packed_counts)
+    indexes_sql = checkpoint['indexes_sql'] if checkpoint else []
+    if bulk_load:
+        set_pragmas(db, BULK_LOAD_PRAGMAS)
+        with report('Drop indexes'):
+            indexes_sql += drop_secondary_indexes(db)
+    if diff:
+        with report('Update cancer types'):
+            sync_cancer_types(db)
+        with report('Apply variant changes'):
+            diff_vcf_variants(db, workers, report=report)
+    else:
+        if resume:
+            checkpoint['indexes_sql'] = indexes_sql
+        else:
+            checkpoint = new_checkpoint(packed_counts, indexes_sql,
+                                        bulk_load=bulk_load)
+            with report('Import cancer types'):
+                import_cancer_types(db)
+        with report('Import variants'):
+            import_vcf_variants(db, workers, report=report,
+                                packed_counts=packed_counts,
+                                checkpoint=checkpoint, resume=resume)
+    if indexes_sql:
+        with report('Rebuild indexes'):
+            create_indexes(db, indexes_sql)
+    if bulk_load:
+        set_pragmas(db, DEFAULT_PRAGMAS)
+    with report('Import gene aliases'):
+        import_gene_aliases(db)
+    # Dataset metadata replaces the import checkpoint, so it is written
+    # once all the data and indexes are in place.
+    with report('Import dataset metadata'):
+        metadata = import_dataset_metadata(db)
+    if shadow:
+        print('Validating the new database...')
+        with report('Validate'):
+            validate_db(db)
+    if shadow or bulk_load:
+        with report('Analyze'):
+            db.execute('ANALYZE')
+            db.commit()
+    if bulk_load:
+        with report('Vacuum'):
+            db.execute('VACUUM')
+    if column_index:
+        with report('Write column index'):
+            write_column_index([db], metadata['build_id'])
+    if shadow:
+        db.close()
+        with report('Swap'):
+            swap_db(get_shadow_db_path(db_path), db_path)
+        db = get_db()
+    # Cached results are keyed by the dataset build id, so they are not
+    # served after the import anyway, but they no longer use cache space.
+    clear_result_cache()
+    remove_old_column_indexes(metadata['build_id'] if column_index else None)
     print('Successfully re-populated the database.')
-    print(f'Execution time: {end - start:.2f} seconds')
+    report.print_report()
+    report_data = report.write(
+        get_import_report_path(), db, vcf=str(settings.GENIE_VCF),
+        options={'workers': workers, 'shadow': shadow,
+                 'bulk_load': bulk_load, 'diff': diff,
+                 'packed_counts': packed_counts, 'resume': resume,
+                 'column_index': column_index}
+    )
     db.close()
+    print(f'Execution time: {report_data["total_seconds"]:.2f} seconds')
+    print(f'Import report: {get_import_report_path()}')
+
+
+def import_shard(chrom: str, vcf_path, bulk_load: bool = False,
+        packed_counts: bool = False) -> tuple:
+    """
+    Import variants of one chromosome to a new shard database file next
+    to the shard database. Used as a process pool task.
+
+    Parameters
+    ----------
+    chrom: str
+        Chromosome name.
+    vcf_path: Path
+        Path to the chromosome VCF.
+    bulk_load: bool
+        Drop secondary indexes and use bulk load connection settings
+        during the import, then rebuild indexes and VACUUM.
+    packed_counts: bool
+        Store variant cancer type patient counts packed in the variant
+        table instead of the variant cancer type patient count table.
+
+    Returns
+    -------
+    tuple
+        Chromosome, number of imported variants and VCF import stage
+        times.
+
+    Raises
+    ------
+    RuntimeError
+        If the import fails. sys.exit is not used in pool workers.
+    """
+    shard_db = settings.VARIANT_SHARDS[chrom]
+    shard_path = get_shadow_db_path(settings.DATABASES[shard_db]['NAME'])
+    report = ImportReport()
+    try:
+        # The cancer types are copied from the new default database,
+        # which is built next to the live one (see reset_sharded_db).
+        db = create_shard_db(
+            get_shadow_db_path(settings.DATABASES['default']['NAME']),
+            shard_path)
+        if bulk_load:
+            set_pragmas(db, BULK_LOAD_PRAGMAS)
+            indexes_sql = drop_secondary_indexes(db)
+        db.execute("PRAGMA foreign_keys = ON;")
+        count = insert_vcf_variants(
+            db, *get_insert_queries(), report=report,
+            packed_counts=packed_counts, vcf_path=vcf_path,
+            first_var_id=(CHROMOSOMES.index(chrom) + 1) * SHARD_ID_STRIDE
+        )
+        if bulk_load:
+            create_indexes(db, indexes_sql)
+            set_pragmas(db, DEFAULT_PRAGMAS)
+        db.execute('ANALYZE')
+        db.commit()
+        if bulk_load:
+            db.execute('VACUUM')
+        db.close()
+    except SystemExit as e:
+        raise RuntimeError(f'chr{chrom}: {e}') from None
+    print(f'Imported {count} chr{chrom} variants', flush=True)
+    return chrom, count, report.stages
+
+
+def reset_sharded_db(workers: int = 1, bulk_load: bool = False,
+        packed_counts: bool = False, column_index: bool = False):
+    """
+    Repopulate NHS GENIE database with variants stored in per-chromosome
+    shard databases (settings.VARIANT_SHARDS). The VCF is split by
+    chromosome and the shards are imported in parallel. The default
+    database and every shard are built in new files, which are swapped
+    in once all of them are built. The live files are not modified.
+
+    Parameters
+    ----------
+    workers: int
+        Number of shards imported in parallel.
+    bulk_load: bool
+        Drop secondary indexes and use bulk load connection settings
+        during the shard imports, then rebuild indexes and VACUUM.
+    packed_counts: bool
+        Store variant cancer type patient counts packed in the variant
+        table instead of the variant cancer type patient count table.
+    column_index: bool
+        Write the column index of the variant table (main/column_index.py).
+
+    Returns
+    -------
+    None
+    """
+    report = ImportReport()
+    db_path = settings.DATABASES['default']['NAME']
+    shard_paths = [settings.DATABASES[settings.VARIANT_SHARDS[chrom]]['NAME']
+                   for chrom in CHROMOSOMES]
+    # Variants are only stored in the shards, so the variant tables of
+    # the new default database are left empty.
+    with report('Create shadow database'):
+        db = create_shadow_db(db_path)
+    with report('Import cancer types'):
+        import_cancer_types(db)
+
+    shards_folder = settings.SHARDS_FOLDER
+    shards_folder.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=shards_folder) as tmp_dir:
+        print('Splitting the VCF by chromosome...')
+        with report('Split VCF'):
+            try:
+                vcf_paths = split_vcf_by_chrom(
+                    settings.GENIE_VCF, tmp_dir, CHROMOSOMES)
+            except ValueError as e:
+                sys.exit(str(e))
+        # Chromosomes without variants get empty shards, so that every
+        # shard database exists. The largest shards are imported first.
+        empty_vcf = Path(tmp_dir) / 'empty.vcf.gz'
+        with gzip.open(empty_vcf, 'wt') as f:
+            f.writelines(read_vcf_header(settings.GENIE_VCF))
+        tasks = sorted(
+            ((chrom, vcf_paths.get(chrom, empty_vcf), bulk_load, packed_counts)
+             for chrom in CHROMOSOMES),
+            key=lambda task: -task[1].stat().st_size
+        )
+        shard_rows = {}
+        with report('Import shards'):
+            try:
+                with multiprocessing.Pool(workers) as pool:
+                    for chrom, count, stages in \
+                            pool.starmap(import_shard, tasks, chunksize=1):
+                        shard_rows[chrom] = count
+                        report.add_stage_times(**stages)
+            except RuntimeError as e:
+                sys.exit(f'Failed to import a shard database: {e}')
+    report.rows = sum(shard_rows.values())
+
+    new_shard_paths = [get_shadow_db_path(path) for path in shard_paths]
+    with report('Import gene aliases'):
+        import_gene_aliases(db, new_shard_paths)
+    with report('Import dataset metadata'):
+        metadata = import_dataset_metadata(db)
+    with report('Analyze'):
+        db.execute('ANALYZE')
+        db.commit()
+    if column_index:
+        with report('Write column index'):
+            shard_dbs = [get_db(path) for path in new_shard_paths]
+            write_column_index(shard_dbs, metadata['build_id'])
+            for shard_db in shard_dbs:
+                shard_db.close()
+    db.close()
+    # The files are renamed one by one, so a request that starts while
+    # they are swapped may still read some old shards. The default
+    # database, which holds the dataset build id, is swapped last.
+    swaps = [*zip(new_shard_paths, shard_paths),
+             (get_shadow_db_path(db_path), db_path)]
+    for new_path, path in swaps:
+        check_swappable(new_path, path)
+    with report('Swap'):
+        for new_path, path in swaps:
+            swap_db(new_path, path)
+    db = get_db()
+    clear_result_cache()
+    remove_old_column_indexes(metadata['build_id'] if column_index else None)
+    print('Successfully re-populated the sharded database.')
+    report.print_report()
+    report_data = report.write(
+        get_import_report_path(), db, vcf=str(settings.GENIE_VCF),
+        options={'workers': workers, 'sharded': True, 'bulk_load': bulk_load,
+                 'packed_counts': packed_counts, 'column_index': column_index},
+        shard_rows={chrom: shard_rows[chrom] for chrom in CHROMOSOMES}
+    )
+    db.close()
+    print(f'Execution time: {report_data["total_seconds"]:.2f} seconds')
+    print(f'Import report: {get_import_report_path()}')
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Repopulate the NHS GENIE database from the GENIE VCF '
+            'and cancer types CSV files defined in the .env file.')
+    parser.add_argument('--workers', type=int, default=1,
+        help=('Number of processes used to parse the VCF (default: 1). '
+            'Database writes are always done by a single process.'))
+    parser.add_argument('--shadow', action='store_true',
+        help=('Build the database in a new file next to the live database, '
+            'validate it and atomically swap it in. The live database is '
+            'not modified if the import fails.'))
+    parser.add_argument('--bulk-load', action='store_true',
+        help=('Drop secondary indexes and use fast, non-durable connection '
+            'settings during the import, then rebuild the indexes and run '
+            'ANALYZE and VACUUM. An interrupted import must be re-run.'))
+    parser.add_argument('--diff', action='store_true',
+        help=('Compare the VCF with the database by chrom/pos/ref/alt and '
+            'insert, update and delete only the changed variants and '
+            'patient counts. Existing variant ids do not change.'))
+    parser.add_argument('--packed-counts', action='store_true',
+        help=('Store the cancer type patient counts of each variant packed '
+            'in one binary variant table column instead of the variant '
+            'cancer type patient count table. The database is smaller and '
+            'a variant subtable is read with a single primary key lookup.'))
+    parser.add_argument('--resume', action='store_true',
+        help=('Continue an interrupted import after its last committed batch '
+            'instead of starting from scratch. Use the same options as the '
+            'interrupted import (e.g. --shadow resumes the shadow database '
+            'import). Interrupted --bulk-load imports must be re-run.'))
+    parser.add_argument('--column-index', action='store_true',
+        help=('Also write a memory-mapped column index of the variant table '
+            'next to the database, which web workers use to search, filter '
+            'and sort variant table pages without SQL queries.'))
+    parser.add_argument('--sharded', action='store_true',
+        help=('Store variants in one database per chromosome (requires '
+            'SHARDED_DB=1). The VCF is split by chromosome and --workers '
+            'shards are imported in parallel.'))
+    args = parser.parse_args()
+    if args.sharded and not settings.SHARDED_DB:
+        parser.error('--sharded requires SHARDED_DB=1 in the .env file')
+    if args.sharded and (args.shadow or args.diff or args.resume):
+        parser.error('--sharded cannot be combined with --shadow, --diff '
+                     'or --resume (the databases are always built in new files)')
+    if args.diff and args.bulk_load:
+        parser.error('--diff cannot be combined with --bulk-load')
+    if args.diff and args.packed_counts:
+        parser.error('--diff cannot be combined with --packed-counts')
+    if args.diff and args.resume:
+        parser.error('--diff cannot be combined with --resume')
+    if args.bulk_load and args.resume:
+        parser.error('--bulk-load cannot be combined with --resume (an '
+                     'interrupted bulk load must be re-run)')
+    if args.workers < 1:
+        parser.error('--workers must be a positive integer')
+    if settings.DB_READ_ONLY:
+        parser.error('DB_READ_ONLY must not be set for the import (it is '
+                     'only used by the web server)')
+    return args
+
 
 if __name__ == '__main__':
-    reset_db()
\ No newline at end of file
+    args = parse_args()
+    if args.sharded:
+        reset_sharded_db(workers=args.workers, bulk_load=args.bulk_load,
+                         packed_counts=args.packed_counts,
+                         column_index=args.column_index)
+    else:
+        reset_db(workers=args.workers, shadow=args.shadow,
+                 bulk_load=args.bulk_load, diff=args.diff,
+                 packed_counts=args.packed_counts, resume=args.resume,
+                 column_index=args.column_index)
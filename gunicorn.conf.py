@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration of the Docker web server (see compose.yml).
+
+The Django application is loaded and warmed up (see main.dataset.warm_up)
+once in the master process, before the workers are forked, so restarted
+and added workers share its imported modules, compiled templates and
+dataset caches and serve their first request at steady-state latency.
+
+With ASYNC_VIEWS=1 the ASGI application is served by uvicorn workers, which
+run the async versions of the ajax endpoints (see main/views.py).
+"""
+import os
+from pathlib import Path
+
+import dotenv
+
+# Read the .env file like the Django settings, as the worker class
+# depends on ASYNC_VIEWS.
+dotenv_path = Path(__file__).parent / '.env'
+if dotenv_path.is_file():
+    dotenv.load_dotenv(dotenv_path)
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+preload_app = True
+
+if os.environ.get('ASYNC_VIEWS', '').strip().lower() in {
+        '1', 'true', 'yes', 'on'}:
+    wsgi_app = 'nhs_genie_project.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'nhs_genie_project.wsgi:application'
+
+
+def when_ready(server):
+    """Warm up the preloaded application before the workers are forked."""
+    if server.cfg.preload_app:
+        from main.dataset import warm_up
+        state = warm_up()
+        server.log.info('Warm-up: %s', state)
+
+
+def post_worker_init(worker):
+    """Warm up each worker if the application is not preloaded (e.g. with
+    --reload or --no-preload)."""
+    if not worker.cfg.preload_app:
+        from main.dataset import warm_up
+        state = warm_up()
+        worker.log.info('Warm-up: %s', state)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class MainConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "main"
+
+    def ready(self):
+        # Reconnect to the database after db_importer.py swaps in a new
+        # database file, so workers do not need to be restarted.
+        from main.dataset import reopen_swapped_databases
+        request_started.connect(reopen_swapped_databases,
+            dispatch_uid='main_reopen_swapped_databases')
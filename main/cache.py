@@ -0,0 +1,380 @@
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from main.dataset import get_dataset_metadata, get_db_file_identity
+
+try:
+    import brotli
+except ImportError:  # Optional, responses are only pre-compressed with gzip.
+    brotli = None
+
+# Django cache alias of the shared serialised results cache.
+RESULT_CACHE = 'results'
+
+# Content encodings of the pre-compressed warm cache responses (keys) and
+# their file extensions (values) in the order of preference.
+WARM_ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+class SQLiteLRUCache(BaseCache):
+    """A Django cache backend that stores entries in a local SQLite file,
+    so the cache is shared by all worker processes without a separate
+    cache server. The total size of the stored values is limited by the
+    MAX_SIZE_MB option and the least recently used entries are evicted
+    first. The access time of an entry is refreshed at most every
+    ACCESS_REFRESH_SECONDS, so most cache hits do not write.
+
+    Parameters
+    ----------
+    location : str
+        Path to the cache database file.
+    params : dict
+        Cache settings (see django.core.cache.backends.base.BaseCache).
+    """
+
+    # Minimum age of the access time of an entry before a cache hit
+    # refreshes it.
+    ACCESS_REFRESH_SECONDS = 60
+
+    def __init__(self, location: str, params: dict):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._max_size = int(float(options.get('MAX_SIZE_MB', 256)) * 2**20)
+        self._local = threading.local()
+
+    def _get_db(self) -> sqlite3.Connection:
+        """Get the cache database connection of the current thread
+        (forked worker processes open their own connections)."""
+        pid, db = getattr(self._local, 'db', (None, None))
+        if db is None or pid != os.getpid():
+            db = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            # The total size of the entries is kept up to date by
+            # triggers, so inserts do not sum the sizes of all entries.
+            db.executescript(
+                'BEGIN IMMEDIATE;'
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'size INTEGER NOT NULL, expires REAL, '
+                'accessed REAL NOT NULL);'
+                'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);'
+                'CREATE TABLE IF NOT EXISTS cache_size ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), '
+                'total INTEGER NOT NULL);'
+                'INSERT OR IGNORE INTO cache_size '
+                'SELECT 0, COALESCE(SUM(size), 0) FROM cache;'
+                'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON '
+                'cache BEGIN UPDATE cache_size SET total = total + NEW.size; '
+                'END;'
+                'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF '
+                'size ON cache BEGIN UPDATE cache_size '
+                'SET total = total + NEW.size - OLD.size; END;'
+                'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON '
+                'cache BEGIN UPDATE cache_size SET total = total - OLD.size; '
+                'END;'
+                'COMMIT;'
+            )
+            self._local.db = (os.getpid(), db)
+        return db
+
+    def _expiry(self, timeout) -> float:
+        """Get the expiry time of a timeout (None if it never expires)."""
+        timeout = self.get_backend_timeout(timeout)
+        return None if timeout is None else time.time() + timeout
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._get_db()
+        row = db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        now = time.time()
+        if expires is not None and expires <= now:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return default
+        if now - accessed >= self.ACCESS_REFRESH_SECONDS:
+            db.execute('UPDATE cache SET accessed = ? WHERE key = ?',
+                       (now, key))
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(key, value, timeout, version, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(key, value, timeout, version, replace=False)
+
+    def _set(self, key, value, timeout, version, replace: bool) -> bool:
+        """Store an entry and evict the least recently used entries that
+        do not fit into the maximum cache size."""
+        key = self.make_and_validate_key(key, version=version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(value) > self._max_size:
+            return False
+        now = time.time()
+        db = self._get_db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if not replace:
+                # Expired entries do not block add().
+                db.execute('DELETE FROM cache WHERE key = ? AND expires <= ?',
+                           (key, now))
+            # An upsert instead of INSERT OR REPLACE, whose deletes do not
+            # run the cache_delete trigger.
+            cur = db.execute(
+                'INSERT INTO cache (key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO ' + (
+                    'UPDATE SET value = excluded.value, size = excluded.size, '
+                    'expires = excluded.expires, accessed = excluded.accessed'
+                    if replace else 'NOTHING'),
+                (key, value, len(value), self._expiry(timeout), now)
+            )
+            stored = cur.rowcount > 0
+            self._evict(db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return stored
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        """Evict the least recently used entries (read in the order of
+        the cache_accessed index) until the cache fits into its maximum
+        size."""
+        excess = db.execute('SELECT total FROM cache_size').fetchone()[0] \
+            - self._max_size
+        if excess <= 0:
+            return
+        keys = []
+        cur = db.execute('SELECT key, size FROM cache ORDER BY accessed')
+        for key, size in cur:
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        cur.close()
+        db.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cur = self._get_db().execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (self._expiry(timeout), key))
+        return cur.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cur = self._get_db().execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cur.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._get_db().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)', (key, time.time())).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._get_db().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Connections are kept open between requests.
+        pass
+
+
+def get_result_cache() -> BaseCache:
+    """
+    Get the shared serialised results cache.
+
+    Returns
+    -------
+    BaseCache
+        The RESULT_CACHE cache, or None if it is not configured.
+    """
+    try:
+        return caches[RESULT_CACHE]
+    except InvalidCacheBackendError:
+        return None
+
+
+def get_result_cache_key(name: str, params: dict) -> str:
+    """
+    Get a results cache key. Keys include the GENIE version and the
+    build id and file identity of the database, so results of an older
+    dataset are never returned after db_importer.py loads new data.
+
+    Parameters
+    ----------
+    name : str
+        Result name (e.g. view name).
+    params : dict
+        JSON serialisable parameters the result depends on.
+
+    Returns
+    -------
+    str
+        Cache key, or None if the database has no build id (no dataset
+        has been imported).
+    """
+    metadata = get_dataset_metadata()
+    build_id = metadata.get('build_id')
+    if not build_id:
+        return None
+    # The GENIE version of the imported dataset is used instead of the
+    # settings, which can differ between the importer and running workers.
+    key_data = json.dumps(
+        [metadata.get('genie_version'), build_id, get_db_file_identity(),
+         params],
+        sort_keys=True, default=str)
+    return f'{name}:{hashlib.sha256(key_data.encode()).hexdigest()}'
+
+
+def get_cached_json(name: str, params: dict, get_data) -> bytes:
+    """
+    Get a serialised JSON result from the shared results cache, or
+    compute, serialise and cache it.
+
+    Parameters
+    ----------
+    name : str
+        Result name (e.g. view name).
+    params : dict
+        JSON serialisable parameters the result depends on.
+    get_data : callable
+        Function without arguments that returns the JSON serialisable
+        result.
+
+    Returns
+    -------
+    bytes
+        JSON encoded result.
+    """
+    cache = get_result_cache()
+    key = get_result_cache_key(name, params) if cache is not None else None
+    if key is not None:
+        content = cache.get(key)
+        if content is not None:
+            return content
+    content = json.dumps(get_data(), cls=DjangoJSONEncoder).encode()
+    if key is not None:
+        cache.set(key, content, None)
+    return content
+
+
+def clear_result_cache() -> None:
+    """Remove all entries from the shared results cache (if any)."""
+    cache = get_result_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def _get_warm_path(key: str) -> Path:
+    """Get the warm cache file path (without the encoding extension) of
+    a results cache key. Files are stored in one folder per build."""
+    build_id = get_dataset_metadata().get('build_id')
+    return Path(settings.WARM_CACHE_FOLDER) / build_id / \
+        f"{key.replace(':', '-')}.json"
+
+
+def _get_accepted_encodings(accept_encoding: str) -> set:
+    """Get content codings accepted by a client from its Accept-Encoding
+    header (codings with q=0 are not accepted)."""
+    encodings = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if coding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            encodings.add(coding.lower())
+    return encodings
+
+
+def write_warm_response(key: str, content: bytes) -> list:
+    """
+    Store pre-compressed copies of a serialised result in the warm cache
+    (brotli copies only if the brotli package is installed).
+
+    Parameters
+    ----------
+    key : str
+        Results cache key (see get_result_cache_key).
+    content : bytes
+        JSON encoded result.
+
+    Returns
+    -------
+    list
+        Paths of the written files.
+    """
+    path = _get_warm_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compressed = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(content)
+    paths = []
+    for encoding, data in compressed.items():
+        encoded_path = path.with_name(path.name + WARM_ENCODINGS[encoding])
+        # Written to a temporary file and renamed, so web workers never
+        # read a partial file.
+        tmp_path = encoded_path.with_name(encoded_path.name + '.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, encoded_path)
+        paths.append(encoded_path)
+    return paths
+
+
+def get_warm_response(key: str, accept_encoding: str) -> tuple:
+    """
+    Get a pre-compressed serialised result from the warm cache.
+
+    Parameters
+    ----------
+    key : str
+        Results cache key (see get_result_cache_key).
+    accept_encoding : str
+        Client Accept-Encoding header.
+
+    Returns
+    -------
+    tuple
+        Compressed content (bytes) and its content encoding (str), or
+        None if the result is not in the warm cache in an encoding that
+        the client accepts.
+    """
+    accepted = _get_accepted_encodings(accept_encoding)
+    path = _get_warm_path(key)
+    for encoding, extension in WARM_ENCODINGS.items():
+        if encoding not in accepted:
+            continue
+        try:
+            return path.with_name(path.name + extension).read_bytes(), encoding
+        except OSError:
+            continue
+    return None
+
+
+def remove_old_warm_responses() -> None:
+    """Remove the warm cache files of all builds except the current one."""
+    build_id = get_dataset_metadata().get('build_id')
+    folder = Path(settings.WARM_CACHE_FOLDER)
+    if not folder.is_dir():
+        return
+    for build_folder in folder.iterdir():
+        if build_folder.name != build_id:
+            shutil.rmtree(build_folder, ignore_errors=True)
@@ -0,0 +1,313 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from main.dataset import get_dataset_metadata
+
+# Variant table columns stored in the column index: variant model fields
+# (keys) and their array names (values). Text fields are dictionary
+# encoded with sorted dictionaries, so their codes sort like the text.
+COLUMN_INDEX_FIELDS = {
+    'id': 'id',
+    'chrom': 'chrom',
+    'pos': 'pos',
+    'end_pos': 'end_pos',
+    'gene_symbol_upper': 'gene',
+    'worst_consequence': 'consequence',
+    'consequence_category': 'consequence_category',
+    'allele_type': 'allele_type',
+    'all_cancers_count': 'all_cancers_count',
+    'haemonc_cancers_count': 'haemonc_cancers_count',
+    'solid_cancers_count': 'solid_cancers_count',
+}
+# Dictionary-encoded arrays.
+DICTIONARY_COLUMNS = ('chrom', 'consequence', 'consequence_category',
+                      'allele_type')
+# Variant table "data-field" names (see lookups.VARIANT_TABLE_FIELDS)
+# that the column index can sort by (keys) and their arrays (values).
+COLUMN_INDEX_SORT_FIELDS = {
+    'variant_id': 'id',
+    'pos': 'pos',
+    'consequence': 'consequence',
+    'consequence_category': 'consequence_category',
+    'allele_type': 'allele_type',
+    'all_cancers_count': 'all_cancers_count',
+    'haemonc_cancers_count': 'haemonc_cancers_count',
+    'solid_cancers_count': 'solid_cancers_count',
+}
+
+
+def write_column_index(dbs: list, build_id: str) -> Path:
+    """
+    Write the column index of an imported dataset: one NumPy array file
+    per variant table column, with the rows sorted by chromosome,
+    position and id, a "locus" array ((chromosome code << 32) | pos) for
+    region searches and gene row ranges for gene searches. Web workers
+    memory-map the files, so they share one copy in the page cache.
+
+    Parameters
+    ----------
+    dbs : list
+        sqlite3 connections to the databases with variants (the default
+        database or all shards).
+    build_id : str
+        Dataset build id. The index is written to a folder named after
+        it in settings.COLUMN_INDEX_FOLDER.
+
+    Returns
+    -------
+    Path
+        Column index folder.
+    """
+    sql = 'SELECT {} FROM main_variant'.format(', '.join(COLUMN_INDEX_FIELDS))
+    variants = pd.concat([pd.read_sql_query(sql, db) for db in dbs],
+                         ignore_index=True)
+    variants = variants.rename(columns=COLUMN_INDEX_FIELDS)
+    dictionaries = {}
+    for name in DICTIONARY_COLUMNS + ('gene',):
+        codes, values = pd.factorize(variants[name].fillna(''), sort=True)
+        variants[name] = codes
+        dictionaries[name] = values.tolist()
+    variants = variants.sort_values(['chrom', 'pos', 'id'], kind='stable')\
+        .reset_index(drop=True)
+    # Interval end positions are not less than start positions, as in
+    # the R*Tree interval index.
+    variants['end_pos'] = np.maximum(variants['end_pos'], variants['pos'])
+
+    arrays = {
+        'id': variants['id'].to_numpy(np.int64),
+        'pos': variants['pos'].to_numpy(np.uint32),
+        'end_pos': variants['end_pos'].to_numpy(np.uint32),
+        'locus': (variants['chrom'].to_numpy(np.uint64) << np.uint64(32))
+                 | variants['pos'].to_numpy(np.uint64),
+    }
+    for name in DICTIONARY_COLUMNS:
+        arrays[name] = variants[name].to_numpy(np.uint16)
+    for name in ('all_cancers_count', 'haemonc_cancers_count',
+                 'solid_cancers_count'):
+        arrays[name] = variants[name].to_numpy(np.uint32)
+    # Rows of each gene ordered by position and id, and the range of the
+    # rows of gene code i (gene_rows[gene_offsets[i]:gene_offsets[i + 1]]).
+    gene_codes = variants['gene'].to_numpy()
+    arrays['gene_rows'] = np.lexsort(
+        (arrays['id'], arrays['pos'], gene_codes)).astype(np.int64)
+    arrays['gene_offsets'] = np.searchsorted(
+        gene_codes[arrays['gene_rows']],
+        np.arange(len(dictionaries['gene']) + 1)).astype(np.int64)
+    # Longest variant of each chromosome, which limits how far before a
+    # region an overlapping variant can start.
+    spans = (variants['end_pos'] - variants['pos']).groupby(variants['chrom'])\
+        .max()
+    max_spans = [int(spans.get(code, 0))
+                 for code in range(len(dictionaries['chrom']))]
+
+    folder = Path(settings.COLUMN_INDEX_FOLDER)
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / build_id
+    tmp_path = Path(tempfile.mkdtemp(dir=folder, prefix='.tmp-'))
+    try:
+        for name, array in arrays.items():
+            np.save(tmp_path / f'{name}.npy', array)
+        (tmp_path / 'meta.json').write_text(json.dumps({
+            'build_id': build_id,
+            'rows': len(variants),
+            'dictionaries': dictionaries,
+            'max_spans': max_spans,
+        }))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return path
+
+
+def remove_old_column_indexes(build_id: str = None) -> None:
+    """
+    Remove the column indexes of other dataset builds (workers that
+    still use them keep their memory-mapped files until they reload).
+
+    Parameters
+    ----------
+    build_id : str, optional
+        Dataset build id of the index to keep (all are removed if None).
+    """
+    folder = Path(settings.COLUMN_INDEX_FOLDER)
+    if not folder.is_dir():
+        return
+    for path in folder.iterdir():
+        if path.name != build_id:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ColumnIndex:
+    """Memory-mapped column index of a dataset build written by
+    write_column_index. Searches return row numbers, which are
+    filtered, counted and sorted with NumPy, so only the variants of the
+    requested page have to be read from the database.
+
+    Parameters
+    ----------
+    path : Path
+        Column index folder.
+    """
+
+    def __init__(self, path: Path):
+        meta = json.loads((path / 'meta.json').read_text())
+        self.build_id = meta['build_id']
+        self.dictionaries = meta['dictionaries']
+        self.max_spans = meta['max_spans']
+        self.codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self.dictionaries.items()
+        }
+        self.arrays = {
+            p.stem: np.load(p, mmap_mode='r') for p in path.glob('*.npy')
+        }
+
+    def find_gene_rows(self, gene: str) -> np.ndarray:
+        """Returns the rows of the variants of an (upper-cased) gene
+        symbol ordered by position and id."""
+        code = self.codes['gene'].get(gene)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        offsets = self.arrays['gene_offsets']
+        return np.asarray(
+            self.arrays['gene_rows'][offsets[code]:offsets[code + 1]])
+
+    def find_region_rows(self, chrom: str, start: int, end: int) -> np.ndarray:
+        """Returns the rows of the variants that overlap a region ordered
+        by position and id."""
+        code = self.codes['chrom'].get(chrom)
+        if code is None or end < 0:
+            return np.empty(0, dtype=np.int64)
+        locus = self.arrays['locus']
+        first = min(max(start - self.max_spans[code], 0), 2**32 - 1)
+        last = min(end, 2**32 - 1)
+        lo = np.searchsorted(locus, np.uint64((code << 32) | first))
+        hi = np.searchsorted(locus, np.uint64((code << 32) | last),
+                             side='right')
+        rows = np.arange(lo, hi, dtype=np.int64)
+        return rows[self.arrays['end_pos'][lo:hi] >= start]
+
+    def get_page(self, rows: np.ndarray, offset: int, limit: int,
+                 sort: str = 'pos', order: str = 'asc',
+                 consequence: str = None, pos_bounds: tuple = None,
+                 consequence_categories: list = None,
+                 allele_types: list = None) -> dict:
+        """
+        Filter, count and sort searched rows and return the variant ids
+        of one page (see lookups.get_variants_page).
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            Rows found by find_gene_rows or find_region_rows.
+        offset : int
+            Number of rows to skip.
+        limit : int
+            Maximum number of rows to return.
+        sort : str, optional
+            Variant table "data-field" name in COLUMN_INDEX_SORT_FIELDS.
+        order : str, optional
+            Sort order, 'asc' or 'desc'.
+        consequence : str, optional
+            Consequence to filter by.
+        pos_bounds : tuple, optional
+            (start, end) inclusive position bounds (None if unbounded) to
+            filter by.
+        consequence_categories : list, optional
+            Selected consequence categories, or None to not filter by them.
+        allele_types : list, optional
+            Selected allele types, or None to not filter by them.
+
+        Returns
+        -------
+        dict
+            'ids' (variant ids of the page), 'total', 'totalNotFiltered',
+            'consequences' and 'consequence_counts' (see
+            lookups.get_variants_page).
+        """
+        arrays = self.arrays
+        consequences = arrays['consequence'][rows]
+        dictionary = self.dictionaries['consequence']
+        result = {
+            'totalNotFiltered': len(rows),
+            'consequences': [dictionary[code]
+                             for code in np.unique(consequences)],
+        }
+
+        mask = np.ones(len(rows), dtype=bool)
+        if consequence is not None:
+            mask &= consequences == self.codes['consequence'].get(
+                consequence, -1)
+        if pos_bounds is not None:
+            start, end = pos_bounds
+            pos = arrays['pos'][rows]
+            if end is not None:
+                mask &= pos <= end
+            if start is not None:
+                mask &= pos >= start
+        for name, values in (('consequence_category', consequence_categories),
+                             ('allele_type', allele_types)):
+            if values is not None:
+                codes = [self.codes[name][value] for value in values
+                         if value in self.codes[name]]
+                mask &= np.isin(arrays[name][rows], codes)
+        rows = rows[mask]
+        codes, counts = np.unique(consequences[mask], return_counts=True)
+        result['total'] = len(rows)
+        result['consequence_counts'] = {
+            dictionary[code]: int(count) for code, count in zip(codes, counts)
+        }
+
+        # Ties keep the position order (see lookups._get_variant_ordering).
+        ids = arrays['id'][rows]
+        pos = arrays['pos'][rows]
+        values = arrays[COLUMN_INDEX_SORT_FIELDS[sort]][rows].astype(np.int64)
+        if order == 'desc':
+            values = -values
+        page = np.lexsort((ids, pos, values))[offset:offset + limit]
+        result['ids'] = ids[page].tolist()
+        return result
+
+
+# Dataset build id and column index loaded by this process.
+_loaded_index = (None, None)
+
+
+def get_column_index() -> ColumnIndex:
+    """
+    Get the column index of the served dataset. It is loaded once per
+    dataset build and process.
+
+    Returns
+    -------
+    ColumnIndex
+        Column index, or None if it was not written for the dataset
+        build (db_importer.py --column-index).
+    """
+    global _loaded_index
+    build_id = get_dataset_metadata().get('build_id')
+    if not build_id:
+        return None
+    if _loaded_index[0] != build_id:
+        path = Path(settings.COLUMN_INDEX_FOLDER) / build_id
+        # Not cached if missing, as it may be written after the dataset
+        # metadata.
+        if not (path / 'meta.json').is_file():
+            return None
+        _loaded_index = (build_id, ColumnIndex(path))
+    return _loaded_index[1]
+
+
+def unload_column_index() -> None:
+    """Forget the column index loaded by this process."""
+    global _loaded_index
+    _loaded_index = (None, None)
@@ -1,8 +1,13 @@
 from django.conf import settings
 
+from main.dataset import get_dataset_metadata
+
 def project_settings(request):
     """Provides selected Django project settings to all templates."""
     return {
-        'GENIE_VERSION': settings.GENIE_VERSION,
+        # The version of the imported dataset takes precedence, so it is
+        # up to date after the database is swapped without a restart.
+        'GENIE_VERSION': (get_dataset_metadata().get('genie_version')
+            or settings.GENIE_VERSION),
         'GOOGLE_ANALYTICS_ID': settings.GOOGLE_ANALYTICS_ID,
-    }
\ No newline at end of file
+    }
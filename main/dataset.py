@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template.loader import get_template
+
+from main.models import DatasetMetadata
+
+# Database file identities observed by this process and by its threads
+# (each thread has its own database connections, e.g. the async view
+# threads), used to detect that db_importer.py has swapped in a new
+# database file.
+_db_file_identities = {}
+_thread_db_file_identities = threading.local()
+# Warm-up state of this process (see warm_up), inherited by the web
+# workers forked from a preloading gunicorn master process.
+_warm_state = {}
+
+
+def get_db_file_identity(alias: str = 'default') -> tuple:
+    """
+    Get the identity of a database file. A database rebuilt in a shadow
+    file and renamed over the live one gets a new identity, although
+    its path does not change. In the read-only mode (DB_READ_ONLY), so
+    does a database modified in place (e.g. by migrations), which the
+    immutable connections would not notice. Otherwise in-place writes
+    (e.g. sessions) keep the identity, but an in-place import (e.g.
+    db_importer.py --diff without --shadow) changes it, as every import
+    rewrites its import report once its data is committed.
+
+    Parameters
+    ----------
+    alias : str
+        Django database alias.
+
+    Returns
+    -------
+    tuple
+        Database file device and inode numbers, and its modification
+        time and size in the read-only mode or else the import report
+        modification time (if any). None if the file does not exist
+        (e.g. in-memory test databases).
+    """
+    try:
+        stat = os.stat(connections[alias].settings_dict['NAME'])
+    except (OSError, TypeError, ValueError):
+        return None
+    if settings.DB_READ_ONLY:
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    try:
+        report_mtime = os.stat(get_import_report_path(alias)).st_mtime_ns
+    except OSError:
+        report_mtime = None
+    return (stat.st_dev, stat.st_ino, report_mtime)
+
+
+def get_import_report_path(alias: str = 'default') -> Path:
+    """
+    Get the path of the JSON import report that db_importer.py writes
+    next to the database file.
+
+    Parameters
+    ----------
+    alias : str
+        Django database alias.
+
+    Returns
+    -------
+    Path
+    """
+    return Path(f"{connections[alias].settings_dict['NAME']}.import-report.json")
+
+
+def get_import_report(alias: str = 'default') -> dict:
+    """
+    Read the JSON import report of the database.
+
+    Parameters
+    ----------
+    alias : str
+        Django database alias.
+
+    Returns
+    -------
+    dict
+        Import report items. Empty if the report does not exist.
+    """
+    try:
+        return json.loads(get_import_report_path(alias).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+@lru_cache(maxsize=1)
+def get_dataset_metadata() -> dict:
+    """
+    Get metadata of the imported GENIE dataset (e.g. genie_version,
+    build_id and built_at) written by db_importer.py.
+
+    Returns
+    -------
+    dict
+        Metadata keys and values. Empty if the database has no metadata.
+    """
+    try:
+        return dict(DatasetMetadata.objects.values_list('key', 'value'))
+    except DatabaseError:
+        return {}
+
+
+@lru_cache(maxsize=1)
+def get_code_version() -> float:
+    """
+    Get the version of the deployed templates and static files (the
+    modification time of the newest file), so cached pages are not
+    reused after a deployment without a data update. Computed once per
+    process (workers are restarted by deployments).
+
+    Returns
+    -------
+    float
+        Modification time of the newest file.
+    """
+    mtime = 0.0
+    for folder in (Path(__file__).parent / 'templates',
+                   settings.BASE_DIR / 'static'):
+        for root, _, files in os.walk(folder):
+            for name in files:
+                try:
+                    mtime = max(mtime, os.stat(Path(root) / name).st_mtime)
+                except OSError:
+                    continue
+    return mtime
+
+
+def get_dataset_etag() -> str:
+    """
+    Get the HTTP entity tag of the responses built from the imported
+    dataset. It changes when db_importer.py loads new data (GENIE
+    version, build id and database file identity) or the code is
+    deployed, and is weak because responses are also served compressed.
+
+    Returns
+    -------
+    str
+        Weak ETag header value, or None if no dataset has been imported.
+    """
+    metadata = get_dataset_metadata()
+    build_id = metadata.get('build_id')
+    if not build_id:
+        return None
+    key_data = json.dumps(
+        [metadata.get('genie_version') or settings.GENIE_VERSION, build_id,
+         get_db_file_identity(), get_code_version()],
+        default=str)
+    return f'W/"{hashlib.sha256(key_data.encode()).hexdigest()[:32]}"'
+
+
+def get_dataset_last_modified() -> float:
+    """
+    Get the time the imported dataset was built.
+
+    Returns
+    -------
+    float
+        POSIX timestamp of the dataset built_at metadata, or None if it
+        is missing or not valid.
+    """
+    try:
+        return datetime.fromisoformat(
+            get_dataset_metadata()['built_at']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def warm_db_page_cache() -> None:
+    """
+    Ask the operating system to read the database files into its page
+    cache in the background, so the first requests of the workers do
+    not wait for disk reads. The page cache is shared by all workers
+    (memory-mapped in the read-only mode, see DB_READ_ONLY).
+
+    Returns
+    -------
+    None
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for alias in connections:
+        try:
+            fd = os.open(connections[alias].settings_dict['NAME'], os.O_RDONLY)
+        except (OSError, TypeError, ValueError):
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def warm_up() -> dict:
+    """
+    Fill the per-process caches of the dataset derived data, compile the
+    templates and read the database, so a web worker serves its first
+    request at steady-state latency. gunicorn.conf.py runs it in the
+    master process before the workers are forked, so they share the
+    warm caches. Database connections are closed afterwards, as SQLite
+    connections must not be used across a fork.
+
+    Returns
+    -------
+    dict
+        Warm-up state (see get_warm_state).
+    """
+    # Imported here to avoid circular imports.
+    from main.column_index import get_column_index
+    from main.lookups import (
+        get_cancer_types, get_gene_dbs, get_ordered_cancer_types
+    )
+
+    started = time.perf_counter()
+    try:
+        get_dataset_metadata()
+        get_cancer_types()
+        get_ordered_cancer_types()
+        get_gene_dbs()
+        get_column_index()
+        get_code_version()
+        templates = Path(__file__).parent / 'templates'
+        for path in sorted(templates.rglob('*.html')):
+            get_template(path.relative_to(templates).as_posix())
+    except DatabaseError as e:
+        # E.g. the database is not migrated yet. Workers fill the caches
+        # on their first requests instead.
+        _warm_state.update(warm=False, error=str(e))
+        return get_warm_state()
+    finally:
+        connections.close_all()
+    _warm_state.update(
+        warm=True, error=None,
+        warmed_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        seconds=round(time.perf_counter() - started, 3))
+    return get_warm_state()
+
+
+def get_warm_state() -> dict:
+    """
+    Get the warm-up state of this process.
+
+    Returns
+    -------
+    dict
+        'warm' (whether warm_up has filled the caches), 'warmed_at',
+        'seconds' (warm-up duration) and 'error' (why warm_up failed).
+    """
+    return {'warm': False, 'warmed_at': None, 'seconds': None, 'error': None,
+            **_warm_state}
+
+
+def reset_dataset_caches() -> None:
+    """Clear all per-process caches of the dataset derived data."""
+    # Imported here to avoid circular imports.
+    from main.column_index import unload_column_index
+    from main.lookups import (
+        get_cancer_types, get_gene_dbs, get_ordered_cancer_types
+    )
+
+    get_dataset_metadata.cache_clear()
+    get_cancer_types.cache_clear()
+    get_gene_dbs.cache_clear()
+    get_ordered_cancer_types.cache_clear()
+    unload_column_index()
+
+
+def reopen_swapped_databases(**kwargs) -> None:
+    """
+    Close the database connections of the current thread to files that
+    were replaced since its previous request, so Django reconnects to
+    the new database file, and clear the caches built from the old data
+    once per process. Connected to the request_started signal in
+    MainConfig.ready() and run by the async view threads (see
+    views.run_in_db_thread).
+
+    Returns
+    -------
+    None
+    """
+    if not hasattr(_thread_db_file_identities, 'aliases'):
+        _thread_db_file_identities.aliases = {}
+    thread_identities = _thread_db_file_identities.aliases
+    swapped = False
+    for alias in connections:
+        identity = get_db_file_identity(alias)
+        if identity is None:
+            continue
+        if thread_identities.get(alias, identity) != identity:
+            connections[alias].close()
+        thread_identities[alias] = identity
+        previous = _db_file_identities.get(alias)
+        _db_file_identities[alias] = identity
+        if previous is not None and previous != identity:
+            connections[alias].close()
+            swapped = True
+    if swapped:
+        reset_dataset_caches()
@@ -1,7 +1,75 @@
-from main.models import CancerType, Variant, VariantCancerTypePatientCount
-from main.utils import get_worst_csq_term, get_consequence_category
+import heapq
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Count, F, IntegerField, Q, TextField, \
+    Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, NullIf, StrIndex, \
+    Substr
+
+from main.column_index import COLUMN_INDEX_SORT_FIELDS, get_column_index
+from main.models import (
+    VARIANT_INTERVAL_TABLE, CancerType, GeneAlias, Variant,
+    VariantCancerTypePatientCount
+)
+from main.utils import CHROMOSOMES, unpack_cancer_type_pcs
+from main.vcf import CANCER_PC_PREFIXES
 from functools import lru_cache
 
+# Variant ids in the per-chromosome shards (settings.SHARDED_DB) start
+# at (chromosome index in CHROMOSOMES + 1) * SHARD_ID_STRIDE, so the
+# shard of a variant can be found from its id.
+SHARD_ID_STRIDE = 10 ** 9
+
+# Variant table "data-field" properties in "variants.html" template
+# (keys) and the respective variant model fields (values).
+VARIANT_TABLE_FIELDS = {
+    'variant_id': 'id',
+    'chrom': 'chrom',
+    'pos': 'pos',
+    'allele_type': 'allele_type',
+    'consequence': 'worst_consequence',
+    'consequence_category': 'consequence_category',
+    'hgvs_c': 'hgvs_c_formatted',
+    'hgvs_p': 'hgvs_p_formatted',
+    'gene': 'gene_symbol',
+    'refseq_transcript': 'refseq_transcript',
+    'protein_pos': 'protein_pos',
+    'haemonc_cancers_count': 'haemonc_cancers_count',
+    'solid_cancers_count': 'solid_cancers_count',
+    'all_cancers_count': 'all_cancers_count',
+}
+
+# Variant table columns with an input filter control (case-insensitive
+# "contains" filters). Position columns filters are parsed by
+# _get_position_filter.
+VARIANT_TABLE_TEXT_FILTERS = (
+    'chrom', 'hgvs_c', 'hgvs_p', 'refseq_transcript', 'gene'
+)
+# Variant table columns matched by the table search box.
+VARIANT_TABLE_SEARCH_FIELDS = (
+    'chrom', 'pos', 'consequence', 'hgvs_c', 'hgvs_p', 'protein_pos',
+    'refseq_transcript', 'gene'
+)
+# Variant table columns with few distinct, often long values which are
+# dictionary-encoded in the columnar variant table data format.
+VARIANT_TABLE_DICT_FIELDS = (
+    'chrom', 'allele_type', 'consequence', 'consequence_category', 'gene',
+    'refseq_transcript'
+)
+# Maximum number of variant table rows returned per page.
+MAX_VARIANT_PAGE_SIZE = 1000
+# Number of variant rows fetched from the database at a time when the
+# variant table data is streamed.
+VARIANT_STREAM_CHUNK_SIZE = 2000
+# Maximum number of variant keys of a batch lookup (lookup_variants).
+MAX_BATCH_LOOKUP_KEYS = 10000
+# Number of variants looked up per query in batch lookups (4 SQL
+# parameters per variant key, fewer than the 999 parameters limit of
+# older SQLite versions).
+BATCH_LOOKUP_CHUNK_SIZE = 200
+
 
 @lru_cache(maxsize=1)
 def get_ordered_cancer_types() -> dict:
@@ -25,11 +93,214 @@ def get_ordered_cancer_types() -> dict:
     return ordered_cancer_types
 
 
+@lru_cache(maxsize=1)
+def get_cancer_types() -> dict:
+    """
+    Get cancer types data used in the variant cancer types patient count
+    subtable.
+
+    Returns
+    -------
+    cancer_types: dict
+        Cancer type ids (keys) and (cancer type, category, total patient
+        count) tuples (values).
+    """
+    cancer_types = {}
+    for cancer_type in CancerType.objects.all():
+        if cancer_type.is_haemonc:
+            category = 'HaemOnc'
+        elif cancer_type.is_solid:
+            category = 'Solid'
+        else:
+            category = 'Other'
+        cancer_types[cancer_type.id] = (cancer_type.cancer_type, category,
+            cancer_type.total_patient_count)
+    return cancer_types
+
+
+def get_chrom_db(chrom: str) -> str:
+    """
+    Get the database alias that stores variants of a chromosome.
+
+    Parameters
+    ----------
+    chrom : str
+        Chromosome name (e.g. 17).
+
+    Returns
+    -------
+    str
+        Database alias, or None if there is no shard for the chromosome.
+    """
+    if not settings.SHARDED_DB:
+        return 'default'
+    return settings.VARIANT_SHARDS.get(chrom)
+
+
+def get_variant_db(variant_id: int) -> str:
+    """
+    Get the database alias that stores a variant.
+
+    Parameters
+    ----------
+    variant_id : int
+        A database id of a variant.
+
+    Returns
+    -------
+    str
+        Database alias, or None if the id does not belong to a shard.
+    """
+    if not settings.SHARDED_DB:
+        return 'default'
+    chrom_index = variant_id // SHARD_ID_STRIDE - 1
+    if 0 <= chrom_index < len(CHROMOSOMES):
+        return get_chrom_db(CHROMOSOMES[chrom_index])
+    return None
+
+
+@lru_cache(maxsize=1)
+def get_gene_dbs() -> dict:
+    """
+    Get the shards that store variants of each gene.
+
+    Returns
+    -------
+    dict
+        Upper-cased gene symbols (keys) and tuples of the database
+        aliases of their shards (values).
+    """
+    gene_dbs = {}
+    for db in settings.VARIANT_SHARDS.values():
+        genes = Variant.objects.using(db)\
+            .values_list('gene_symbol_upper', flat=True).distinct()
+        for gene in genes:
+            gene_dbs[gene] = gene_dbs.get(gene, ()) + (db,)
+    return gene_dbs
+
+
+def resolve_gene_symbol(gene: str) -> str:
+    """
+    Resolve a previous or alias gene symbol to the gene symbol used in
+    the variant table (see GeneAlias model).
+
+    Parameters
+    ----------
+    gene : str
+        Gene symbol (case-insensitive).
+
+    Returns
+    -------
+    str
+        Variant table gene symbol, or the gene symbol as is if it is
+        used in the variant table or is not a known alias.
+    """
+    gene_upper = gene.upper()
+    if settings.SHARDED_DB:
+        found = gene_upper in get_gene_dbs()
+    else:
+        found = Variant.objects.filter(gene_symbol_upper=gene_upper).exists()
+    if found:
+        return gene
+    alias = GeneAlias.objects.filter(alias=gene_upper).first()
+    return alias.gene_symbol if alias is not None else gene
+
+
+def parse_region(search_value: str) -> tuple:
+    """
+    Parse a region search value.
+
+    Parameters
+    ----------
+    search_value : str
+        Chromosomal region (e.g. 17:31226000-31227000) or position
+        (e.g. 7:140753336).
+
+    Returns
+    -------
+    tuple
+        Chromosome, start and end positions, or None if the region is
+        malformed or its chromosome is not in CHROMOSOMES.
+    """
+    # Region format: {chrom}:{start_pos}-{end_pos}
+    # Position format: {chrom}:{pos}
+    try:
+        chrom, poses = search_value.split(':')
+        if '-' in poses:
+            start_pos, end_pos = poses.split('-')
+        else:
+            start_pos = end_pos = poses
+        start_pos, end_pos = int(start_pos), int(end_pos)
+    except (ValueError, TypeError):
+        return None
+    if chrom not in CHROMOSOMES:
+        return None
+    return chrom, start_pos, end_pos
+
+
+def get_variant_querysets(search_key: str, search_value: str) -> list:
+    """
+    Route a variant table search to the databases that store the
+    matching variants: a region search goes to the shard of its
+    chromosome and a gene search to the shards that store the gene.
+    Region searches match variants that overlap the region (e.g.
+    deletions that start before it).
+
+    Parameters
+    ----------
+    search_key : str
+        Search type keyword. Must be 'gene' or 'region'.
+    search_value : str
+        Search value - gene name (e.g. NF1), chromosomal region 
+        (e.g. 17:31226000-31227000) or position (e.g. 7:140753336) location.
+
+    Returns
+    -------
+    list
+        Variant querysets ordered by position, one per database. Empty
+        for unknown search keys and malformed regions.
+    """
+    if search_key == 'gene':
+        if settings.SHARDED_DB:
+            dbs = get_gene_dbs().get(search_value.upper(), ())
+        else:
+            dbs = ('default',)
+        return [
+            Variant.objects.using(db)
+                .filter(gene_symbol_upper=search_value.upper())
+                .order_by('pos')
+            for db in dbs
+        ]
+    elif search_key == 'region':
+        region = parse_region(search_value)
+        if region is None:
+            return []
+        chrom, start_pos, end_pos = region
+        db = get_chrom_db(chrom)
+        if db is None:
+            return []
+        # Variants whose (pos, end_pos) interval overlaps the region,
+        # found with the R*Tree interval index.
+        chrom_index = CHROMOSOMES.index(chrom)
+        overlapping_ids = RawSQL(
+            f'SELECT id FROM {VARIANT_INTERVAL_TABLE} WHERE chrom_min <= %s '
+            'AND chrom_max >= %s AND start_pos <= %s AND end_pos >= %s',
+            (chrom_index, chrom_index, end_pos, start_pos)
+        )
+        return [
+            Variant.objects.using(db).filter(id__in=overlapping_ids)
+                .order_by('pos')
+        ]
+    return []
+
+
 def get_variant_cancer_type_pcs(variant_id) -> list:
     """
     Search the database variant cancer type patient count table by
     variant id and return a list variant cancer types patient count
-    data rows for the extended row subtable.
+    data rows for the extended row subtable. Patient counts packed in
+    the variant table (db_importer.py --packed-counts) are decoded
+    instead if present.
 
     Parameters
     ----------
@@ -42,37 +313,305 @@ def get_variant_cancer_type_pcs(variant_id) -> list:
         A list of dictionaries which stores variant cancer types patient 
         counts subtable rows data.
     """
+    try:
+        variant_id = int(variant_id)
+    except (ValueError, TypeError):
+        return []
+    return get_variants_cancer_type_pcs([variant_id]).get(variant_id, [])
 
-    var_pc_cancers = (VariantCancerTypePatientCount.objects
-        .select_related('cancer_type').filter(variant_id=variant_id)
-    )
 
-    data = []
-    for var_pc_cancer in var_pc_cancers:
-        if var_pc_cancer.cancer_type.is_haemonc:
-            category = 'HaemOnc'
-        elif var_pc_cancer.cancer_type.is_solid:
-            category = 'Solid'
-        else:
-            category = 'Other'
-        cancer_type = var_pc_cancer.cancer_type.cancer_type
-        row = {
-            'cancer_type': cancer_type,
-            'cancer_type_order': get_ordered_cancer_types()[cancer_type],
-            'category': category,
-            'same_nucleotide_change_pc': \
-                var_pc_cancer.same_nucleotide_change_pc,
-            'same_amino_acid_change_pc': \
-                var_pc_cancer.same_amino_acid_change_pc,
-            'same_or_downstream_truncating_variants_per_aa_pc': \
-                var_pc_cancer.same_or_downstream_truncating_variants_per_aa_pc,
-            'nested_inframe_deletions_per_aa_pc': \
-                var_pc_cancer.nested_inframe_deletions_per_aa_pc,
-            'cancer_n': var_pc_cancer.cancer_type.total_patient_count,
-        }
-        data.append(row)
+def _chunks(items: list, size: int):
+    """Yields consecutive lists of up to size items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_variants_cancer_type_pcs(variant_ids: list) -> dict:
+    """
+    Get the variant cancer types patient count subtable rows of multiple
+    variants (see get_variant_cancer_type_pcs) with one query per
+    BATCH_LOOKUP_CHUNK_SIZE variants.
+
+    Parameters
+    ----------
+    variant_ids : list
+        Database ids of variants. Invalid and unknown ids are ignored.
+
+    Returns
+    -------
+    dict
+        Variant ids (keys) and lists of their subtable rows (values).
+    """
+    ids_by_db = {}
+    for variant_id in variant_ids:
+        try:
+            variant_id = int(variant_id)
+        except (ValueError, TypeError):
+            continue
+        db = get_variant_db(variant_id)
+        if db is not None:
+            ids_by_db.setdefault(db, []).append(variant_id)
+
+    pc_relation = VariantCancerTypePatientCount._meta.model_name
+    pc_fields = tuple(CANCER_PC_PREFIXES.values())
+    data = {}
+    for db, ids in ids_by_db.items():
+        for chunk in _chunks(ids, BATCH_LOOKUP_CHUNK_SIZE):
+            # Packed counts and subtable rows are read in one query: a
+            # variant without subtable rows (e.g. packed counts) is
+            # joined to a single row of NULL counts.
+            rows = Variant.objects.using(db).filter(id__in=chunk)\
+                .order_by(f'{pc_relation}__id')\
+                .values_list('id', 'cancer_type_counts',
+                             f'{pc_relation}__cancer_type_id',
+                             *(f'{pc_relation}__{f}' for f in pc_fields))
+            for variant_id, packed, cancer_type_id, *pcs in rows:
+                if packed is not None:
+                    data[variant_id] = _get_packed_cancer_type_pcs(packed)
+                    continue
+                data.setdefault(variant_id, [])
+                if cancer_type_id is not None:
+                    data[variant_id].append(
+                        _get_cancer_type_pc_row(cancer_type_id, pcs))
     return data
 
+
+def _get_cancer_type_pc_row(cancer_type_id: int, pcs: list) -> dict:
+    """
+    Build a variant cancer types patient count subtable row.
+
+    Parameters
+    ----------
+    cancer_type_id : int
+        Cancer type database id.
+    pcs : list
+        Patient counts in CANCER_PC_PREFIXES order.
+
+    Returns
+    -------
+    dict
+        Subtable row data.
+    """
+    cancer_type, category, cancer_n = get_cancer_types()[cancer_type_id]
+    return {
+        'cancer_type': cancer_type,
+        'cancer_type_order': get_ordered_cancer_types()[cancer_type],
+        'category': category,
+        **dict(zip(CANCER_PC_PREFIXES.values(), pcs)),
+        'cancer_n': cancer_n,
+    }
+
+
+def _get_packed_cancer_type_pcs(packed: bytes) -> list:
+    """
+    Decode variant cancer types patient count subtable rows from packed
+    patient counts (Variant.cancer_type_counts).
+
+    Parameters
+    ----------
+    packed : bytes
+        Packed variant cancer type patient counts.
+
+    Returns
+    -------
+    data: list
+        A list of dictionaries which stores variant cancer types patient 
+        counts subtable rows data.
+    """
+    records = unpack_cancer_type_pcs(packed)
+    return [
+        _get_cancer_type_pc_row(cancer_type_id, pcs)
+        for cancer_type_id, pcs in zip(records['cancer_type_id'].tolist(),
+                                       records['pcs'].tolist())
+    ]
+
+
+def parse_variant_key(key: str) -> tuple:
+    """
+    Parse a CHROM-POS-REF-ALT variant key (e.g. 17-7675088-C-T, the
+    format of Variant.__str__). A "chr" chromosome prefix is ignored.
+
+    Parameters
+    ----------
+    key : str
+        Variant key.
+
+    Returns
+    -------
+    tuple
+        (chrom, pos, ref, alt), or None if the key is malformed.
+    """
+    if not isinstance(key, str):
+        return None
+    parts = key.strip().split('-')
+    if len(parts) != 4 or not all(parts):
+        return None
+    chrom, pos, ref, alt = parts
+    if chrom[:3].lower() == 'chr':
+        chrom = chrom[3:]
+    try:
+        pos = int(pos)
+    except ValueError:
+        return None
+    return chrom, pos, ref.upper(), alt.upper()
+
+
+def lookup_variants(keys: list, include_cancer_pcs: bool = False) -> list:
+    """
+    Look up variants by their CHROM-POS-REF-ALT keys, e.g. to annotate
+    the variants of a pipeline sample. BATCH_LOOKUP_CHUNK_SIZE keys are
+    joined with the variant table per query, so every key is an index
+    lookup (uniq_variant_locus_allele).
+
+    Parameters
+    ----------
+    keys : list
+        Variant keys (see parse_variant_key).
+    include_cancer_pcs : bool
+        Add the cancer types patient count subtable rows of the found
+        variants (see get_variant_cancer_type_pcs).
+
+    Returns
+    -------
+    list
+        One dictionary per key (in the same order) with the key,
+        whether the variant was found and the variant table fields of
+        the found variants (and their 'cancer_pcs' rows).
+    """
+    fields = dict(VARIANT_TABLE_FIELDS, ref='ref', alt='alt')
+    columns = ', '.join(f'v.{column}' for column in fields.values())
+    keys_by_db = {}
+    for key in keys:
+        parsed = parse_variant_key(key)
+        db = get_chrom_db(parsed[0]) if parsed is not None else None
+        if db is not None:
+            keys_by_db.setdefault(db, set()).add(parsed)
+
+    variants = {}
+    for db, db_keys in keys_by_db.items():
+        with connections[db].cursor() as cursor:
+            for chunk in _chunks(list(db_keys), BATCH_LOOKUP_CHUNK_SIZE):
+                values = ', '.join(['(%s, %s, %s, %s)'] * len(chunk))
+                cursor.execute(
+                    f'SELECT {columns} FROM (VALUES {values}) AS k '
+                    'JOIN main_variant AS v ON v.chrom = k.column1 '
+                    'AND v.pos = k.column2 AND v.ref = k.column3 '
+                    'AND v.alt = k.column4',
+                    [value for key in chunk for value in key]
+                )
+                for row in cursor.fetchall():
+                    variant = dict(zip(fields, row))
+                    variants[(variant['chrom'], variant['pos'],
+                              variant['ref'], variant['alt'])] = variant
+
+    if include_cancer_pcs:
+        cancer_pcs = get_variants_cancer_type_pcs(
+            [variant['variant_id'] for variant in variants.values()])
+        for variant in variants.values():
+            variant['cancer_pcs'] = cancer_pcs.get(variant['variant_id'], [])
+
+    results = []
+    for key in keys:
+        variant = variants.get(parse_variant_key(key))
+        if variant is None:
+            results.append({'key': key, 'found': False})
+        else:
+            results.append({'key': key, 'found': True, **variant})
+    return results
+
+
+def encode_variant_columns(db_rows: list) -> dict:
+    """
+    Encode variant table rows in the columnar format: one list of values
+    per variant table field, with VARIANT_TABLE_DICT_FIELDS values
+    replaced by their indexes in per-field lists of distinct values.
+
+    Parameters
+    ----------
+    db_rows : list
+        Variant table rows as tuples in VARIANT_TABLE_FIELDS order.
+
+    Returns
+    -------
+    dict
+        'columns' (variant table "data-field" names (keys) and lists of
+        their values or dictionary indexes (values)) and 'dictionaries'
+        (dictionary-encoded field names (keys) and lists of their
+        distinct values (values)).
+    """
+    data_fields = tuple(VARIANT_TABLE_FIELDS)
+    if db_rows:
+        columns = dict(zip(data_fields, map(list, zip(*db_rows))))
+    else:
+        columns = {data_field: [] for data_field in data_fields}
+    dictionaries = {}
+    for data_field in VARIANT_TABLE_DICT_FIELDS:
+        codes = {}
+        columns[data_field] = [codes.setdefault(value, len(codes))
+                               for value in columns[data_field]]
+        dictionaries[data_field] = list(codes)
+    return {'columns': columns, 'dictionaries': dictionaries}
+
+
+def _get_variant_rows(search_key: str, search_value: str) -> list:
+    """
+    Search the database variant table and return variant table rows as
+    tuples in VARIANT_TABLE_FIELDS order, sorted by position.
+
+    Parameters
+    ----------
+    search_key : str
+        Search type keyword. Must be 'gene' or 'region'.
+    search_value : str
+        Search value - gene name, chromosomal region or position.
+
+    Returns
+    -------
+    list
+    """
+    # Search the database variant table (or its shards) by gene name
+    # or region/pos. An empty list is returned if the search key is
+    # anything else.
+    db_rows = []
+    querysets = get_variant_querysets(search_key, search_value)
+
+    # Display values are precomputed by db_importer.py, so only the
+    # displayed columns are selected and no per-row formatting is done.
+    for db_variants in querysets:
+        db_rows.extend(
+            db_variants.values_list(*VARIANT_TABLE_FIELDS.values()))
+    if len(querysets) > 1:
+        # A gene can be stored in more than one shard (e.g. X and Y
+        # pseudoautosomal region genes).
+        pos_index = list(VARIANT_TABLE_FIELDS).index('pos')
+        db_rows.sort(key=lambda db_row: db_row[pos_index])
+    return db_rows
+
+
+def get_variants_columnar(search_key: str, search_value: str) -> dict:
+    """
+    Search the database variant table using provided search parameters
+    and return the variant table data in the columnar format (see
+    encode_variant_columns), which is smaller and faster to serialise
+    than a list of row dicts.
+
+    Parameters
+    ----------
+    search_key : str
+        Search type keyword. Must be 'gene' or 'region'.
+    search_value : str
+        Search value - gene name (e.g. NF1), chromosomal region 
+        (e.g. 17:31226000-31227000) or position (e.g. 7:140753336) location.
+
+    Returns
+    -------
+    dict
+        encode_variant_columns output with the number of rows ('total').
+    """
+    db_rows = _get_variant_rows(search_key, search_value)
+    return {**encode_variant_columns(db_rows), 'total': len(db_rows)}
+
+
 def get_variants(search_key: str, search_value: str) -> list:
     """
     Search the database variant table using provided search parameters 
@@ -92,67 +631,414 @@ def get_variants(search_key: str, search_value: str) -> list:
     variants: list
         A list of variant dictionaries which stores variant table rows data.
     """
+    data_fields = tuple(VARIANT_TABLE_FIELDS)
+    return [dict(zip(data_fields, db_row))
+            for db_row in _get_variant_rows(search_key, search_value)]
+
+
+def _get_position_filter(text: str) -> tuple:
+    """
+    Parse a position column filter. Supported formats are ">N" and "<N"
+    (exclusive), "START-END" (range overlap) and "N" (exact position).
+    Unknown range bounds ("?" or empty) are collapsed to the known bound.
+
+    Parameters
+    ----------
+    text : str
+        Filter text, e.g. ">100", "24-34", "2840-?" or "175".
+
+    Returns
+    -------
+    tuple
+        (start, end) inclusive bounds (None if unbounded), or None if
+        the filter is not numeric.
+    """
+    text = text.strip()
+    try:
+        if text.startswith('>'):
+            return int(text[1:].strip()) + 1, None
+        if text.startswith('<'):
+            return None, int(text[1:].strip()) - 1
+        if '-' in text:
+            start, end = text.split('-', 1)
+            start = None if start.strip() in ('', '?') else int(start)
+            end = None if end.strip() in ('', '?') else int(end)
+            if start is None and end is None:
+                return None
+            return (start if start is not None else end,
+                    end if end is not None else start)
+        return int(text), int(text)
+    except ValueError:
+        return None
+
+
+def _annotate_protein_pos_bounds(variants):
+    """
+    Annotate variants with protein_start and protein_end integer bounds
+    parsed from protein positions (e.g. "175", "24-34" or "2840-?").
+    Unknown bounds are collapsed to the known bound and missing
+    positions have NULL bounds.
+
+    Parameters
+    ----------
+    variants : QuerySet
+        Variant queryset.
+
+    Returns
+    -------
+    QuerySet
+    """
+    variants = variants.annotate(
+        protein_pos_dash=StrIndex('protein_pos', Value('-')))
+    raw_start = Case(
+        When(protein_pos_dash=0, then=F('protein_pos')),
+        default=Substr('protein_pos', 1, F('protein_pos_dash') - 1),
+        output_field=TextField(),
+    )
+    raw_end = Case(
+        When(protein_pos_dash=0, then=F('protein_pos')),
+        default=Substr('protein_pos', F('protein_pos_dash') + 1),
+        output_field=TextField(),
+    )
+    start, end = (
+        Cast(NullIf(NullIf(raw, Value('?')), Value('')), IntegerField())
+        for raw in (raw_start, raw_end)
+    )
+    return variants.annotate(protein_start=Coalesce(start, end),
+                             protein_end=Coalesce(end, start))
+
+
+def filter_variants(variants, filters: dict = None, search: str = '',
+        consequence_categories: list = None, allele_types: list = None):
+    """
+    Apply the variant table filters to a variant queryset, so they are
+    run by the database instead of the browser.
+
+    Parameters
+    ----------
+    variants : QuerySet
+        Variant queryset.
+    filters : dict, optional
+        Column filter controls values: variant table "data-field" names
+        (keys) and filter texts (values).
+    search : str, optional
+        Table search box text matched against VARIANT_TABLE_SEARCH_FIELDS.
+    consequence_categories : list, optional
+        Selected consequence categories, or None to not filter by them.
+    allele_types : list, optional
+        Selected allele types, or None to not filter by them.
+
+    Returns
+    -------
+    QuerySet
+    """
+    for data_field, text in (filters or {}).items():
+        text = str(text).strip()
+        if not text:
+            continue
+        if data_field in VARIANT_TABLE_TEXT_FILTERS:
+            field = VARIANT_TABLE_FIELDS[data_field]
+            variants = variants.filter(**{f'{field}__icontains': text})
+        elif data_field == 'consequence':
+            variants = variants.filter(worst_consequence=text)
+        elif data_field in ('pos', 'protein_pos'):
+            bounds = _get_position_filter(text)
+            if bounds is None:
+                # Non-numeric filters are plain text filters.
+                variants = variants.filter(
+                    **{f'{data_field}__icontains': text})
+                continue
+            start, end = bounds
+            if data_field == 'pos':
+                start_field = end_field = 'pos'
+            else:
+                variants = _annotate_protein_pos_bounds(variants)
+                start_field, end_field = 'protein_start', 'protein_end'
+            # Range overlap: the variant positions span must overlap
+            # the filter range.
+            if end is not None:
+                variants = variants.filter(**{f'{start_field}__lte': end})
+            if start is not None:
+                variants = variants.filter(**{f'{end_field}__gte': start})
+    search = search.strip()
+    if search:
+        query = Q()
+        for data_field in VARIANT_TABLE_SEARCH_FIELDS:
+            field = VARIANT_TABLE_FIELDS[data_field]
+            query |= Q(**{f'{field}__icontains': search})
+        variants = variants.filter(query)
+    if consequence_categories is not None:
+        variants = variants.filter(
+            consequence_category__in=consequence_categories)
+    if allele_types is not None:
+        variants = variants.filter(allele_type__in=allele_types)
+    return variants
+
+
+def _get_variant_ordering(sort: str, order: str) -> tuple:
+    """
+    Get the database ordering of the variant table rows.
+
+    Parameters
+    ----------
+    sort : str
+        Variant table "data-field" name to sort by (position if unknown).
+    order : str
+        Sort order, 'asc' or 'desc'.
+
+    Returns
+    -------
+    tuple
+        Queryset order_by fields, a function that returns the sort key of
+        a variant table row tuple (used to merge the rows of multiple
+        shards) and whether the order is descending.
+    """
+    if sort not in VARIANT_TABLE_FIELDS:
+        sort = 'pos'
+    sort_field = VARIANT_TABLE_FIELDS[sort]
+    descending = order == 'desc'
+    # Ties keep the position order, as in the client-side table sort.
+    ordering = (f'-{sort_field}' if descending else sort_field, 'pos', 'id')
+
+    sort_index = list(VARIANT_TABLE_FIELDS).index(sort)
+
+    def sort_key(db_row):
+        # NULLs are sorted first, as in ascending SQLite order.
+        value = db_row[sort_index]
+        return (value is not None, value if value is not None else 0)
+
+    return ordering, sort_key, descending
+
+
+def get_variants_page(search_key: str, search_value: str, offset: int = 0,
+        limit: int = MAX_VARIANT_PAGE_SIZE, sort: str = 'pos',
+        order: str = 'asc', columnar: bool = False,
+        include_cancer_pcs: bool = False, **filters) -> dict:
+    """
+    Search the database variant table and return one sorted and
+    filtered page of the variant table rows with the total row counts.
+    Sorting, filtering and counting are done in SQL, so the response
+    size does not depend on the number of variants of a gene, or with
+    the column index of the dataset if it supports the request (see
+    _get_column_index_page), so only the page rows are read from the
+    database.
+
+    Parameters
+    ----------
+    search_key : str
+        Search type keyword. Must be 'gene' or 'region'.
+    search_value : str
+        Search value - gene name (e.g. NF1), chromosomal region 
+        (e.g. 17:31226000-31227000) or position (e.g. 7:140753336) location.
+    offset : int, optional
+        Number of rows to skip.
+    limit : int, optional
+        Maximum number of rows to return (up to MAX_VARIANT_PAGE_SIZE).
+    sort : str, optional
+        Variant table "data-field" name to sort by.
+    order : str, optional
+        Sort order, 'asc' or 'desc'.
+    columnar : bool, optional
+        Whether to return the page rows in the columnar format (see
+        encode_variant_columns) instead of 'rows'.
+    include_cancer_pcs : bool, optional
+        Whether to add the cancer types patient count subtable rows of
+        the page variants as 'cancer_pcs' (see
+        get_variants_cancer_type_pcs), so expanding the page rows does
+        not need a request per row.
+    **filters
+        filter_variants keyword arguments.
+
+    Returns
+    -------
+    dict
+        'rows' (variant table rows of the page), 'total' (number of
+        filtered variants), 'totalNotFiltered' (number of variants),
+        'consequences' (sorted consequences of all variants) and
+        'consequence_counts' (consequences of the filtered variants (keys)
+        and their counts (values)).
+    """
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), MAX_VARIANT_PAGE_SIZE)
+    index_page = _get_column_index_page(search_key, search_value, offset,
+                                        limit, sort, order, **filters)
+    if index_page is not None:
+        rows = _get_variant_rows_by_id(index_page.pop('ids'))
+        return {**_get_page_data(rows, columnar, include_cancer_pcs),
+                **index_page}
+    ordering, sort_key, descending = _get_variant_ordering(sort, order)
+
+    rows = []
+    total = total_not_filtered = 0
+    consequences = set()
+    consequence_counts = {}
+    querysets = get_variant_querysets(search_key, search_value)
+    for db_variants in querysets:
+        total_not_filtered += db_variants.count()
+        consequences.update(db_variants.order_by()
+            .values_list('worst_consequence', flat=True).distinct())
+        filtered = filter_variants(db_variants, **filters)
+        for consequence, count in filtered.order_by()\
+                .values_list('worst_consequence').annotate(n=Count('id')):
+            total += count
+            consequence_counts[consequence] = \
+                consequence_counts.get(consequence, 0) + count
+        # Every shard returns its first offset + limit rows, which are
+        # merged below (most searches read a single database).
+        end = offset + limit if len(querysets) > 1 else None
+        page = filtered.order_by(*ordering)\
+            .values_list(*VARIANT_TABLE_FIELDS.values())
+        page = page[:end] if end is not None else page[offset:offset + limit]
+        rows.extend(page)
+
+    if len(querysets) > 1:
+        pos_index = list(VARIANT_TABLE_FIELDS).index('pos')
+        # The variant id is the first field.
+        rows.sort(key=lambda db_row: (db_row[pos_index], db_row[0]))
+        # Python sorts are stable, so ties keep the position order.
+        rows.sort(key=sort_key, reverse=descending)
+        rows = rows[offset:offset + limit]
+    return {
+        **_get_page_data(rows, columnar, include_cancer_pcs),
+        'total': total,
+        'totalNotFiltered': total_not_filtered,
+        'consequences': sorted(consequences),
+        'consequence_counts': consequence_counts,
+    }
+
+
+def _get_page_data(rows: list, columnar: bool,
+                   include_cancer_pcs: bool) -> dict:
+    """Returns the rows of a variant table page as 'rows' or in the
+    columnar format, with their 'cancer_pcs' if requested (see
+    get_variants_page)."""
+    if columnar:
+        data = encode_variant_columns(rows)
+    else:
+        data_fields = tuple(VARIANT_TABLE_FIELDS)
+        data = {'rows': [dict(zip(data_fields, db_row)) for db_row in rows]}
+    if include_cancer_pcs:
+        # The variant id is the first field.
+        data['cancer_pcs'] = get_variants_cancer_type_pcs(
+            [db_row[0] for db_row in rows])
+    return data
+
+
+def _get_column_index_page(search_key: str, search_value: str, offset: int,
+        limit: int, sort: str, order: str, filters: dict = None,
+        search: str = '', consequence_categories: list = None,
+        allele_types: list = None) -> dict:
+    """
+    Get a variant table page with the column index of the dataset (see
+    main/column_index.py) instead of SQL queries, if it was written by
+    the importer and supports the page sort and filters.
+
+    Parameters
+    ----------
+    search_key, search_value, offset, limit, sort, order
+        See get_variants_page.
+    filters, search, consequence_categories, allele_types
+        See filter_variants.
+
+    Returns
+    -------
+    dict
+        'ids' (variant ids of the page), 'total', 'totalNotFiltered',
+        'consequences' and 'consequence_counts' (see
+        ColumnIndex.get_page), or None if the column index cannot be
+        used.
+    """
+    if sort not in VARIANT_TABLE_FIELDS:
+        sort = 'pos'
+    if sort not in COLUMN_INDEX_SORT_FIELDS or search.strip():
+        return None
+    consequence = pos_bounds = None
+    for data_field, text in (filters or {}).items():
+        text = str(text).strip()
+        if not text:
+            continue
+        if data_field == 'consequence':
+            consequence = text
+        elif data_field == 'pos' and _get_position_filter(text) is not None:
+            pos_bounds = _get_position_filter(text)
+        elif data_field in VARIANT_TABLE_TEXT_FILTERS + ('pos', 'protein_pos'):
+            # Text and protein position filters are only run in SQL.
+            return None
+    index = get_column_index()
+    if index is None:
+        return None
 
-    def _format_hgvs(hgvs_str):
-        """Format HGVS descriptions."""
-        if not hgvs_str:
-            return hgvs_str
-        
-        # Split joined HGVS descriptions (replace '&' with ', ')
-        new_hgvs = []
-        for hgvs in hgvs_str.split('&'):
-            # Add parentheses to HGVSp descriptions.
-            if 'p.' in hgvs and 'p.(' not in hgvs:
-                hgvs = f"p.({hgvs.split('p.')[1]})"
-            hgvs = hgvs.replace('%3D', '=')
-            new_hgvs.append(hgvs)
-        return ', '.join(new_hgvs)
-    
-    # Search the database variant table by gene name or region/pos and
-    # return an empty list if the search key is anything else.
-    variants = []
     if search_key == 'gene':
-        db_variants = Variant.objects.filter(
-            gene_symbol__iexact=search_value).order_by('pos')
+        rows = index.find_gene_rows(search_value.upper())
     elif search_key == 'region':
-        # Region format: {chrom}:{start_pos}-{end_pos}
-        # Position format: {chrom}:{pos}
-        try:
-            chrom, poses = search_value.split(':')
-            if '-' in poses:
-                start_pos, end_pos = poses.split('-')
-            else:
-                start_pos = end_pos = poses
-            db_variants = Variant.objects.filter(
-                chrom=chrom, pos__gte=int(start_pos), pos__lte=int(end_pos)
-            ).order_by('pos')
-        except (ValueError, TypeError):
-            # Return empty list for malformed input
-            return variants
+        region = parse_region(search_value)
+        if region is None or get_chrom_db(region[0]) is None:
+            return None
+        rows = index.find_region_rows(*region)
+    else:
+        return None
+    return index.get_page(
+        rows, offset, limit, sort=sort, order=order, consequence=consequence,
+        pos_bounds=pos_bounds, consequence_categories=consequence_categories,
+        allele_types=allele_types)
+
+
+def _get_variant_rows_by_id(variant_ids: list) -> list:
+    """Returns variant table rows (tuples in VARIANT_TABLE_FIELDS order)
+    of variants in the order of their ids."""
+    ids_by_db = {}
+    for variant_id in variant_ids:
+        ids_by_db.setdefault(get_variant_db(variant_id), []).append(variant_id)
+    rows = {}
+    for db, ids in ids_by_db.items():
+        if db is None:
+            continue
+        for db_row in Variant.objects.using(db).filter(id__in=ids)\
+                .values_list(*VARIANT_TABLE_FIELDS.values()):
+            # The variant id is the first field.
+            rows[db_row[0]] = db_row
+    return [rows[variant_id] for variant_id in variant_ids
+            if variant_id in rows]
+
+
+def iter_variants(search_key: str, search_value: str, sort: str = 'pos',
+        order: str = 'asc', **filters):
+    """
+    Search the database variant table and yield sorted and filtered
+    variant table rows one at a time. Rows are fetched from the database
+    in chunks of VARIANT_STREAM_CHUNK_SIZE, so memory use does not depend
+    on the number of matching variants.
+
+    Parameters
+    ----------
+    search_key : str
+        Search type keyword. Must be 'gene' or 'region'.
+    search_value : str
+        Search value - gene name (e.g. NF1), chromosomal region 
+        (e.g. 17:31226000-31227000) or position (e.g. 7:140753336) location.
+    sort : str, optional
+        Variant table "data-field" name to sort by.
+    order : str, optional
+        Sort order, 'asc' or 'desc'.
+    **filters
+        filter_variants keyword arguments.
+
+    Yields
+    ------
+    dict
+        Variant table row.
+    """
+    ordering, sort_key, descending = _get_variant_ordering(sort, order)
+    data_fields = tuple(VARIANT_TABLE_FIELDS)
+    shard_rows = [
+        filter_variants(db_variants, **filters).order_by(*ordering)
+        .values_list(*VARIANT_TABLE_FIELDS.values())
+        .iterator(chunk_size=VARIANT_STREAM_CHUNK_SIZE)
+        for db_variants in get_variant_querysets(search_key, search_value)
+    ]
+    if len(shard_rows) == 1:
+        db_rows = shard_rows[0]
     else:
-        return variants
-
-    for db_variant in db_variants:
-        is_snv = len(db_variant.ref) == len(db_variant.alt) == 1
-        # Construct variant dict which keys matches variant table 
-        # "data-field" properties in "variants.html" template.
-        variant = {
-            'variant_id': db_variant.id,
-            'chrom': db_variant.chrom,
-            'pos': db_variant.pos,
-            'allele_type': 'SNV' if is_snv else 'INDEL',
-            'consequence': get_worst_csq_term(db_variant.consequence),
-            'consequence_category': get_consequence_category(
-                get_worst_csq_term(db_variant.consequence, raw=1), db_variant.hgvs_p
-            ),
-            'hgvs_c': _format_hgvs(db_variant.hgvs_c),
-            'hgvs_p': _format_hgvs(db_variant.hgvs_p),
-            'gene': db_variant.gene_symbol,
-            'refseq_transcript': db_variant.refseq_transcript,
-            'protein_pos': db_variant.protein_pos,
-            'haemonc_cancers_count': db_variant.haemonc_cancers_count,
-            'solid_cancers_count': db_variant.solid_cancers_count,
-            'all_cancers_count': db_variant.all_cancers_count,
-        }
-        variants.append(variant)
-    return variants
\ No newline at end of file
+        db_rows = heapq.merge(*shard_rows, key=sort_key, reverse=descending)
+    for db_row in db_rows:
+        yield dict(zip(data_fields, db_row))
@@ -0,0 +1,431 @@
+import gzip
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from main.dataset import get_dataset_metadata
+from main.lookups import get_chrom_db
+from main.models import CancerType, Variant, VariantCancerTypePatientCount
+from main.utils import unpack_cancer_type_pcs
+from main.vcf import CANCER_PC_PREFIXES, split_vcf_by_chrom
+
+# Variant table patient counts added to every matching VCF record, named
+# after the GENIE VCF INFO keys they are imported from (help_text) with
+# INFO_ID_PREFIX.
+VARIANT_PC_FIELDS = [
+    f for f in Variant._meta.concrete_fields
+    if f.help_text.startswith(tuple(CANCER_PC_PREFIXES))
+]
+# Prefix of the added INFO keys, so they do not clash with the INFO keys
+# of the input VCF (e.g. a GENIE VCF).
+INFO_ID_PREFIX = 'GENIE_'
+# Number of variant rows fetched from the database at a time while the
+# variant table is walked in position order.
+MERGE_CHUNK_SIZE = 2000
+# Number of VCF records whose cancer type patient counts are looked up
+# at a time (with --cancer-types).
+PCS_BATCH_SIZE = 500
+
+
+def open_vcf(path: str, mode: str = 'rt'):
+    """Opens a plain or (b)gzipped VCF ("-" for stdin/stdout)."""
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    if path.endswith(('.gz', '.bgz')):
+        return gzip.open(path, mode=mode, encoding='utf-8', newline='')
+    return open(path, mode=mode, encoding='utf-8', newline='')
+
+
+def get_db_chrom(chrom: str) -> str:
+    """Returns the database chromosome name of a VCF chromosome, which
+    may have a "chr" prefix (e.g. chr17 and chrM are 17 and MT)."""
+    if chrom[:3].lower() == 'chr':
+        chrom = chrom[3:]
+    return 'MT' if chrom == 'M' else chrom
+
+
+class ChromVariantMerger:
+    """Walks the variants of one chromosome in position order alongside
+    a position-sorted VCF, so all VCF records of a chromosome are matched
+    with a single ordered range scan of the (chrom, pos) index. Only the
+    variants at the current position are kept in memory.
+
+    Parameters
+    ----------
+    chrom : str
+        Database chromosome name.
+    start_pos : int
+        Position of the first VCF record of the chromosome.
+    columns : list
+        Variant fields of the matched rows (after pos, ref and alt).
+    """
+
+    def __init__(self, chrom: str, start_pos: int, columns: list):
+        db = get_chrom_db(chrom)
+        if db is None:
+            self.rows = iter(())
+        else:
+            self.rows = Variant.objects.using(db)\
+                .filter(chrom=chrom, pos__gte=start_pos).order_by('pos')\
+                .values_list('pos', 'ref', 'alt', *columns)\
+                .iterator(chunk_size=MERGE_CHUNK_SIZE)
+        self.next_row = next(self.rows, None)
+        self.pos = start_pos - 1
+        self.alleles = {}
+
+    def get(self, pos: int, ref: str, alt: str) -> tuple:
+        """
+        Get the variant of a VCF record allele.
+
+        Parameters
+        ----------
+        pos : int
+            Record position, not less than the previous record position.
+        ref : str
+            Reference allele.
+        alt : str
+            Alternate allele.
+
+        Returns
+        -------
+        tuple
+            Variant columns values, or None if the variant is not found.
+
+        Raises
+        ------
+        ValueError
+            If the position is less than the previous record position.
+        """
+        if pos != self.pos:
+            if pos < self.pos:
+                raise ValueError(
+                    f'VCF records are not sorted by position ({pos} after '
+                    f'{self.pos})')
+            self.pos = pos
+            self.alleles = {}
+            while self.next_row is not None and self.next_row[0] < pos:
+                self.next_row = next(self.rows, None)
+            while self.next_row is not None and self.next_row[0] == pos:
+                self.alleles[self.next_row[1:3]] = self.next_row[3:]
+                self.next_row = next(self.rows, None)
+        return self.alleles.get((ref.upper(), alt.upper()))
+
+
+def get_cancer_pc_info_ids() -> dict:
+    """
+    Get the GENIE VCF INFO keys of the cancer type patient counts.
+
+    Returns
+    -------
+    dict
+        Cancer type ids (keys) and lists of their INFO keys in
+        CANCER_PC_PREFIXES order (values), e.g.
+        GENIE_SameNucleotideChange_BreastCancer_Count_N_20000.
+    """
+    return {
+        cancer_type_id: [
+            f'{INFO_ID_PREFIX}{prefix}_{vcf_name}_Count_N_{total}'
+            for prefix in CANCER_PC_PREFIXES
+        ]
+        for cancer_type_id, vcf_name, total in CancerType.objects
+            .order_by('id')
+            .values_list('id', 'cancer_type_vcf', 'total_patient_count')
+    }
+
+
+def get_info_header(cancer_pcs: bool) -> list:
+    """
+    Get the VCF header lines of the added INFO fields.
+
+    Parameters
+    ----------
+    cancer_pcs : bool
+        Include the cancer type patient count fields.
+
+    Returns
+    -------
+    list
+        Header lines.
+    """
+    metadata = get_dataset_metadata()
+    lines = [
+        f"##NHS_GENIE=<Version={metadata.get('genie_version', '')},"
+        f"BuildId={metadata.get('build_id', '')}>\n"
+    ]
+    info_ids = [INFO_ID_PREFIX + f.help_text for f in VARIANT_PC_FIELDS]
+    if cancer_pcs:
+        for ids in get_cancer_pc_info_ids().values():
+            info_ids += ids
+    for info_id in info_ids:
+        lines.append(
+            f'##INFO=<ID={info_id},Number=A,Type=Integer,'
+            f'Description="NHS GENIE patient count ({info_id})">\n')
+    return lines
+
+
+def _get_cancer_pcs(variant_rows: list) -> dict:
+    """
+    Get the cancer type patient counts of matched variants.
+
+    Parameters
+    ----------
+    variant_rows : list
+        Matched variant rows (id, VARIANT_PC_FIELDS values and packed
+        patient counts) of database chromosome names (tuples).
+
+    Returns
+    -------
+    dict
+        Variant ids (keys) and dicts with cancer type ids (keys) and
+        their patient counts lists in CANCER_PC_PREFIXES order (values).
+    """
+    pcs = {}
+    unpacked_ids = {}
+    for chrom, row in variant_rows:
+        variant_id, packed = row[0], row[-1]
+        if packed is not None:
+            records = unpack_cancer_type_pcs(packed)
+            pcs[variant_id] = dict(zip(records['cancer_type_id'].tolist(),
+                                       records['pcs'].tolist()))
+        else:
+            pcs[variant_id] = {}
+            unpacked_ids.setdefault(get_chrom_db(chrom), []).append(variant_id)
+    pc_fields = tuple(CANCER_PC_PREFIXES.values())
+    for db, ids in unpacked_ids.items():
+        for variant_id, cancer_type_id, *counts in \
+                VariantCancerTypePatientCount.objects.using(db)\
+                .filter(variant_id__in=ids)\
+                .values_list('variant_id', 'cancer_type_id', *pc_fields):
+            pcs[variant_id][cancer_type_id] = counts
+    return pcs
+
+
+def _write_records(out, records: list, cancer_pcs: bool,
+                   cancer_pc_info_ids: dict) -> None:
+    """
+    Write VCF records with the patient counts of their matched variants
+    added to the INFO column.
+
+    Parameters
+    ----------
+    out : file
+        Output VCF file.
+    records : list
+        (VCF line columns, matched variant rows or None per ALT allele,
+        database chromosome name) tuples.
+    cancer_pcs : bool
+        Add the cancer type patient count fields.
+    cancer_pc_info_ids : dict
+        See get_cancer_pc_info_ids (only used with cancer_pcs).
+    """
+    pcs = {}
+    if cancer_pcs:
+        pcs = _get_cancer_pcs([(chrom, row) for _, rows, chrom in records
+                               for row in rows if row is not None])
+    for columns, rows, _ in records:
+        info = []
+        if any(row is not None for row in rows):
+            # Number=A fields: one value per ALT allele, "." if the
+            # allele is not in GENIE.
+            for i, field in enumerate(VARIANT_PC_FIELDS, 1):
+                values = ','.join('.' if row is None else str(row[i])
+                                  for row in rows)
+                info.append(f'{INFO_ID_PREFIX}{field.help_text}={values}')
+            if cancer_pcs:
+                cancer_type_ids = sorted({
+                    cancer_type_id for row in rows if row is not None
+                    for cancer_type_id in pcs[row[0]]
+                })
+                for cancer_type_id in cancer_type_ids:
+                    for slot, info_id in \
+                            enumerate(cancer_pc_info_ids[cancer_type_id]):
+                        values = ','.join(
+                            '.' if row is None else
+                            str(pcs[row[0]].get(cancer_type_id, [0] * 4)[slot])
+                            for row in rows)
+                        info.append(f'{info_id}={values}')
+        if info:
+            if columns[7] in ('', '.'):
+                columns[7] = ';'.join(info)
+            else:
+                columns[7] += ';' + ';'.join(info)
+        out.write('\t'.join(columns) + '\n')
+
+
+def annotate_vcf_lines(lines, out, cancer_pcs: bool = False) -> tuple:
+    """
+    Annotate VCF data lines sorted by position within each chromosome
+    and write them to a file.
+
+    Parameters
+    ----------
+    lines : iterable
+        VCF data lines (without header lines).
+    out : file
+        Output file.
+    cancer_pcs : bool
+        Add the cancer type patient count fields.
+
+    Returns
+    -------
+    tuple
+        Number of records and number of records with a GENIE variant.
+
+    Raises
+    ------
+    ValueError
+        If the records of a chromosome are not sorted by position.
+    """
+    columns = ['id'] + [f.attname for f in VARIANT_PC_FIELDS]
+    if cancer_pcs:
+        columns.append('cancer_type_counts')
+    cancer_pc_info_ids = get_cancer_pc_info_ids() if cancer_pcs else {}
+    merger = None
+    chrom = None
+    records = []
+    count = annotated = 0
+    for line in lines:
+        line_columns = line.rstrip('\r\n').split('\t')
+        pos = int(line_columns[1])
+        if line_columns[0] != chrom:
+            # A chromosome that appears again is walked again.
+            chrom = line_columns[0]
+            db_chrom = get_db_chrom(chrom)
+            merger = ChromVariantMerger(db_chrom, pos, columns)
+        rows = [merger.get(pos, line_columns[3], alt)
+                for alt in line_columns[4].split(',')]
+        records.append((line_columns, rows, db_chrom))
+        count += 1
+        annotated += any(row is not None for row in rows)
+        if len(records) == PCS_BATCH_SIZE:
+            _write_records(out, records, cancer_pcs, cancer_pc_info_ids)
+            records = []
+    _write_records(out, records, cancer_pcs, cancer_pc_info_ids)
+    return count, annotated
+
+
+def annotate_vcf_part(in_path: Path, out_path: Path,
+                      cancer_pcs: bool) -> tuple:
+    """
+    Annotate the data lines of a VCF (e.g. one chromosome) and write
+    them without the header. Used as a process pool task.
+
+    Returns
+    -------
+    tuple
+        See annotate_vcf_lines.
+
+    Raises
+    ------
+    RuntimeError
+        If the records are not sorted by position.
+    """
+    with open_vcf(str(in_path)) as f, \
+            open(out_path, 'w', encoding='utf-8', newline='') as out:
+        lines = (line for line in f if not line.startswith('#'))
+        try:
+            return annotate_vcf_lines(lines, out, cancer_pcs)
+        except ValueError as e:
+            raise RuntimeError(f'{in_path.name}: {e}') from None
+
+
+class Command(BaseCommand):
+    help = (
+        'Add NHS GENIE patient counts to the INFO column of a VCF sorted '
+        'by position. Records are matched by CHROM, POS, REF and ALT with '
+        'a sorted merge-join against the variant table, one chromosome '
+        'at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input',
+            help='input VCF (plain, gzipped or bgzipped, "-" for stdin)')
+        parser.add_argument(
+            'output', help='output VCF (gzipped if it ends with .gz, "-" '
+                           'for stdout)')
+        parser.add_argument(
+            '--cancer-types', action='store_true',
+            help=('add the patient counts of every cancer type (GENIE VCF '
+                  'INFO keys), not only the aggregated cancer types'))
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help=('number of chromosomes annotated in parallel (requires a '
+                  'gzipped input file with contiguous chromosomes)'))
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be a positive integer')
+        if options['workers'] > 1 and \
+                not options['input'].endswith(('.gz', '.bgz')):
+            raise CommandError('--workers requires a gzipped input file')
+        cancer_pcs = options['cancer_types']
+        start = time.perf_counter()
+
+        with open_vcf(options['input']) as f:
+            header = []
+            line = next(f, '')
+            while line.startswith('#'):
+                header.append(line)
+                line = next(f, '')
+            if not header or not header[-1].startswith('#CHROM'):
+                raise CommandError('Input is not a VCF (no #CHROM line).')
+            header[-1:-1] = get_info_header(cancer_pcs)
+            out = open_vcf(options['output'], 'wt')
+            try:
+                out.writelines(header)
+                if options['workers'] == 1:
+                    lines = f if not line else \
+                        (l for lines in ([line], f) for l in lines)
+                    try:
+                        count, annotated = annotate_vcf_lines(
+                            lines, out, cancer_pcs)
+                    except ValueError as e:
+                        raise CommandError(str(e))
+                else:
+                    count, annotated = self.annotate_parallel(
+                        options['input'], out, cancer_pcs, options['workers'])
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+
+        # Summary is written to stderr, so it is not mixed with the VCF
+        # written to stdout.
+        self.stderr.write(
+            f'Annotated {annotated} of {count} records in '
+            f'{time.perf_counter() - start:.2f} seconds.',
+            style_func=self.style.SUCCESS)
+
+    def annotate_parallel(self, input_path: str, out, cancer_pcs: bool,
+                          workers: int) -> tuple:
+        """Split the input VCF by chromosome, annotate the chromosomes in
+        parallel and write them to the output in the input order. The
+        records of each chromosome must be contiguous, so the output is
+        the same as the serial output."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            try:
+                parts = split_vcf_by_chrom(input_path, tmp_dir,
+                                           contiguous=True)
+            except ValueError as e:
+                raise CommandError(str(e))
+            tasks = [(path, path.with_suffix('.out'), cancer_pcs)
+                     for path in parts.values()]
+            # Forked workers must not share the parent's connections.
+            connections.close_all()
+            try:
+                with multiprocessing.Pool(workers) as pool:
+                    counts = pool.starmap(annotate_vcf_part, tasks,
+                                          chunksize=1)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            for _, out_path, _ in tasks:
+                with open(out_path, encoding='utf-8', newline='') as part:
+                    shutil.copyfileobj(part, out)
+        return (sum(count for count, _ in counts),
+                sum(annotated for _, annotated in counts))
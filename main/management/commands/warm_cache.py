@@ -0,0 +1,119 @@
+import gzip
+import re
+import sys
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from main.cache import (
+    get_cached_json, get_result_cache_key, remove_old_warm_responses,
+    write_warm_response
+)
+from main.views import VARIANT_TABLE_FIRST_PAGE_QUERY, get_ajax_variants_result
+
+# Request line and status code of nginx/gunicorn access log lines
+# (common and combined log formats), e.g.
+# "GET /variants/?search_key=gene&search_value=TP53 HTTP/1.1" 200
+ACCESS_LOG_REQUEST = re.compile(r'"GET (\S+) HTTP/[^"]*" (\d{3})')
+
+
+def read_access_log_searches(paths: list, variants_path: str) -> Counter:
+    """
+    Count variant page searches in access logs.
+
+    Parameters
+    ----------
+    paths : list
+        Access log paths (gzipped if they end with .gz, "-" for stdin).
+    variants_path : str
+        Variants page URL path.
+
+    Returns
+    -------
+    Counter
+        (search key, search value) tuples (keys) and the number of
+        successful variants page requests (values).
+    """
+    searches = Counter()
+    for path in paths:
+        if path == '-':
+            log = sys.stdin
+        elif path.endswith('.gz'):
+            log = gzip.open(path, mode='rt', errors='replace')
+        else:
+            log = open(path, errors='replace')
+        try:
+            for line in log:
+                match = ACCESS_LOG_REQUEST.search(line)
+                if match is None or match.group(2) != '200':
+                    continue
+                url = urlsplit(match.group(1))
+                # The website can be served under a path prefix.
+                if not url.path.endswith(variants_path):
+                    continue
+                query = parse_qs(url.query)
+                search_key = query.get('search_key', [''])[0]
+                search_value = query.get('search_value', [''])[0].strip()
+                if search_key in ('gene', 'region') and search_value:
+                    searches[(search_key, search_value)] += 1
+        finally:
+            if log is not sys.stdin:
+                log.close()
+    return searches
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the variant table data of popular searches (from '
+        'access logs) and explicitly listed genes and regions, and store '
+        'gzip/brotli compressed copies that are served without querying '
+        'the database. Run after db_importer.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--access-log', action='append', default=[],
+            help=('nginx/gunicorn access log path (can be repeated, .gz '
+                  'logs are supported, "-" reads stdin)'))
+        parser.add_argument(
+            '--top', type=int, default=100,
+            help='number of the most frequent access log searches to warm')
+        parser.add_argument(
+            '--gene', action='append', default=[],
+            help='gene to warm (can be repeated)')
+        parser.add_argument(
+            '--region', action='append', default=[],
+            help='region or position to warm, e.g. 17:7661779-7687538')
+
+    def handle(self, *args, **options):
+        searches = [('gene', gene) for gene in options['gene']]
+        searches += [('region', region) for region in options['region']]
+        if options['access_log']:
+            counts = read_access_log_searches(
+                options['access_log'], reverse('main:variants'))
+            searches += [search for search, _ in
+                         counts.most_common(options['top'])]
+        # Remove duplicates, keep the order.
+        searches = list(dict.fromkeys(searches))
+        if get_result_cache_key('', {}) is None:
+            raise CommandError('The database has no imported dataset.')
+
+        remove_old_warm_responses()
+        start = time.perf_counter()
+        files = 0
+        for search_key, search_value in searches:
+            search = {'search_key': search_key, 'search_value': search_value}
+            # The full variant table data and the first table page shown
+            # by the variants page.
+            for query in (search, {**search, **VARIANT_TABLE_FIRST_PAGE_QUERY}):
+                name, params, get_data = get_ajax_variants_result(query)
+                content = get_cached_json(name, params, get_data)
+                files += len(write_warm_response(
+                    get_result_cache_key(name, params), content))
+            self.stdout.write(f'Warmed {search_key} {search_value}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {len(searches)} searches ({files} files) in '
+            f'{time.perf_counter() - start:.2f} seconds.'))
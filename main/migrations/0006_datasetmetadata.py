@@ -0,0 +1,28 @@
+# Generated by Django 5.2.15 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0005_variant_protein_pos"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DatasetMetadata",
+            fields=[
+                (
+                    "key",
+                    models.CharField(
+                        max_length=100, primary_key=True, serialize=False
+                    ),
+                ),
+                ("value", models.TextField()),
+            ],
+            options={
+                "db_table": "main_dataset_metadata",
+            },
+        ),
+    ]
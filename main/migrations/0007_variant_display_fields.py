@@ -0,0 +1,191 @@
+# Generated by Django 5.2.15 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+# Frozen copies of the main.utils helpers used by db_importer.py when
+# this migration was written, so later changes to them do not change
+# the data migration.
+
+# VEP consequence SO and display terms from the most to least severe.
+VEP_CSQ_TERMS = {
+    "transcript_ablation": "Transcript ablation",
+    "splice_acceptor_variant": "Splice acceptor variant",
+    "splice_donor_variant": "Splice donor variant",
+    "stop_gained": "Stop gained",
+    "frameshift_variant": "Frameshift variant",
+    "stop_lost": "Stop lost",
+    "start_lost": "Start lost",
+    "transcript_amplification": "Transcript amplification",
+    "feature_elongation": "Feature elongation",
+    "feature_truncation": "Feature truncation",
+    "inframe_insertion": "Inframe insertion",
+    "inframe_deletion": "Inframe deletion",
+    "missense_variant": "Missense variant",
+    "protein_altering_variant": "Protein altering variant",
+    "splice_donor_5th_base_variant": "Splice donor 5th base variant",
+    "splice_region_variant": "Splice region variant",
+    "splice_donor_region_variant": "Splice donor region variant",
+    "splice_polypyrimidine_tract_variant":
+        "Splice polypyrimidine tract variant",
+    "incomplete_terminal_codon_variant": "Incomplete terminal codon variant",
+    "start_retained_variant": "Start retained variant",
+    "stop_retained_variant": "Stop retained variant",
+    "synonymous_variant": "Synonymous variant",
+    "coding_sequence_variant": "Coding sequence variant",
+    "mature_miRNA_variant": "Mature miRNA variant",
+    "5_prime_UTR_variant": "5 prime UTR variant",
+    "3_prime_UTR_variant": "3 prime UTR variant",
+    "non_coding_transcript_exon_variant": "Non coding transcript exon variant",
+    "intron_variant": "Intron variant",
+    "NMD_transcript_variant": "Transcript variant",
+    "non_coding_transcript_variant": "Non coding transcript variant",
+    "coding_transcript_variant": "Coding transcript variant",
+    "upstream_gene_variant": "Upstream gene variant",
+    "downstream_gene_variant": "Downstream gene variant",
+    "TFBS_ablation": "TFBS ablation",
+    "TFBS_amplification": "TFBS amplification",
+    "TF_binding_site_variant": "TF binding site variant",
+    "regulatory_region_ablation": "Regulatory region ablation",
+    "regulatory_region_amplification": "Regulatory region amplification",
+    "regulatory_region_variant": "Regulatory region variant",
+    "intergenic_variant": "Intergenic variant",
+    "sequence_variant": "Sequence variant",
+}
+VEP_CSQ_SEVERITY_RANKS = {csq: i for i, csq in enumerate(VEP_CSQ_TERMS)}
+LOF_VEP_CONSEQUENCES = {"frameshift_variant", "stop_gained",
+                        "splice_acceptor_variant", "splice_donor_variant"}
+LOF_CANDIDATE_PTV_VEP_CSQS_TERMS = {"frameshift_variant", "stop_gained"}
+MISSENSE_AND_INFRAME_INDEL_VEP_CSQS_TERMS = {
+    "missense_variant", "inframe_insertion", "inframe_deletion",
+    "protein_altering_variant", "stop_lost", "start_lost",
+}
+
+
+def get_worst_csq_term(csqs):
+    """Return the most severe VEP consequence term of a consequences
+    string ("" if it has unknown terms)."""
+    csqs_list = csqs.replace(",", "&").split("&")
+    if any(csq not in VEP_CSQ_SEVERITY_RANKS for csq in csqs_list):
+        return ""
+    return min(csqs_list, key=VEP_CSQ_SEVERITY_RANKS.get)
+
+
+def get_consequence_category(csq, hgvs_p):
+    """Return the consequence category of a VEP consequence term."""
+    if (csq in LOF_CANDIDATE_PTV_VEP_CSQS_TERMS
+            and hgvs_p and "Ter" in hgvs_p):
+        return "PTV LoF"
+    elif csq in LOF_VEP_CONSEQUENCES:
+        return "non-PTV LoF"
+    elif csq in MISSENSE_AND_INFRAME_INDEL_VEP_CSQS_TERMS:
+        return "Missense / Inframe indel"
+    elif csq == "synonymous_variant":
+        return "Silent"
+    else:
+        return "Other"
+
+
+def format_hgvs(hgvs_str):
+    """Format '&' delimited HGVS descriptions for display."""
+    if not hgvs_str:
+        return hgvs_str
+    new_hgvs = []
+    for hgvs in hgvs_str.split("&"):
+        if "p." in hgvs and "p.(" not in hgvs:
+            hgvs = f"p.({hgvs.split('p.')[1]})"
+        new_hgvs.append(hgvs.replace("%3D", "="))
+    return ", ".join(new_hgvs)
+
+
+def get_allele_type(ref, alt):
+    """Return the allele type of a variant ("SNV" or "INDEL")."""
+    return "SNV" if len(ref) == len(alt) == 1 else "INDEL"
+
+
+DISPLAY_FIELDS = ["allele_type", "worst_consequence", "consequence_category",
+                  "hgvs_c_formatted", "hgvs_p_formatted"]
+BATCH_SIZE = 5000
+
+
+def populate_display_fields(apps, schema_editor):
+    """Populate the new columns of already imported variants as
+    db_importer.py does."""
+    Variant = apps.get_model("main", "Variant")
+    last_id = 0
+    while True:
+        # Batches are read by id, as SQLite does not isolate a query from
+        # updates of the table it reads.
+        variants = list(
+            Variant.objects.filter(id__gt=last_id).order_by("id")
+            .only("id", "ref", "alt", "consequence", "hgvs_c", "hgvs_p")
+            [:BATCH_SIZE]
+        )
+        if not variants:
+            break
+        for variant in variants:
+            worst_csq = (get_worst_csq_term(variant.consequence)
+                         if variant.consequence else "")
+            variant.allele_type = get_allele_type(variant.ref, variant.alt)
+            variant.worst_consequence = VEP_CSQ_TERMS.get(worst_csq, "")
+            variant.consequence_category = get_consequence_category(
+                worst_csq, variant.hgvs_p)
+            variant.hgvs_c_formatted = format_hgvs(variant.hgvs_c)
+            variant.hgvs_p_formatted = format_hgvs(variant.hgvs_p)
+        Variant.objects.bulk_update(variants, DISPLAY_FIELDS)
+        last_id = variants[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0006_datasetmetadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variant",
+            name="allele_type",
+            field=models.CharField(default="", max_length=10),
+        ),
+        migrations.AddField(
+            model_name="variant",
+            name="consequence_category",
+            field=models.CharField(default="", max_length=50),
+        ),
+        migrations.AddField(
+            model_name="variant",
+            name="hgvs_c_formatted",
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name="variant",
+            name="hgvs_p_formatted",
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name="variant",
+            name="worst_consequence",
+            field=models.CharField(default="", max_length=100),
+        ),
+        # Populate the new columns of already imported variants.
+        migrations.RunPython(populate_display_fields,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["allele_type"], name="main_varian_allele__1bdbd8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["worst_consequence"], name="main_varian_worst_c_fef00b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["consequence_category"], name="main_varian_consequ_452101_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.15 on 2026-10-17 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0007_variant_display_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variant",
+            name="cancer_type_counts",
+            field=models.BinaryField(null=True),
+        ),
+    ]
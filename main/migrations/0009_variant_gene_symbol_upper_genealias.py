@@ -0,0 +1,46 @@
+# Generated by Django 5.2.15 on 2026-10-17 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0008_variant_cancer_type_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeneAlias",
+            fields=[
+                (
+                    "alias",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+                ("gene_symbol", models.CharField(max_length=100)),
+            ],
+            options={
+                "db_table": "main_gene_alias",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="variant",
+            name="main_varian_gene_sy_d69036_idx",
+        ),
+        migrations.AddField(
+            model_name="variant",
+            name="gene_symbol_upper",
+            field=models.CharField(default="", max_length=100),
+        ),
+        # Populate the new column of already imported variants.
+        migrations.RunSQL(
+            "UPDATE main_variant SET gene_symbol_upper = UPPER(gene_symbol)",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["gene_symbol_upper"], name="main_varian_gene_sy_50a2f0_idx"
+            ),
+        ),
+    ]
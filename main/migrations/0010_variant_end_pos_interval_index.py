@@ -0,0 +1,68 @@
+# Generated by Django 5.2.15 on 2026-10-17 20:26
+
+from django.db import migrations, models
+
+# Chromosomes (main.utils.CHROMOSOMES at the time of the migration)
+# are indexed by their position in the list.
+CHROMOSOMES = tuple(str(x) for x in range(1, 23)) + ("X", "Y", "MT")
+
+
+def chrom_index_sql(column):
+    whens = " ".join(f"WHEN '{chrom}' THEN {i}" for i, chrom in enumerate(CHROMOSOMES))
+    return f"CASE {column} {whens} ELSE -1 END"
+
+
+def interval_values_sql(row):
+    chrom_index = chrom_index_sql(f"{row}.chrom")
+    # Queryset updates of pos do not update end_pos (only Variant.save
+    # does), so the interval end is kept at least at its start.
+    end_pos = f"MAX({row}.pos, {row}.end_pos)"
+    return f"{row}.id, {chrom_index}, {chrom_index}, {row}.pos, {end_pos}"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_variant_gene_symbol_upper_genealias"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variant",
+            name="end_pos",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Populate the new column of already imported variants.
+        migrations.RunSQL(
+            "UPDATE main_variant SET end_pos = pos + MAX(LENGTH(ref), 1) - 1",
+            migrations.RunSQL.noop,
+        ),
+        # R*Tree of (chromosome index, start, end) variant intervals with
+        # 32-bit integer coordinates (exact for all chromosome positions).
+        migrations.RunSQL(
+            [
+                "CREATE VIRTUAL TABLE main_variant_interval USING rtree_i32("
+                "id, chrom_min, chrom_max, start_pos, end_pos)",
+                "INSERT INTO main_variant_interval "
+                f"SELECT {interval_values_sql('v')} FROM main_variant AS v",
+                "CREATE TRIGGER main_variant_interval_insert "
+                "AFTER INSERT ON main_variant BEGIN "
+                "INSERT INTO main_variant_interval "
+                f"SELECT {interval_values_sql('NEW')}; END",
+                "CREATE TRIGGER main_variant_interval_update "
+                "AFTER UPDATE OF id, chrom, pos, end_pos ON main_variant BEGIN "
+                "DELETE FROM main_variant_interval WHERE id = OLD.id; "
+                "INSERT INTO main_variant_interval "
+                f"SELECT {interval_values_sql('NEW')}; END",
+                "CREATE TRIGGER main_variant_interval_delete "
+                "AFTER DELETE ON main_variant BEGIN "
+                "DELETE FROM main_variant_interval WHERE id = OLD.id; END",
+            ],
+            [
+                "DROP TRIGGER main_variant_interval_delete",
+                "DROP TRIGGER main_variant_interval_update",
+                "DROP TRIGGER main_variant_interval_insert",
+                "DROP TABLE main_variant_interval",
+            ],
+        ),
+    ]
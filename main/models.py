@@ -1,5 +1,12 @@
 from django.db import models
 
+from main.utils import get_variant_end_pos
+
+# SQLite R*Tree of variant (chromosome index in CHROMOSOMES, pos,
+# end_pos) intervals, created by a migration and kept in sync with the
+# variant table by triggers (see get_chrom_index_sql in main/utils.py).
+VARIANT_INTERVAL_TABLE = 'main_variant_interval'
+
 
 class CancerType(models.Model):
     cancer_type = models.CharField(max_length=255)
@@ -29,6 +36,15 @@ class Variant(models.Model):
     "help_text" whose values match the respective VCF INFO keys 
     (used in db_importer.py). Aggregated cancer types field names are 
     stored without the "_Count_N" ending.
+
+    3. Display-ready fields derived from the VCF data at import time
+    must not have "help_text". They are listed in DISPLAY_FIELDS and 
+    populated in db_importer.py. The same applies to the normalised
+    search fields listed in SEARCH_FIELDS.
+
+    4. cancer_type_counts is only populated by "db_importer.py 
+    --packed-counts", which stores the variant cancer type patient 
+    counts in it instead of the VariantCancerTypePatientCount table.
     """
     chrom = models.CharField(max_length=100)
     pos = models.PositiveIntegerField()
@@ -60,10 +76,47 @@ class Variant(models.Model):
     solid_cancers_count = models.PositiveIntegerField(default=0, 
         help_text=('SameNucleotideChange_Solid_Cancers'))
 
+    # Display-ready values computed at import time, so the variant table
+    # data can be served without per-request formatting.
+    allele_type = models.CharField(max_length=10, default='')
+    worst_consequence = models.CharField(max_length=100, default='')
+    consequence_category = models.CharField(max_length=50, default='')
+    hgvs_c_formatted = models.TextField(null=True)
+    hgvs_p_formatted = models.TextField(null=True)
+
+    # Upper-cased gene_symbol, so case-insensitive gene searches are
+    # index lookups (gene_symbol__iexact cannot use an index in SQLite).
+    gene_symbol_upper = models.CharField(max_length=100, default='')
+    # Last reference position of the variant (pos + len(ref) - 1). The
+    # (chrom, pos, end_pos) intervals are indexed in the
+    # VARIANT_INTERVAL_TABLE R*Tree, so region searches find variants
+    # that overlap the region, e.g. deletions starting before it.
+    end_pos = models.PositiveIntegerField(default=0)
+
+    # Packed variant cancer type patient counts: one PACKED_PCS_DTYPE
+    # record (see main/utils.py) per cancer type with non-zero counts.
+    # NULL if the counts are stored in VariantCancerTypePatientCount.
+    cancer_type_counts = models.BinaryField(null=True)
+
+    DISPLAY_FIELDS = (
+        'allele_type',
+        'worst_consequence',
+        'consequence_category',
+        'hgvs_c_formatted',
+        'hgvs_p_formatted',
+    )
+    SEARCH_FIELDS = (
+        'gene_symbol_upper',
+        'end_pos',
+    )
+
     class Meta:
         indexes = (
-            models.Index(fields=['gene_symbol']),
+            models.Index(fields=['gene_symbol_upper']),
             models.Index(fields=['chrom', 'pos']),
+            models.Index(fields=['allele_type']),
+            models.Index(fields=['worst_consequence']),
+            models.Index(fields=['consequence_category']),
         )
         constraints = (
             models.UniqueConstraint(
@@ -72,6 +125,13 @@ class Variant(models.Model):
             ),
         )
 
+    def save(self, *args, **kwargs):
+        """Saves the variant with the search fields derived from its
+        data (db_importer.py populates them when it inserts rows)."""
+        self.gene_symbol_upper = (self.gene_symbol or '').upper()
+        self.end_pos = get_variant_end_pos(self.pos, self.ref)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         """Returns CHROM-POS-REF-ALT variant ID."""
         return f"{self.chrom}-{self.pos}-{self.ref}-{self.alt}"
@@ -89,3 +149,37 @@ class VariantCancerTypePatientCount(models.Model):
 
     class Meta:
         db_table = 'main_variant_cancer_type_patient_count'
+
+
+class GeneAlias(models.Model):
+    """Approved, previous and alias HGNC gene symbols (upper-cased) of
+    the gene symbols used in the variant table, populated by
+    db_importer.py from the HGNC gene table. Symbols that are used in
+    the variant table or are ambiguous are not stored as aliases.
+    """
+    alias = models.CharField(max_length=100, primary_key=True)
+    gene_symbol = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = 'main_gene_alias'
+
+    def __str__(self):
+        """Returns alias and gene symbol."""
+        return f"{self.alias} -> {self.gene_symbol}"
+
+
+class DatasetMetadata(models.Model):
+    """Key/value information about the imported GENIE dataset (e.g.
+    GENIE version and a unique build id) written by db_importer.py. It
+    is stored in the same database file as the variant data, so it 
+    always describes the data that is being served.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    value = models.TextField()
+
+    class Meta:
+        db_table = 'main_dataset_metadata'
+
+    def __str__(self):
+        """Returns metadata key and value."""
+        return f"{self.key}: {self.value}"
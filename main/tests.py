@@ -1,6 +1,46 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import sqlite3
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from functools import partial
+from pathlib import Path
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse, NoReverseMatch
 
+from main.cache import SQLiteLRUCache, clear_result_cache
+from main.column_index import get_column_index, write_column_index
+from main import dataset
+from main.dataset import (
+    get_dataset_etag, get_dataset_metadata, get_db_file_identity,
+    get_import_report, get_import_report_path, reopen_swapped_databases,
+    reset_dataset_caches, warm_up
+)
+from main.lookups import (
+    SHARD_ID_STRIDE, get_chrom_db, get_variant_cancer_type_pcs, get_variant_db,
+    get_variants, get_variants_page
+)
+from main.models import (
+    CancerType, DatasetMetadata, GeneAlias, Variant,
+    VariantCancerTypePatientCount
+)
+from main.utils import (
+    format_hgvs, get_read_only_db_options, pack_cancer_type_pcs
+)
+from main.vcf import VcfInfoParser
+from main.views import (
+    ajax_variants_async, ajax_variants_stream_async, run_in_db_thread
+)
+
 
 def r(name: str) -> str:
     """Reverse with or without 'main' namespace, depending on project urls."""
@@ -51,6 +91,37 @@ class SearchViewTests(TestCase):
         resp = self.client.get(r("search") + "?search_value=")
         self.assertEqual(resp.status_code, 302)
 
+    def test_gene_alias_search_redirects_to_variant_gene(self):
+        Variant.objects.create(
+            chrom="11", pos=100, ref="C", alt="T", gene_symbol="KMT2A",
+            consequence="x", original_description="x",
+        )
+        GeneAlias.objects.create(alias="MLL", gene_symbol="KMT2A")
+        resp = self.client.get(r("search"), {"search_value": "mll"})
+        self.assertIn("search_value=KMT2A", resp["Location"])
+        # Gene symbols are matched case-insensitively.
+        self.assertEqual(len(get_variants("gene", "kmt2a")), 1)
+        resp = self.client.get(r("search"), {"search_value": "kmt2a"})
+        self.assertIn("search_value=kmt2a", resp["Location"])
+
+    def test_read_gene_aliases_tsv(self):
+        from db_importer import read_gene_aliases_tsv
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "hgnc.tsv"
+            path.write_text(
+                "symbol\tprev_symbol\talias_symbol\n"
+                "KMT2A\tMLL\tALL-1|HRX\n"
+                "TP53\t\tP53|HRX\n"
+                "NF1\t\tTP53\n"
+                "BRCA1\t\tBRCC1\n"
+            )
+            with override_settings(GENE_ALIASES_TSV=path):
+                aliases = read_gene_aliases_tsv({"MLL", "TP53", "NF1"})
+        # Ambiguous aliases, aliases of genes without variants and
+        # variant gene symbols are left out.
+        self.assertEqual(aliases, {"KMT2A": "MLL", "ALL-1": "MLL",
+                                   "P53": "TP53"})
+
 
 class AjaxVariantsTests(TestCase):
     """Tests for the ajax_variants JSON endpoint."""
@@ -62,3 +133,1024 @@ class AjaxVariantsTests(TestCase):
         resp = self.client.get(r("ajax_variants"))
         self.assertEqual(resp.status_code, 200)
         self.assertIn("application/json", resp.get("Content-Type", ""))
+
+    def test_async_view_runs_in_db_thread_pool(self):
+        thread = async_to_sync(run_in_db_thread)(threading.current_thread)
+        self.assertTrue(thread.name.startswith("genie-db"))
+        request = RequestFactory().get(
+            r("ajax_variants"), {"search_key": "gene", "search_value": "TP53"})
+        resp = async_to_sync(ajax_variants_async)(request)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.content)["total"], 0)
+
+    def test_async_stream_reads_chunks_in_db_thread(self):
+        threads = []
+
+        def rows(**params):
+            for pos in range(5):
+                threads.append(threading.current_thread().name)
+                yield {"pos": pos}
+
+        async def read_stream(resp):
+            return [chunk async for chunk in resp.streaming_content]
+
+        request = RequestFactory().get(
+            r("ajax_variants_stream"),
+            {"search_key": "gene", "search_value": "TP53"})
+        with patch("main.views.VARIANT_STREAM_CHUNK_SIZE", 2), \
+                patch("main.views.iter_variants", rows):
+            resp = async_to_sync(ajax_variants_stream_async)(request)
+            self.assertTrue(resp.is_async)
+            chunks = async_to_sync(read_stream)(resp)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(
+            [json.loads(line)["pos"]
+             for line in b"".join(chunks).decode().splitlines()],
+            [0, 1, 2, 3, 4])
+        self.assertEqual(len(set(threads)), 1)
+        self.assertTrue(threads[0].startswith("genie-db"))
+
+
+class AjaxVariantsPageTests(TestCase):
+    """Tests for the server-side paginated variant table data."""
+
+    def setUp(self):
+        for i, (csq, category, protein_pos) in enumerate([
+            ("Missense variant", "Missense / Inframe indel", "10"),
+            ("Stop gained", "PTV LoF", "20-25"),
+            ("Synonymous variant", "Silent", "30-?"),
+            ("Missense variant", "Missense / Inframe indel", None),
+        ]):
+            Variant.objects.create(
+                chrom="17", pos=100 + i, ref="C", alt="T", gene_symbol="TP53",
+                consequence="x", original_description="x", allele_type="SNV",
+                worst_consequence=csq, consequence_category=category,
+                protein_pos=protein_pos, all_cancers_count=i % 2,
+            )
+
+    def get_page(self, **params):
+        params = {"search_key": "gene", "search_value": "TP53",
+                  "limit": 2, **params}
+        resp = self.client.get(r("ajax_variants"), params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_page_and_totals(self):
+        data = self.get_page(offset=1)
+        self.assertEqual([row["pos"] for row in data["rows"]], [101, 102])
+        self.assertEqual(data["total"], 4)
+        self.assertEqual(data["totalNotFiltered"], 4)
+        self.assertEqual(data["consequence_counts"]["Missense variant"], 2)
+
+    def test_sort(self):
+        data = self.get_page(sort="all_cancers_count", order="desc", limit=4)
+        self.assertEqual([row["pos"] for row in data["rows"]],
+                         [101, 103, 100, 102])
+
+    def test_filters(self):
+        data = self.get_page(
+            consequence_category="Missense / Inframe indel,PTV LoF")
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(self.get_page(consequence_category="")["total"], 0)
+        data = self.get_page(filter=json.dumps({"protein_pos": "12-22"}))
+        self.assertEqual([row["pos"] for row in data["rows"]], [101])
+        data = self.get_page(filter=json.dumps({"protein_pos": ">25"}))
+        self.assertEqual([row["pos"] for row in data["rows"]], [102])
+        data = self.get_page(filter=json.dumps({"pos": "<101"}))
+        self.assertEqual([row["pos"] for row in data["rows"]], [100])
+        data = self.get_page(search="stop")
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(data["totalNotFiltered"], 4)
+
+    def test_invalid_page_returns_400(self):
+        resp = self.client.get(r("ajax_variants"), {"limit": "all"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_columnar_format_matches_rows(self):
+        params = {"search_key": "gene", "search_value": "TP53"}
+        rows = self.client.get(r("ajax_variants"), params).json()["rows"]
+        data = self.client.get(
+            r("ajax_variants"), {**params, "format": "columnar"}).json()
+        self.assertEqual(data["dictionaries"]["consequence"], [
+            "Missense variant", "Stop gained", "Synonymous variant"])
+        decoded = [
+            {field: data["dictionaries"][field][values[i]]
+             if field in data["dictionaries"] else values[i]
+             for field, values in data["columns"].items()}
+            for i in range(data["total"])
+        ]
+        self.assertEqual(decoded, rows)
+        page = self.get_page(format="columnar")
+        self.assertEqual(page["columns"]["pos"], [100, 101])
+
+    def test_stream_returns_filtered_ndjson_rows(self):
+        resp = self.client.get(r("ajax_variants_stream"), {
+            "search_key": "gene", "search_value": "TP53", "order": "desc",
+            "consequence_category": "Missense / Inframe indel",
+        })
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        content = b"".join(resp.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["pos"] for row in rows], [103, 100])
+
+    def test_stream_ends_with_error_line(self):
+        def failing_rows(**params):
+            yield {"pos": 100}
+            raise OperationalError("database disk image is malformed")
+
+        with patch("main.views.VARIANT_STREAM_CHUNK_SIZE", 1), \
+                patch("main.views.iter_variants", failing_rows):
+            resp = self.client.get(r("ajax_variants_stream"), {
+                "search_key": "gene", "search_value": "TP53"})
+            content = b"".join(resp.streaming_content).decode()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            [{"pos": 100}, {"error": "database disk image is malformed"}])
+
+    def test_column_index_pages_match_sql(self):
+        Variant.objects.create(
+            chrom="17", pos=90, ref="CAAAAAAAAAAAA", alt="C",
+            gene_symbol="BRCA1", consequence="x", original_description="x",
+            allele_type="INDEL", worst_consequence="Frameshift variant",
+            consequence_category="PTV LoF", all_cancers_count=5,
+        )
+        DatasetMetadata.objects.create(key="build_id", value="b1")
+        reset_dataset_caches()
+        self.addCleanup(reset_dataset_caches)
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                override_settings(COLUMN_INDEX_FOLDER=tmp_dir):
+            self.assertIsNone(get_column_index())
+            write_column_index([connection.connection], "b1")
+            self.assertEqual(get_column_index().build_id, "b1")
+            for search_key, search_value, params in [
+                ("gene", "tp53", {}),
+                ("gene", "TP53", {"sort": "all_cancers_count",
+                                  "order": "desc"}),
+                ("gene", "TP53", {"offset": 1, "limit": 2,
+                                  "sort": "consequence"}),
+                ("gene", "TP53", {"consequence_categories": ["Silent"]}),
+                ("gene", "NF1", {}),
+                ("region", "17:100-102", {"filters": {"pos": "<102"}}),
+                ("region", "17:95-101", {"allele_types": ["INDEL"]}),
+                ("region", "17:95-101",
+                 {"filters": {"consequence": "Stop gained"}}),
+            ]:
+                with patch("main.lookups.get_variant_querysets") as querysets:
+                    page = get_variants_page(search_key, search_value,
+                                             **params)
+                querysets.assert_not_called()
+                with patch("main.lookups.get_column_index",
+                           return_value=None):
+                    self.assertEqual(
+                        page, get_variants_page(search_key, search_value,
+                                                **params))
+
+
+class DatasetMetadataTests(TestCase):
+    """Tests for the imported dataset metadata and database swaps."""
+
+    def setUp(self):
+        reset_dataset_caches()
+
+    def tearDown(self):
+        reset_dataset_caches()
+
+    def test_dataset_genie_version_is_displayed(self):
+        """The imported dataset GENIE version overrides the settings."""
+        DatasetMetadata.objects.create(key="genie_version", value="v99")
+        resp = self.client.get(r("index"))
+        self.assertContains(resp, "NHS GENIE v99")
+
+    def test_swapped_database_clears_caches(self):
+        """A new database file identity must reset cached dataset data."""
+        with patch("main.dataset.get_db_file_identity", return_value=(1, 1)):
+            reopen_swapped_databases()
+        self.assertEqual(get_dataset_metadata(), {})
+        DatasetMetadata.objects.create(key="build_id", value="new")
+        with patch("main.dataset.get_db_file_identity", return_value=(1, 2)):
+            reopen_swapped_databases()
+        self.assertEqual(get_dataset_metadata(), {"build_id": "new"})
+
+    @patch.dict("main.dataset._db_file_identities", clear=True)
+    def test_in_place_import_clears_caches(self):
+        """An import that rewrites the live database file in place (e.g.
+        --diff without --shadow) must reset cached dataset data."""
+        DatasetMetadata.objects.create(key="build_id", value="1")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "db.sqlite3"
+            path.write_bytes(b"")
+            # The test database is in memory and must stay open.
+            with patch.dict(connection.settings_dict, {"NAME": path}), \
+                    patch.object(connection, "close"), \
+                    patch.object(dataset._thread_db_file_identities,
+                                 "aliases", {}, create=True):
+                reopen_swapped_databases()
+                etag = get_dataset_etag()
+                self.assertEqual(get_dataset_metadata()["build_id"], "1")
+
+                DatasetMetadata.objects.filter(key="build_id")\
+                    .update(value="2")
+                get_import_report_path().write_text("{}")
+                reopen_swapped_databases()
+                self.assertEqual(get_dataset_metadata()["build_id"], "2")
+                self.assertNotEqual(get_dataset_etag(), etag)
+
+
+class HttpCachingTests(TestCase):
+    """Tests for the dataset ETag and HTTP caching headers."""
+
+    def setUp(self):
+        reset_dataset_caches()
+
+    def tearDown(self):
+        reset_dataset_caches()
+
+    def test_conditional_requests_use_dataset_etag(self):
+        resp = self.client.get(r("about"))
+        self.assertFalse(resp.has_header("ETag"))
+
+        DatasetMetadata.objects.create(key="build_id", value="1")
+        DatasetMetadata.objects.create(key="built_at",
+                                       value="2026-01-01T00:00:00+00:00")
+        reset_dataset_caches()
+        resp = self.client.get(r("about"))
+        etag = resp["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(resp["Last-Modified"],
+                         "Thu, 01 Jan 2026 00:00:00 GMT")
+        self.assertIn("max-age=", resp["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(r("ajax_variants"),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(r("index"),
+                               HTTP_IF_MODIFIED_SINCE=resp["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+
+        DatasetMetadata.objects.filter(key="build_id").update(value="2")
+        reset_dataset_caches()
+        resp = self.client.get(r("about"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        resp = self.client.get(r("ajax_variants"), {"limit": "x"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(resp.has_header("Cache-Control"))
+
+    def test_streaming_responses_are_not_cacheable(self):
+        DatasetMetadata.objects.create(key="build_id", value="1")
+        resp = self.client.get(r("ajax_variants_stream"), {
+            "search_key": "gene", "search_value": "TP53"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.has_header("ETag"))
+        self.assertFalse(resp.has_header("Cache-Control"))
+
+
+class HealthzTests(TestCase):
+    """Tests for the health check endpoint."""
+
+    def setUp(self):
+        reset_dataset_caches()
+
+    def tearDown(self):
+        reset_dataset_caches()
+
+    @patch.dict("main.dataset._warm_state", clear=True)
+    def test_healthz_reports_warm_state(self):
+        DatasetMetadata.objects.create(key="build_id", value="1")
+        resp = self.client.get(reverse("healthz"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.json()["warm"])
+        self.assertIn("no-store", resp["Cache-Control"])
+
+        self.assertTrue(warm_up()["warm"])
+        with self.assertNumQueries(0):
+            self.client.get(r("about"))
+        data = self.client.get(reverse("healthz")).json()
+        self.assertTrue(data["warm"])
+        self.assertEqual(data["build_id"], "1")
+
+    def test_healthz_fails_without_database_tables(self):
+        """An empty database (e.g. a missing file that SQLite has
+        created) is not healthy."""
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE main_dataset_metadata "
+                           "RENAME TO main_dataset_metadata_old")
+        resp = self.client.get(reverse("healthz"))
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json()["status"], "error")
+        self.assertIn("no such table", resp.json()["error"])
+
+
+class ReadOnlyModeTests(TestCase):
+    """Tests for the read-only database serving mode."""
+
+    def test_read_only_db_options(self):
+        """Read-only serving mode connections cannot write."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "db.sqlite3"
+            with sqlite3.connect(path) as db:
+                db.execute("CREATE TABLE t (x)")
+                db.execute("INSERT INTO t VALUES (1)")
+            db.close()
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict, "NAME": path,
+                "OPTIONS": get_read_only_db_options(path, 2**20),
+            }, alias="read_only")
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute("SELECT x FROM t")
+                    self.assertEqual(cursor.fetchall(), [(1,)])
+                    with self.assertRaises(OperationalError):
+                        cursor.execute("INSERT INTO t VALUES (2)")
+            finally:
+                wrapper.close()
+
+    def test_db_file_identity_tracks_writes_in_read_only_mode(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "db.sqlite3"
+            path.write_bytes(b"1")
+            with patch.dict(connection.settings_dict, {"NAME": path}):
+                identity = get_db_file_identity()
+                with override_settings(DB_READ_ONLY=True):
+                    read_only_identity = get_db_file_identity()
+                path.write_bytes(b"12")
+                # In-place writes (e.g. sessions) keep the identity.
+                self.assertEqual(get_db_file_identity(), identity)
+                with override_settings(DB_READ_ONLY=True):
+                    self.assertNotEqual(get_db_file_identity(),
+                                        read_only_identity)
+
+
+class ResultCacheTests(TestCase):
+    """Tests for the shared serialised results cache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = Path(self.tmp_dir.name) / "cache.sqlite3"
+        self.settings_override = override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            },
+            "results": {
+                "BACKEND": "main.cache.SQLiteLRUCache",
+                "LOCATION": str(path),
+                "OPTIONS": {"MAX_SIZE_MB": 1},
+            },
+        })
+        self.settings_override.enable()
+        reset_dataset_caches()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        reset_dataset_caches()
+        self.tmp_dir.cleanup()
+
+    def test_lru_eviction(self):
+        cache = SQLiteLRUCache(
+            str(Path(self.tmp_dir.name) / "lru.sqlite3"),
+            {"OPTIONS": {"MAX_SIZE_MB": 0.001}},  # 1048 bytes
+        )
+        db = cache._get_db()
+
+        def get_accessed(key):
+            return db.execute("SELECT accessed FROM cache WHERE key = ?",
+                              (cache.make_key(key),)).fetchone()[0]
+
+        def get_total_size():
+            total, = db.execute("SELECT total FROM cache_size").fetchone()
+            self.assertEqual(
+                total, db.execute("SELECT SUM(size) FROM cache").fetchone()[0]
+                or 0)
+            return total
+
+        with patch("main.cache.time.time", return_value=1000):
+            cache.set("a", b"x" * 400, None)
+            cache.set("b", b"x" * 400, None)
+        # Recent access times are not refreshed by cache hits.
+        with patch("main.cache.time.time", return_value=1030):
+            self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(get_accessed("a"), 1000)
+        with patch("main.cache.time.time", return_value=1050):
+            cache.set("b", b"x" * 300, None)
+        self.assertEqual(get_total_size(), 418 + 318)  # Pickled sizes
+        with patch("main.cache.time.time", return_value=1100):
+            self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(get_accessed("a"), 1100)
+        with patch("main.cache.time.time", return_value=1200):
+            cache.set("c", b"x" * 400, None)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertTrue(cache.has_key("c"))
+        self.assertFalse(cache.add("c", 1))
+        self.assertTrue(cache.delete("a"))
+        self.assertEqual(get_total_size(), 418)
+        cache.clear()
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(get_total_size(), 0)
+
+    def test_results_are_cached_per_build(self):
+        Variant.objects.create(
+            chrom="17", pos=100, ref="C", alt="T", gene_symbol="TP53",
+            consequence="x", original_description="x",
+        )
+        params = {"search_key": "gene", "search_value": "TP53"}
+        # Without an imported dataset (build id) nothing is cached.
+        self.client.get(r("ajax_variants"), params)
+        Variant.objects.update(pos=101)
+        resp = self.client.get(r("ajax_variants"), params)
+        self.assertEqual(resp.json()["rows"][0]["pos"], 101)
+
+        DatasetMetadata.objects.create(key="build_id", value="1")
+        reset_dataset_caches()
+        self.client.get(r("ajax_variants"), params)
+        Variant.objects.update(pos=102)
+        resp = self.client.get(r("ajax_variants"), params)
+        self.assertEqual(resp.json()["rows"][0]["pos"], 101)
+
+        # A new build does not use the cached results of the old one.
+        DatasetMetadata.objects.filter(key="build_id").update(value="2")
+        reset_dataset_caches()
+        resp = self.client.get(r("ajax_variants"), params)
+        self.assertEqual(resp.json()["rows"][0]["pos"], 102)
+
+        Variant.objects.update(pos=103)
+        clear_result_cache()
+        resp = self.client.get(r("ajax_variants"), params)
+        self.assertEqual(resp.json()["rows"][0]["pos"], 103)
+
+    def test_warm_cache_command(self):
+        Variant.objects.create(
+            chrom="17", pos=100, ref="C", alt="T", gene_symbol="TP53",
+            consequence="x", original_description="x",
+        )
+        params = {"search_key": "gene", "search_value": "TP53"}
+        log_path = Path(self.tmp_dir.name) / "access.log"
+        log_path.write_text(
+            '1.2.3.4 - - [01/Jan/2026:00:00:00 +0000] "GET '
+            f'{r("variants")}?search_key=gene&search_value=TP53 HTTP/1.1" '
+            '200 100 "-" "-"\n'
+        )
+        with override_settings(WARM_CACHE_FOLDER=Path(self.tmp_dir.name)):
+            with self.assertRaises(CommandError):
+                call_command("warm_cache", access_log=[str(log_path)])
+            DatasetMetadata.objects.create(key="build_id", value="1")
+            reset_dataset_caches()
+            call_command("warm_cache", access_log=[str(log_path)],
+                         stdout=io.StringIO())
+            Variant.objects.update(pos=101)
+            resp = self.client.get(r("ajax_variants"), params,
+                                   HTTP_ACCEPT_ENCODING="gzip, deflate")
+            self.assertEqual(resp["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", resp["Vary"])
+            data = json.loads(gzip.decompress(resp.content))
+            self.assertEqual(data["rows"][0]["pos"], 100)
+            # Clients that do not accept compressed responses get the
+            # same (cached) data.
+            resp = self.client.get(r("ajax_variants"), params)
+            self.assertFalse(resp.has_header("Content-Encoding"))
+            self.assertEqual(resp.json(), data)
+
+
+class ImportReportTests(TestCase):
+    """Tests for reading the db_importer.py JSON import report."""
+
+    def test_get_import_report(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "db.sqlite3.import-report.json"
+            with patch("main.dataset.get_import_report_path",
+                       return_value=path):
+                self.assertEqual(get_import_report(), {})
+                path.write_text(json.dumps({"table_rows": {"main_variant": 1}}))
+                self.assertEqual(
+                    get_import_report()["table_rows"], {"main_variant": 1})
+
+
+class CancerTypeSyncTests(TestCase):
+    """Tests for updating cancer types from the CSV in --diff imports."""
+
+    def test_cancer_types_removed_from_csv_are_deleted(self):
+        from db_importer import delete_stale_cancer_types
+        variant = Variant.objects.create(
+            chrom="17", pos=100, ref="C", alt="T", gene_symbol="TP53",
+            consequence="x", original_description="x",
+        )
+        for vcf_name in ("Breast_Cancer", "Old_Cancer"):
+            cancer_type = CancerType.objects.create(
+                cancer_type=vcf_name, cancer_type_vcf=vcf_name,
+                is_haemonc=False, is_solid=True, total_patient_count=10,
+            )
+            VariantCancerTypePatientCount.objects.create(
+                variant=variant, cancer_type=cancer_type,
+                same_nucleotide_change_pc=1, same_amino_acid_change_pc=1,
+                same_or_downstream_truncating_variants_per_aa_pc=1,
+                nested_inframe_deletions_per_aa_pc=1,
+            )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "cancer_types.csv"
+            # Old_Cancer was dropped from the CSV.
+            path.write_text(
+                "display_name,vcf_name,is_haemonc,is_solid,"
+                "total_patient_count\n"
+                "Breast Cancer,Breast_Cancer,0,1,100\n"
+            )
+            with override_settings(GENIE_CANCER_TYPES_CSV=path):
+                self.assertEqual(delete_stale_cancer_types(
+                    connection.connection.cursor()), 1)
+        self.assertEqual(
+            list(CancerType.objects.values_list("cancer_type_vcf", flat=True)),
+            ["Breast_Cancer"])
+        self.assertEqual(
+            list(VariantCancerTypePatientCount.objects.values_list(
+                "cancer_type__cancer_type_vcf", flat=True)),
+            ["Breast_Cancer"])
+
+
+class DbImporterTests(TestCase):
+    """Tests for the db_importer.py VCF import, diff and resume paths,
+    run on new database files with the schema of the test database."""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = Path(tmp_dir.name)
+        csv_path = self.tmp_path / "cancer_types.csv"
+        csv_path.write_text(
+            "display_name,vcf_name,is_haemonc,is_solid,total_patient_count\n"
+            "All Cancers,All_Cancers,0,0,150\n"
+            "Haemonc Cancers,Haemonc_Cancers,1,0,50\n"
+            "Solid Cancers,Solid_Cancers,0,1,100\n"
+            "Breast Cancer,BreastCancer,0,1,20\n"
+        )
+        self.vcf_path = self.tmp_path / "genie.vcf.gz"
+        settings_override = override_settings(
+            GENIE_CANCER_TYPES_CSV=csv_path, GENIE_VCF=self.vcf_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        stdout = redirect_stdout(io.StringIO())
+        self.stdout = stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+    def create_db(self, name: str = "db.sqlite3") -> sqlite3.Connection:
+        """Returns a connection to a new database file with the test
+        database schema and the cancer types of the CSV."""
+        from db_importer import get_db, import_cancer_types
+        db = get_db(self.tmp_path / name)
+        self.addCleanup(db.close)
+        connection.ensure_connection()
+        connection.connection.backup(db)
+        import_cancer_types(db)
+        return db
+
+    def write_vcf(self, *variants):
+        """Writes the GENIE VCF with (pos, count) chr17 variants."""
+        count_keys = [f"SameNucleotideChange_{name}_Count_N_{n}"
+                      for name, n in (("All_Cancers", 150),
+                                      ("Haemonc_Cancers", 50),
+                                      ("Solid_Cancers", 100),
+                                      ("BreastCancer", 20))]
+        with gzip.open(self.vcf_path, "wt") as f:
+            f.write("##fileformat=VCFv4.2\n")
+            for info_id in ["Hugo_Symbol", "Consequence",
+                            "Genie_description", *count_keys]:
+                f.write(f"##INFO=<ID={info_id},Number=.,Type=String,"
+                        "Description=\"x\">\n")
+            f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+            for pos, count in variants:
+                info = ";".join(["Hugo_Symbol=TP53",
+                                 "Consequence=missense_variant",
+                                 f"Genie_description=17_{pos}_C_T",
+                                 *(f"{key}={count}" for key in count_keys)])
+                f.write(f"17\t{pos}\t.\tC\tT\t.\t.\t{info}\n")
+
+    def get_rows(self, db) -> tuple:
+        """Returns the variant and patient count table rows."""
+        return tuple(
+            db.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+            for table in ("main_variant",
+                          "main_variant_cancer_type_patient_count"))
+
+    def get_counts(self, db) -> dict:
+        """Returns the variant ids and all cancers counts by position."""
+        return {pos: (variant_id, count) for variant_id, pos, count in
+                db.execute("SELECT id, pos, all_cancers_count "
+                           "FROM main_variant")}
+
+    def test_parallel_import_matches_serial_import(self):
+        from db_importer import import_vcf_variants, read_vcf_chunks
+        self.write_vcf(*[(100 + i, i + 1) for i in range(7)])
+        serial_db = self.create_db("serial.sqlite3")
+        parallel_db = self.create_db("parallel.sqlite3")
+        # Several chunks, which are parsed by different processes.
+        with patch("db_importer.read_vcf_chunks",
+                   partial(read_vcf_chunks, chunk_size=2)):
+            import_vcf_variants(serial_db)
+            import_vcf_variants(parallel_db, workers=2)
+        rows = self.get_rows(serial_db)
+        self.assertEqual([len(table_rows) for table_rows in rows], [7, 28])
+        self.assertEqual(self.get_rows(parallel_db), rows)
+
+    def test_diff_applies_changes_and_keeps_variant_ids(self):
+        from db_importer import diff_vcf_variants, import_vcf_variants
+        self.write_vcf((100, 1), (101, 2), (102, 3))
+        db = self.create_db()
+        import_vcf_variants(db)
+        ids = {pos: variant_id for pos, (variant_id, _)
+               in self.get_counts(db).items()}
+
+        # 101 is changed, 102 is deleted and 103 is added.
+        self.write_vcf((100, 1), (101, 5), (103, 4))
+        self.stdout.seek(0)
+        self.stdout.truncate()
+        diff_vcf_variants(db)
+        for line in ("variants updated: 1", "variants inserted: 1",
+                     "variants deleted: 1", "variants unchanged: 1",
+                     "patient counts deleted: 4",
+                     "patient counts updated: 4",
+                     "patient counts inserted: 4"):
+            self.assertIn(line, self.stdout.getvalue())
+        self.assertEqual(self.get_counts(db), {
+            100: (ids[100], 1), 101: (ids[101], 5), 103: (4, 4)})
+        self.assertEqual(
+            db.execute("SELECT variant_id, same_nucleotide_change_pc FROM "
+                       "main_variant_cancer_type_patient_count ORDER BY "
+                       "variant_id, cancer_type_id").fetchall(),
+            [(ids[100], 1)] * 4 + [(ids[101], 5)] * 4 + [(4, 4)] * 4)
+
+        # The same VCF again changes nothing.
+        rows = self.get_rows(db)
+        self.stdout.seek(0)
+        self.stdout.truncate()
+        diff_vcf_variants(db)
+        self.assertIn("variants unchanged: 3", self.stdout.getvalue())
+        for name in ("updated", "inserted", "deleted"):
+            self.assertIn(f"variants {name}: 0", self.stdout.getvalue())
+        self.assertEqual(self.get_rows(db), rows)
+
+    def test_failed_diff_is_rolled_back(self):
+        from db_importer import diff_vcf_variants, import_vcf_variants
+        self.write_vcf((100, 1), (101, 2))
+        db = self.create_db()
+        import_vcf_variants(db)
+        rows = self.get_rows(db)
+        self.write_vcf((101, 5), (102, 3))
+        with patch("db_importer.delete_stale_cancer_types",
+                   side_effect=sqlite3.OperationalError("disk I/O error")), \
+                self.assertRaises(SystemExit):
+            diff_vcf_variants(db)
+        self.assertEqual(self.get_rows(db), rows)
+
+    def test_validate_and_swap_shadow_database(self):
+        from db_importer import (
+            get_shadow_db_path, import_vcf_variants, swap_db, validate_db
+        )
+        db_path = self.tmp_path / "db.sqlite3"
+        self.create_db(db_path.name)
+        shadow_path = get_shadow_db_path(db_path)
+        shadow_db = self.create_db(shadow_path.name)
+        with self.assertRaises(SystemExit):
+            validate_db(shadow_db)
+        self.write_vcf((100, 1), (101, 2))
+        import_vcf_variants(shadow_db)
+        validate_db(shadow_db)
+        shadow_db.close()
+
+        # A live journal would be applied to the new database.
+        journal_path = Path(f"{db_path}-journal")
+        journal_path.touch()
+        with self.assertRaises(SystemExit):
+            swap_db(shadow_path, db_path)
+        self.assertTrue(shadow_path.exists())
+        journal_path.unlink()
+        swap_db(shadow_path, db_path)
+        self.assertFalse(shadow_path.exists())
+        with sqlite3.connect(db_path) as db:
+            self.assertEqual(len(self.get_counts(db)), 2)
+        db.close()
+
+    def test_resume_interrupted_import(self):
+        from db_importer import (
+            check_checkpoint, import_vcf_variants, parse_vcf_chunks,
+            read_checkpoint, read_vcf_chunks
+        )
+        self.write_vcf(*[(100 + i, i + 1) for i in range(5)])
+
+        def interrupted_chunks(chunks, workers=1):
+            results = parse_vcf_chunks(chunks, workers)
+            yield next(results)
+            raise RuntimeError("killed")
+
+        expected_db = self.create_db("expected.sqlite3")
+        db = self.create_db()
+        with patch("db_importer.read_vcf_chunks",
+                   partial(read_vcf_chunks, chunk_size=2)):
+            import_vcf_variants(expected_db)
+            with patch("db_importer.parse_vcf_chunks", interrupted_chunks), \
+                    self.assertRaises(RuntimeError):
+                import_vcf_variants(db)
+            checkpoint = read_checkpoint(db)
+            self.assertEqual((checkpoint["batch"], checkpoint["variants"]),
+                             (1, 2))
+            check_checkpoint(checkpoint, packed_counts=False)
+            import_vcf_variants(db, checkpoint=checkpoint, resume=True)
+        self.assertEqual(self.get_rows(db), self.get_rows(expected_db))
+
+    def test_interrupted_bulk_load_cannot_be_resumed(self):
+        from db_importer import check_checkpoint, new_checkpoint
+        self.write_vcf((100, 1))
+        checkpoint = new_checkpoint(False, [], bulk_load=True)
+        with self.assertRaises(SystemExit):
+            check_checkpoint(checkpoint, packed_counts=False)
+        check_checkpoint(new_checkpoint(False, []), packed_counts=False)
+
+
+class VariantDisplayFieldsTests(TestCase):
+    """Tests for the variant display fields precomputed at import time."""
+
+    def test_format_hgvs(self):
+        self.assertEqual(
+            format_hgvs("ENSP01.1:p.Arg175His&ENSP02.1:p.Leu10%3D"),
+            "p.(Arg175His), p.(Leu10=)",
+        )
+        self.assertIsNone(format_hgvs(None))
+
+    def test_get_variants_returns_display_fields(self):
+        variant = Variant.objects.create(
+            chrom="17", pos=7675088, ref="C", alt="T", gene_symbol="TP53",
+            consequence="missense_variant", hgvs_p="p.Arg175His",
+            original_description="17:7675088C>T", allele_type="SNV",
+            worst_consequence="Missense variant",
+            consequence_category="Missense / Inframe indel",
+            hgvs_p_formatted="p.(Arg175His)",
+        )
+        rows = get_variants("gene", "tp53")
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["variant_id"], variant.id)
+        self.assertEqual(rows[0]["consequence"], "Missense variant")
+        self.assertEqual(rows[0]["hgvs_p"], "p.(Arg175His)")
+        self.assertIsNone(rows[0]["hgvs_c"])
+
+
+class RegionSearchTests(TestCase):
+    """Tests for the variant interval (overlap) region search."""
+
+    def setUp(self):
+        for chrom, pos, ref in [("17", 95, "CAAAAAA"), ("17", 100, "C"),
+                                ("17", 110, "CA"), ("7", 100, "C")]:
+            Variant.objects.create(
+                chrom=chrom, pos=pos, ref=ref, alt="C", gene_symbol="TP53",
+                consequence="x", original_description="x",
+            )
+
+    def search(self, region: str) -> list:
+        return [(row["chrom"], row["pos"])
+                for row in get_variants("region", region)]
+
+    def test_region_search_returns_overlapping_variants(self):
+        self.assertEqual(Variant.objects.get(pos=95).end_pos, 101)
+        # The deletion at 95-101 overlaps the region.
+        self.assertEqual(self.search("17:100-110"),
+                         [("17", 95), ("17", 100), ("17", 110)])
+        self.assertEqual(self.search("17:102-110"), [("17", 110)])
+        self.assertEqual(self.search("17:111"), [("17", 110)])
+        self.assertEqual(self.search("7:1-1000"), [("7", 100)])
+        self.assertEqual(self.search("chr7:1-1000"), [])
+
+    def test_interval_index_follows_variant_changes(self):
+        variant = Variant.objects.get(chrom="7")
+        variant.pos = 200
+        variant.save()
+        self.assertEqual(self.search("7:1-199"), [])
+        variant.delete()
+        self.assertEqual(self.search("7:1-1000"), [])
+
+
+class PackedCancerTypeCountsTests(TestCase):
+    """Tests for the variant cancer type patient counts subtable data."""
+
+    def setUp(self):
+        reset_dataset_caches()
+        self.cancer_type = CancerType.objects.create(
+            cancer_type="Breast Cancer", cancer_type_vcf="Breast_Cancer",
+            is_haemonc=False, is_solid=True, total_patient_count=100,
+        )
+        self.variant = Variant.objects.create(
+            chrom="17", pos=7675088, ref="C", alt="T", gene_symbol="TP53",
+            consequence="missense_variant", original_description="x",
+        )
+        self.expected = [{
+            "cancer_type": "Breast Cancer",
+            "cancer_type_order": 3,
+            "category": "Solid",
+            "same_nucleotide_change_pc": 1,
+            "same_amino_acid_change_pc": 2,
+            "same_or_downstream_truncating_variants_per_aa_pc": 3,
+            "nested_inframe_deletions_per_aa_pc": 4,
+            "cancer_n": 100,
+        }]
+
+    def tearDown(self):
+        reset_dataset_caches()
+
+    def test_table_and_packed_counts_match(self):
+        VariantCancerTypePatientCount.objects.create(
+            variant=self.variant, cancer_type=self.cancer_type,
+            same_nucleotide_change_pc=1, same_amino_acid_change_pc=2,
+            same_or_downstream_truncating_variants_per_aa_pc=3,
+            nested_inframe_deletions_per_aa_pc=4,
+        )
+        self.assertEqual(
+            get_variant_cancer_type_pcs(self.variant.id), self.expected)
+        # Subtable rows and packed counts are read in one query.
+        with self.assertNumQueries(1):
+            get_variant_cancer_type_pcs(self.variant.id)
+
+        VariantCancerTypePatientCount.objects.all().delete()
+        self.variant.cancer_type_counts = pack_cancer_type_pcs(
+            {self.cancer_type.id: [1, 2, 3, 4]})
+        self.variant.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                get_variant_cancer_type_pcs(self.variant.id), self.expected)
+
+    def test_batched_cancer_type_pcs(self):
+        self.variant.cancer_type_counts = pack_cancer_type_pcs(
+            {self.cancer_type.id: [1, 2, 3, 4]})
+        self.variant.save()
+        other = Variant.objects.create(
+            chrom="17", pos=7675089, ref="A", alt="T", gene_symbol="TP53",
+            consequence="missense_variant", original_description="x",
+        )
+        resp = self.client.get(
+            r("ajax_variants_cancer_pcs"),
+            {"variant_ids": f"{self.variant.id},{other.id},x,999999"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["variants"],
+                         {str(self.variant.id): self.expected,
+                          str(other.id): []})
+        with patch("main.views.MAX_VARIANT_PAGE_SIZE", 1):
+            resp = self.client.get(r("ajax_variants_cancer_pcs"),
+                                   {"variant_ids": "1,2"})
+        self.assertEqual(resp.status_code, 400)
+
+        query = {"search_key": "gene", "search_value": "TP53",
+                 "limit": "10", "cancer_pcs": "1"}
+        data = self.client.get(r("ajax_variants"), query).json()
+        self.assertEqual(data["cancer_pcs"][str(self.variant.id)],
+                         self.expected)
+        query.pop("cancer_pcs")
+        data = self.client.get(r("ajax_variants"), query).json()
+        self.assertNotIn("cancer_pcs", data)
+
+    def test_batch_variant_lookup(self):
+        self.variant.cancer_type_counts = pack_cancer_type_pcs(
+            {self.cancer_type.id: [1, 2, 3, 4]})
+        self.variant.save()
+        keys = ["chr17-7675088-C-T", "17-7675088-C-G", "bad", 17]
+        resp = self.client.post(
+            r("ajax_variants_batch"),
+            json.dumps({"variants": keys, "cancer_pcs": True}),
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()["variants"]
+        self.assertEqual([result["found"] for result in results],
+                         [True, False, False, False])
+        self.assertEqual(results[0]["variant_id"], self.variant.id)
+        self.assertEqual(results[0]["gene"], "TP53")
+        self.assertEqual(results[0]["cancer_pcs"], self.expected)
+
+        resp = self.client.post(
+            r("ajax_variants_batch"), json.dumps({"variants": "17-1-C-T"}),
+            content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        with patch("main.views.MAX_BATCH_LOOKUP_KEYS", 1):
+            resp = self.client.post(
+                r("ajax_variants_batch"), json.dumps({"variants": keys}),
+                content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(
+            self.client.get(r("ajax_variants_batch")).status_code, 405)
+
+
+class AnnotateVcfCommandTests(TestCase):
+    """Tests for the annotate_vcf management command."""
+
+    def setUp(self):
+        reset_dataset_caches()
+        self.cancer_type = CancerType.objects.create(
+            cancer_type="Breast Cancer", cancer_type_vcf="Breast_Cancer",
+            is_haemonc=False, is_solid=True, total_patient_count=100,
+        )
+        self.variant = Variant.objects.create(
+            chrom="17", pos=7675088, ref="C", alt="T", gene_symbol="TP53",
+            consequence="missense_variant", original_description="x",
+            all_cancers_count=7,
+            cancer_type_counts=pack_cancer_type_pcs(
+                {self.cancer_type.id: [1, 2, 3, 4]}),
+        )
+
+    def tearDown(self):
+        reset_dataset_caches()
+
+    def test_annotate_vcf_command(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_path = Path(tmp_dir) / "in.vcf"
+            out_path = Path(tmp_dir) / "out.vcf.gz"
+            in_path.write_text(
+                "##fileformat=VCFv4.2\n"
+                "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+                "chr17\t7675088\t.\tC\tG,T\t.\t.\tDP=5\n"
+                "17\t7675089\t.\tA\tT\t.\t.\t.\n"
+                "18\t1\t.\tA\tT\t.\t.\t.\n"
+            )
+            call_command("annotate_vcf", str(in_path), str(out_path),
+                         "--cancer-types", stderr=io.StringIO())
+            with gzip.open(out_path, "rt") as f:
+                lines = f.read().splitlines()
+            info_id = ("GENIE_NestedInframeDeletionsPerAA_Breast_Cancer_"
+                       "Count_N_100")
+            self.assertIn(
+                f"##INFO=<ID={info_id},Number=A,Type=Integer,Description="
+                f"\"NHS GENIE patient count ({info_id})\">", lines)
+            info = lines[-3].split("\t")[7].split(";")
+            self.assertEqual(
+                info[:2],
+                ["DP=5", "GENIE_SameNucleotideChange_All_Cancers=.,7"])
+            self.assertIn(f"{info_id}=.,4", info)
+            self.assertEqual(lines[-2:], ["17\t7675089\t.\tA\tT\t.\t.\t.",
+                                          "18\t1\t.\tA\tT\t.\t.\t."])
+
+            in_path.write_text(
+                "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+                "17\t7675089\t.\tA\tT\t.\t.\t.\n"
+                "17\t7675088\t.\tC\tT\t.\t.\t.\n"
+            )
+            with self.assertRaises(CommandError):
+                call_command("annotate_vcf", str(in_path), str(out_path),
+                             stderr=io.StringIO())
+
+    def test_parallel_annotation_requires_contiguous_chromosomes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_path = Path(tmp_dir) / "in.vcf.gz"
+            with gzip.open(in_path, "wt") as f:
+                f.write(
+                    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+                    "17\t7675088\t.\tC\tT\t.\t.\t.\n"
+                    "18\t1\t.\tA\tT\t.\t.\t.\n"
+                    "17\t7675089\t.\tA\tT\t.\t.\t.\n"
+                )
+            with self.assertRaisesMessage(CommandError, "not contiguous"):
+                call_command("annotate_vcf", str(in_path),
+                             str(Path(tmp_dir) / "out.vcf"), "--workers",
+                             "2", stderr=io.StringIO())
+
+
+class ShardRouterTests(TestCase):
+    """Tests for routing variant queries to chromosome shards."""
+
+    def test_unsharded_queries_use_default_database(self):
+        self.assertEqual(get_chrom_db("17"), "default")
+        self.assertEqual(get_variant_db(1), "default")
+
+    @override_settings(SHARDED_DB=True,
+                       VARIANT_SHARDS={"1": "shard_1", "X": "shard_X"})
+    def test_sharded_queries_use_chromosome_shards(self):
+        self.assertEqual(get_chrom_db("X"), "shard_X")
+        self.assertIsNone(get_chrom_db("chr1"))
+        self.assertEqual(get_variant_db(SHARD_ID_STRIDE + 5), "shard_1")
+        self.assertEqual(get_variant_db(23 * SHARD_ID_STRIDE), "shard_X")
+        self.assertIsNone(get_variant_db(5))
+        self.assertEqual(get_variants("region", "chr1:1-5"), [])
+
+
+class VcfInfoParserTests(TestCase):
+    """Tests for the header-compiled VCF INFO parser."""
+
+    def setUp(self):
+        self.parser = VcfInfoParser(
+            ["Hugo_Symbol", "SameNucleotideChange_All_Cancers_Count_N_100"],
+            [("Hugo_Symbol", None),
+             ("SameNucleotideChange_All_Cancers", 0)],
+            {"All_Cancers": 1, "Breast": 2},
+        )
+
+    def test_parse_info(self):
+        values, pcs = self.parser.parse(
+            "Hugo_Symbol=TP53;SameNucleotideChange_All_Cancers_Count_N_100=3;"
+            "SameAminoAcidChange_Breast_Count_N_10=2;"
+            "SameAminoAcidChange_Breast_Patient_IDs=P1,P2;"
+            "NestedInframeDeletionsPerAA_All_Cancers_Count_N_100=0"
+        )
+        self.assertEqual(values, ["TP53", "3"])
+        self.assertEqual(pcs, {1: [3, 0, 0, 0], 2: [0, 2, 0, 0]})
+
+    def test_unknown_cancer_type_raises(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse("SameNucleotideChange_Lung_Count_N_10=1")
+        # Zero counts of unknown cancer types are ignored.
+        self.assertEqual(
+            self.parser.parse("SameNucleotideChange_Lung_Count_N_10=0"),
+            ([None, 0], {}),
+        )
@@ -1,14 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from main import views
 
 app_name = 'main'
 
+# The ASGI workers serve the async versions of the ajax endpoints.
+if settings.ASYNC_VIEWS:
+    ajax_variants = views.ajax_variants_async
+    ajax_variants_stream = views.ajax_variants_stream_async
+    ajax_variant_cancer_pcs = views.ajax_variant_cancer_pcs_async
+    ajax_variants_cancer_pcs = views.ajax_variants_cancer_pcs_async
+else:
+    ajax_variants = views.ajax_variants
+    ajax_variants_stream = views.ajax_variants_stream
+    ajax_variant_cancer_pcs = views.ajax_variant_cancer_pcs
+    ajax_variants_cancer_pcs = views.ajax_variants_cancer_pcs
+
 urlpatterns = [
     path('', views.index, name='index'),
     path('about/', views.about, name='about'),
     path('release_notes/', views.release_notes, name='release_notes'),
     path('variants/', views.variants, name='variants'),
     path('search/', views.search_view, name='search'),
-    path('ajax_variants/', views.ajax_variants, name='ajax_variants'),
-    path('ajax_variant_cancer_pcs', views.ajax_variant_cancer_pcs, name='ajax_variant_cancer_pcs'),
+    path('ajax_variants/', ajax_variants, name='ajax_variants'),
+    path('ajax_variants_stream/', ajax_variants_stream, name='ajax_variants_stream'),
+    path('ajax_variants_batch/', views.ajax_variants_batch, name='ajax_variants_batch'),
+    path('ajax_variant_cancer_pcs', ajax_variant_cancer_pcs, name='ajax_variant_cancer_pcs'),
+    path('ajax_variants_cancer_pcs/', ajax_variants_cancer_pcs, name='ajax_variants_cancer_pcs'),
 ]
\ No newline at end of file
@@ -1,3 +1,8 @@
+import struct
+from pathlib import Path
+
+import numpy as np
+
 CHROMOSOMES = tuple(str(x) for x in range(1, 23)) + ('X', 'Y', 'MT')
 
 # A dictionary with Ensembl VEP consequences SO and display terms
@@ -146,4 +151,169 @@ def get_consequence_category(csq: str, hgvs_p: str) -> str:
     elif csq == 'synonymous_variant':
         return 'Silent'
     else:
-        return 'Other'
\ No newline at end of file
+        return 'Other'
+
+
+def format_hgvs(hgvs_str: str) -> str:
+    """
+    Format HGVS descriptions for display.
+
+    Parameters
+    ----------
+    hgvs_str : str
+        VCF HGVS descriptions delimited by '&', e.g.
+        "ENSP00000269305.4:p.Arg175His&ENSP00000352610.4:p.Arg175His"
+
+    Returns
+    -------
+    str
+        HGVS descriptions delimited by ', ' with HGVSp descriptions
+        in parentheses (e.g. p.(Arg175His)) and '%3D' replaced by '='.
+    """
+    if not hgvs_str:
+        return hgvs_str
+
+    # Split joined HGVS descriptions (replace '&' with ', ')
+    new_hgvs = []
+    for hgvs in hgvs_str.split('&'):
+        # Add parentheses to HGVSp descriptions.
+        if 'p.' in hgvs and 'p.(' not in hgvs:
+            hgvs = f"p.({hgvs.split('p.')[1]})"
+        hgvs = hgvs.replace('%3D', '=')
+        new_hgvs.append(hgvs)
+    return ', '.join(new_hgvs)
+
+
+def get_allele_type(ref: str, alt: str) -> str:
+    """
+    Return variant allele type.
+
+    Parameters
+    ----------
+    ref : str
+        Variant reference allele.
+    alt : str
+        Variant alternate allele.
+
+    Returns
+    -------
+    str
+        "SNV" if both alleles are single nucleotides, otherwise "INDEL".
+    """
+    return 'SNV' if len(ref) == len(alt) == 1 else 'INDEL'
+
+
+def get_variant_end_pos(pos: int, ref: str) -> int:
+    """
+    Return the last reference position of a variant.
+
+    Parameters
+    ----------
+    pos : int
+        Variant position (position of the first reference allele base).
+    ref : str
+        Variant reference allele.
+
+    Returns
+    -------
+    int
+        Position of the last reference allele base.
+    """
+    return pos + max(len(ref or ''), 1) - 1
+
+
+def get_chrom_index_sql(column: str) -> str:
+    """
+    Return an SQL expression that converts chromosome names to their
+    indexes in CHROMOSOMES, e.g. to index chromosomes in an R*Tree.
+
+    Parameters
+    ----------
+    column : str
+        SQL column (or expression) with chromosome names.
+
+    Returns
+    -------
+    str
+        SQL CASE expression, -1 for unknown chromosomes.
+    """
+    whens = ' '.join(f"WHEN '{chrom}' THEN {i}"
+                     for i, chrom in enumerate(CHROMOSOMES))
+    return f'CASE {column} {whens} ELSE -1 END'
+
+
+# Layout of packed variant cancer type patient counts records stored in
+# the Variant.cancer_type_counts field: a cancer type id and its patient
+# counts in CANCER_PC_PREFIXES (main/vcf.py) order, little-endian uint32.
+PACKED_PCS_DTYPE = np.dtype([('cancer_type_id', '<u4'), ('pcs', '<u4', (4,))])
+
+
+def pack_cancer_type_pcs(cancer_type_pcs: dict) -> bytes:
+    """
+    Pack variant cancer type patient counts into PACKED_PCS_DTYPE records.
+
+    Parameters
+    ----------
+    cancer_type_pcs : dict
+        Cancer type ids (keys) and lists of their four patient counts
+        (values).
+
+    Returns
+    -------
+    bytes
+    """
+    flat = []
+    for cancer_type_id, pcs in cancer_type_pcs.items():
+        flat.append(cancer_type_id)
+        flat.extend(pcs)
+    return struct.pack(f'<{len(flat)}I', *flat)
+
+
+def unpack_cancer_type_pcs(packed: bytes) -> np.ndarray:
+    """
+    Unpack variant cancer type patient counts packed by
+    pack_cancer_type_pcs.
+
+    Parameters
+    ----------
+    packed : bytes
+        Variant.cancer_type_counts value.
+
+    Returns
+    -------
+    np.ndarray
+        A PACKED_PCS_DTYPE structured array.
+    """
+    return np.frombuffer(packed, dtype=PACKED_PCS_DTYPE)
+
+
+def get_read_only_db_options(db_path, mmap_size: int) -> dict:
+    """
+    Return Django SQLite database OPTIONS that open a database file in
+    the read-only serving mode: as an immutable file (no locking or
+    change detection, see https://www.sqlite.org/uri.html), with
+    memory-mapped I/O and with writes disabled.
+
+    The database file must not be modified while it is open, so it must
+    be replaced by a new file instead (e.g. db_importer.py --shadow).
+
+    Parameters
+    ----------
+    db_path : str or Path
+        Database file path.
+    mmap_size : int
+        Maximum number of bytes of the database file that are memory
+        mapped (0 disables memory-mapped I/O).
+
+    Returns
+    -------
+    dict
+        Database OPTIONS. The database URI replaces the NAME setting as
+        the connection database, so NAME remains the file path.
+    """
+    uri = f'{Path(db_path).resolve().as_uri()}?mode=ro&immutable=1'
+    return {
+        'database': uri,
+        'init_command': (f'PRAGMA query_only = ON; '
+                         f'PRAGMA mmap_size = {int(mmap_size)}'),
+    }
@@ -0,0 +1,266 @@
+import gzip
+from pathlib import Path
+
+# VCF cancer patient count INFO field prefixes and their respective
+# VariantCancerTypePatientCount model field names
+CANCER_PC_PREFIXES = {
+    'SameNucleotideChange': 'same_nucleotide_change_pc',
+    'SameAminoAcidChange': 'same_amino_acid_change_pc',
+    'SameOrDownstreamTruncatingVariantsPerAA': \
+        'same_or_downstream_truncating_variants_per_aa_pc',
+    'NestedInframeDeletionsPerAA': 'nested_inframe_deletions_per_aa_pc',
+}
+
+
+def read_vcf_header(vcf_path) -> list:
+    """
+    Read GENIE VCF header lines.
+
+    Parameters
+    ----------
+    vcf_path : Path
+        Path to the bgzipped/gzipped GENIE VCF.
+
+    Returns
+    -------
+    list
+        Header lines (including the #CHROM column names line).
+    """
+    header = []
+    with gzip.open(vcf_path, mode='rt', encoding='utf-8', newline='') as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            header.append(line)
+    return header
+
+
+def read_vcf_info_ids(vcf_path) -> list:
+    """
+    Read INFO field IDs declared in the GENIE VCF header.
+
+    Parameters
+    ----------
+    vcf_path : Path
+        Path to the bgzipped/gzipped GENIE VCF.
+
+    Returns
+    -------
+    list
+        INFO IDs in the header order, e.g. ['Hugo_Symbol', 'RefSeq', ...].
+    """
+    # Header line format: ##INFO=<ID={ID},Number=...>
+    return [
+        line[len('##INFO=<ID='):].split(',', 1)[0]
+        for line in read_vcf_header(vcf_path)
+        if line.startswith('##INFO=<ID=')
+    ]
+
+
+def split_vcf_by_chrom(vcf_path, out_dir, chroms=None,
+                       contiguous: bool = False) -> dict:
+    """
+    Split the GENIE VCF into one gzipped VCF per chromosome. Every
+    output VCF has the header of the input VCF and keeps the input order
+    of its data lines.
+
+    Parameters
+    ----------
+    vcf_path : Path
+        Path to the bgzipped/gzipped GENIE VCF.
+    out_dir : Path
+        Output directory.
+    chroms : iterable, optional
+        Allowed chromosome names (all chromosomes if None).
+    contiguous : bool
+        Require the data lines of each chromosome to be contiguous.
+
+    Returns
+    -------
+    dict
+        Chromosomes (keys) and paths of their VCFs (values). Chromosomes
+        without variants are not included.
+
+    Raises
+    ------
+    ValueError
+        If the VCF has a chromosome that is not in chroms, or a
+        chromosome that is not contiguous (with contiguous).
+    """
+    chroms = set(chroms) if chroms is not None else None
+    header = []
+    out_files = {}
+    paths = {}
+    last_chrom = None
+    try:
+        with gzip.open(vcf_path, mode='rt', encoding='utf-8',
+                       newline='') as f:
+            for line in f:
+                if line.startswith('#'):
+                    header.append(line)
+                    continue
+                chrom = line.split('\t', 1)[0]
+                if chrom != last_chrom:
+                    if contiguous and chrom in out_files:
+                        raise ValueError(
+                            f'Chromosome "{chrom}" is not contiguous in '
+                            'the VCF')
+                    last_chrom = chrom
+                out_file = out_files.get(chrom)
+                if out_file is None:
+                    if chroms is not None and chrom not in chroms:
+                        raise ValueError(f'Unknown chromosome in VCF: "{chrom}"')
+                    paths[chrom] = Path(out_dir) / f'chr{chrom}.vcf.gz'
+                    # Fast compression, the files are only read once.
+                    out_file = out_files[chrom] = gzip.open(
+                        paths[chrom], mode='wt', encoding='utf-8',
+                        newline='', compresslevel=1)
+                    out_file.writelines(header)
+                out_file.write(line)
+    finally:
+        for out_file in out_files.values():
+            out_file.close()
+    return paths
+
+
+def split_cancer_pc_key(key: str) -> tuple:
+    """
+    Split a cancer type patient count VCF INFO key into its count type
+    and cancer type. The keys have the following format:
+    {COUNT_TYPE}_{CANCER_TYPE}_Count_N_{TOTAL_PATIENT_COUNT}
+    The total patient count ending can vary in different GENIE VCF
+    versions, so it is removed. Duplicate patient IDs and count fields
+    that start with the same prefixes are ignored.
+
+    Parameters
+    ----------
+    key : str
+        VCF INFO key, e.g. SameAminoAcidChange_All_Cancers_Count_N_208523
+
+    Returns
+    -------
+    tuple
+        Count type prefix (e.g. SameAminoAcidChange) and cancer type VCF
+        name (e.g. All_Cancers), or None if the key is not a cancer type
+        patient count key.
+    """
+    if (not key.startswith(tuple(CANCER_PC_PREFIXES)) or
+            key.endswith('_Patient_IDs') or
+            key.endswith('_Duplicate_Patient_Count')):
+        return None
+    pc_type_vcf, cancer_type_vcf = key.split('_Count_')[0].split('_', 1)
+    return pc_type_vcf, cancer_type_vcf
+
+
+class VcfInfoParser:
+    """A GENIE VCF INFO column parser compiled from the VCF header.
+
+    Every INFO key is mapped once to its targets: a slot in the variant
+    row (a Variant field with the matching help_text) and/or a cancer
+    type id and slot in the variant cancer type patient count row. Each
+    record is then decoded with a single dict lookup per INFO key. Keys
+    missing from the header are compiled when they are first seen.
+
+    Parameters
+    ----------
+    info_ids : list
+        INFO IDs declared in the VCF header.
+    variant_fields : list
+        (VCF INFO key, default value) tuples in the variant row order.
+    cancer_type_ids : dict
+        Cancer type VCF names (keys) and their database ids (values).
+    """
+
+    def __init__(self, info_ids: list, variant_fields: list,
+            cancer_type_ids: dict):
+        self.defaults = [default for _, default in variant_fields]
+        self.slots = {key: i for i, (key, _) in enumerate(variant_fields)}
+        self.cancer_type_ids = cancer_type_ids
+        self.pc_slots = {prefix: i for i, prefix in
+                         enumerate(CANCER_PC_PREFIXES)}
+        self.key_map = {key: self._compile_key(key) for key in info_ids}
+
+    def _compile_key(self, key: str) -> tuple:
+        """
+        Map a VCF INFO key to its variant row and patient count targets.
+
+        Parameters
+        ----------
+        key : str
+            VCF INFO key.
+
+        Returns
+        -------
+        tuple
+            Variant row slot (or None) and (cancer type VCF name, cancer
+            type id, patient count slot) tuple (or None), or None if the
+            key is not stored in the database.
+        """
+        pc_target = None
+        variant_key = key
+        pc_key_parts = split_cancer_pc_key(key)
+        if pc_key_parts:
+            pc_type_vcf, cancer_type_vcf = pc_key_parts
+            # Aggregated cancer type counts are also stored in the
+            # variant table without the "_Count_N" ending.
+            variant_key = f'{pc_type_vcf}_{cancer_type_vcf}'
+            pc_target = (cancer_type_vcf,
+                         self.cancer_type_ids.get(cancer_type_vcf),
+                         self.pc_slots[pc_type_vcf])
+        var_slot = self.slots.get(variant_key)
+        if var_slot is None and pc_target is None:
+            return None
+        return var_slot, pc_target
+
+    def parse(self, info: str) -> tuple:
+        """
+        Decode a VCF INFO column.
+
+        Parameters
+        ----------
+        info : str
+            VCF INFO column, e.g. "Hugo_Symbol=TP53;RefSeq=NM_000546.6;..."
+
+        Returns
+        -------
+        tuple
+            Variant row INFO values (list) and a dict with cancer type ids
+            (keys) and their patient counts lists in CANCER_PC_PREFIXES
+            order (values). Cancer types with only 0 counts are skipped.
+
+        Raises
+        ------
+        ValueError
+            If a non-zero patient count has an unknown cancer type.
+        """
+        key_map = self.key_map
+        values = list(self.defaults)
+        pcs = {}
+        # Note: the current GENIE VCF has no flag INFO fields.
+        for info_item in info.split(';'):
+            key, sep, val = info_item.partition('=')
+            if not sep:
+                continue
+            try:
+                targets = key_map[key]
+            except KeyError:
+                targets = key_map[key] = self._compile_key(key)
+            if targets is None:
+                continue
+            var_slot, pc_target = targets
+            if var_slot is not None:
+                values[var_slot] = val
+            # Skip VCF fields with 0 patient counts, so a patient count
+            # row is only created if at least one of the counts is not 0.
+            if pc_target is None or val == '0':
+                continue
+            cancer_type_vcf, cancer_type_id, pc_slot = pc_target
+            if cancer_type_id is None:
+                raise ValueError(
+                    f'Unknown cancer type in VCF: "{cancer_type_vcf}". '
+                    'Ensure it exists in data/cancer_types.csv')
+            cancer_pcs = pcs.get(cancer_type_id)
+            if cancer_pcs is None:
+                cancer_pcs = pcs[cancer_type_id] = [0] * len(self.pc_slots)
+            cancer_pcs[pc_slot] = int(val)
+        return values, pcs
@@ -1,22 +1,90 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 from urllib.parse import urlencode
 
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-from main.lookups import get_variants, get_variant_cancer_type_pcs
+from main.cache import get_cached_json, get_result_cache_key, get_warm_response
+from main.dataset import (
+    get_dataset_etag, get_dataset_last_modified, get_dataset_metadata,
+    get_db_file_identity, get_warm_state, reopen_swapped_databases
+)
+from main.lookups import (
+    MAX_BATCH_LOOKUP_KEYS, MAX_VARIANT_PAGE_SIZE, VARIANT_STREAM_CHUNK_SIZE,
+    get_variants, get_variants_columnar, get_variants_page,
+    get_variant_cancer_type_pcs, get_variants_cancer_type_pcs, iter_variants,
+    lookup_variants, resolve_gene_symbol
+)
 from main.utils import CHROMOSOMES
 
+# Thread pool of the async views of this worker process (pid, executor),
+# see run_in_db_thread.
+_db_executor = (None, None)
+# Number of streamed response chunks read ahead of the client by the
+# async views (see iter_in_db_thread).
+STREAM_QUEUE_CHUNKS = 2
 
+
+def dataset_conditional(view):
+    """Decorates views whose responses only change when a new dataset is
+    imported (or the code is deployed). Successful responses get the
+    dataset ETag and Last-Modified headers (see main/dataset.py) and are
+    cacheable for HTTP_CACHE_MAX_AGE seconds, and conditional requests
+    with matching validators are answered with 304 Not Modified without
+    calling the view. Responses are not cacheable if no dataset has been
+    imported, nor are streaming responses, which can fail after their
+    status code has been sent.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag = get_dataset_etag()
+        if etag is None or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        last_modified = get_dataset_last_modified()
+        response = get_conditional_response(
+            request, etag=etag,
+            last_modified=int(last_modified) if last_modified else None)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code not in (200, 304) or response.streaming:
+            return response
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified',
+                                        http_date(last_modified))
+        patch_cache_control(response, public=True,
+                            max_age=settings.HTTP_CACHE_MAX_AGE)
+        return response
+    return wrapper
+
+
+@dataset_conditional
 def index(request):
     """Homepage."""
     return render(request, 'main/index.html')
 
 
+@dataset_conditional
 def about(request):
     """A page with information about generation of patient count data."""
     return render(request, 'main/about.html')
 
+@dataset_conditional
 def release_notes(request):
     """A page with information about release notes for each version"""
     return render(request, 'main/release_notes.html')
@@ -38,6 +106,9 @@ def search_view(request):
         search_key = 'region'
     else:
         search_key = 'gene'
+        # Previous and alias gene symbols are searched as the gene
+        # symbol used in the variant data.
+        search_value = resolve_gene_symbol(search_value)
 
     query = urlencode({'search_key': search_key, 'search_value': search_value})
     url = f"{reverse('main:variants')}?{query}"
@@ -46,32 +117,365 @@ def search_view(request):
     return redirect(url)
 
 
+# ajax_variants query of the first variant table page with the default
+# filters (see variants.html and variants.js), precomputed by the
+# warm_cache command.
+VARIANT_TABLE_FIRST_PAGE_QUERY = {
+    'offset': '0',
+    'limit': '18',
+    'sort': 'pos',
+    'order': 'asc',
+    'consequence_category': 'PTV LoF,non-PTV LoF,Missense / Inframe indel,Other',
+    'allele_type': 'SNV,INDEL',
+    'format': 'columnar',
+}
+
+
+def _get_list_param(query, name: str) -> list:
+    """Returns a comma-separated GET parameter as a list, or None if the
+    parameter is missing (an empty parameter is an empty list)."""
+    value = query.get(name)
+    if value is None:
+        return None
+    return [item for item in value.split(',') if item]
+
+
+def _get_variant_table_params(query) -> dict:
+    """Returns the variant table search, sort and filter keyword arguments
+    of get_variants_page and iter_variants from GET parameters
+    (bootstrap-table server side pagination parameters).
+
+    Raises ValueError if the filter parameter is not a JSON object.
+    """
+    filters = json.loads(query.get('filter') or '{}')
+    if not isinstance(filters, dict):
+        raise ValueError('filter must be a JSON object')
+    return {
+        'search_key': query.get('search_key', ''),
+        'search_value': query.get('search_value', ''),
+        'sort': query.get('sort', 'pos'),
+        'order': query.get('order', 'asc'),
+        'filters': filters,
+        'search': query.get('search', ''),
+        'consequence_categories': _get_list_param(
+            query, 'consequence_category'),
+        'allele_types': _get_list_param(query, 'allele_type'),
+    }
+
+
+def get_ajax_variants_result(query) -> tuple:
+    """Returns the results cache name and parameters of an ajax_variants
+    request and a function that computes its data.
+
+    All matching variants are returned unless a page is requested with
+    the "limit" parameter. With "format=columnar" the rows are returned
+    as dictionary-encoded columns (see lookups.encode_variant_columns).
+    With "cancer_pcs=1" the cancer types patient count subtables of the
+    page variants are embedded in the page data (pages only).
+
+    Raises ValueError if the page parameters are not valid.
+    """
+    columnar = query.get('format') == 'columnar'
+    if 'limit' in query:
+        params = _get_variant_table_params(query)
+        params.update(offset=int(query.get('offset', 0)),
+                      limit=int(query.get('limit')), columnar=columnar)
+        # Only added if requested, so the results cache keys of other
+        # pages do not change.
+        if query.get('cancer_pcs') in ('1', 'true'):
+            params['include_cancer_pcs'] = True
+        return ('ajax_variants_page', params,
+                lambda: {**get_variants_page(**params), 'error': ''})
+
+    search_key = query.get('search_key', '')
+    search_value = query.get('search_value', '')
+
+    def get_data():
+        if columnar:
+            data = get_variants_columnar(search_key, search_value)
+        else:
+            variants = get_variants(search_key, search_value)
+            data = {'rows': variants, 'total': len(variants)}
+        data['error'] = ''
+        return data
+
+    params = {'search_key': search_key, 'search_value': search_value,
+              'columnar': columnar}
+    return 'ajax_variants', params, get_data
+
+
+def _cached_json_response(request, name: str, params: dict, get_data):
+    """Returns a JSON response with pre-compressed content from the warm
+    cache if the client accepts its encoding, otherwise with content from
+    the shared results cache (main/cache.py) or get_data().
+    """
+    key = get_result_cache_key(name, params)
+    warm = get_warm_response(
+        key, request.headers.get('Accept-Encoding', '')) if key else None
+    if warm is not None:
+        content, encoding = warm
+        response = HttpResponse(content, content_type='application/json')
+        response['Content-Encoding'] = encoding
+    else:
+        response = HttpResponse(get_cached_json(name, params, get_data),
+            content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+@dataset_conditional
 def ajax_variants(request):
-    """Ajax request to obtain data for the variant table."""
+    """Ajax request to obtain data for the variant table (see
+    get_ajax_variants_result).
+    """
+    try:
+        name, params, get_data = get_ajax_variants_result(request.GET)
+    except ValueError as e:
+        return JsonResponse({'rows': [], 'total': 0, 'error': str(e)},
+            status=400)
     try:
-        variants = get_variants(request.GET.get('search_key', ''), 
-                                request.GET.get('search_value', ''))
-        data = {
-            'rows': variants,
-            'total': len(variants),
-            'error': '',
-        }
-        return JsonResponse(data)
+        return _cached_json_response(request, name, params, get_data)
     except Exception as e:
         return JsonResponse({'rows': [], 'total': 0, 'error': str(e)}, 
             status=500)        
 
 
+@dataset_conditional
+def ajax_variants_stream(request):
+    """Ajax request to stream all sorted and filtered variant table rows
+    as newline-delimited JSON (one row object per line). Rows are read
+    from the database and sent in chunks, so the table can be rendered
+    before the last row is sent and worker memory use does not depend
+    on the number of variants. A query error ends the stream with an
+    {"error": ...} line.
+    """
+    try:
+        params = _get_variant_table_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'rows': [], 'total': 0, 'error': str(e)},
+            status=400)
+    return StreamingHttpResponse(_get_ndjson_chunks(params),
+        content_type='application/x-ndjson')
+
+
+def _get_ndjson_chunks(params: dict):
+    """Yields the newline-delimited JSON chunks of ajax_variants_stream
+    (VARIANT_STREAM_CHUNK_SIZE rows each)."""
+    lines = []
+    try:
+        for row in iter_variants(**params):
+            lines.append(json.dumps(row))
+            if len(lines) == VARIANT_STREAM_CHUNK_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+    except Exception as e:
+        # The status code has been sent with the first chunk, so the
+        # client is told that the rows are incomplete by a last
+        # {"error": ...} line.
+        lines.append(json.dumps({'error': str(e)}))
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+@dataset_conditional
 def ajax_variant_cancer_pcs(request):
     """Ajax request to obtain data for the variant cancer types patient 
     count subtable.
     """
-    data = {
-        'rows': get_variant_cancer_type_pcs(request.GET.get('variant_id', None))
-    }
-    return JsonResponse(data)
+    variant_id = request.GET.get('variant_id', None)
+    return _cached_json_response(request, 'ajax_variant_cancer_pcs',
+        {'variant_id': variant_id},
+        lambda: {'rows': get_variant_cancer_type_pcs(variant_id)})
+
+
+@dataset_conditional
+def ajax_variants_cancer_pcs(request):
+    """Ajax request to obtain the cancer types patient count subtables
+    of multiple variants, e.g. all rows of a variant table page, given
+    as comma-separated "variant_ids" (up to MAX_VARIANT_PAGE_SIZE). The
+    response "variants" object maps the variant ids to their subtable
+    rows (unknown ids are omitted).
+    """
+    variant_ids = _get_list_param(request.GET, 'variant_ids') or []
+    if len(variant_ids) > MAX_VARIANT_PAGE_SIZE:
+        return JsonResponse({'variants': {}, 'error': (
+            f'Too many variants: {len(variant_ids)} (maximum '
+            f'{MAX_VARIANT_PAGE_SIZE} per request)')}, status=400)
+    try:
+        data = get_variants_cancer_type_pcs(variant_ids)
+    except Exception as e:
+        return JsonResponse({'variants': {}, 'error': str(e)}, status=500)
+    return JsonResponse({'variants': data, 'error': ''})
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    """Returns the async view thread pool of this process (worker
+    processes forked from a preloading master create their own)."""
+    global _db_executor
+    pid, executor = _db_executor
+    if executor is None or pid != os.getpid():
+        executor = ThreadPoolExecutor(settings.ASYNC_DB_THREADS,
+                                      thread_name_prefix='genie-db')
+        _db_executor = (os.getpid(), executor)
+    return executor
+
+
+def _run_db_work(func, *args, **kwargs):
+    """Runs a function in a database thread with the connection handling
+    of a sync worker request: connections to swapped database files and
+    obsolete connections (see CONN_MAX_AGE) are closed before and after
+    it, and connections are otherwise kept by the thread."""
+    reopen_swapped_databases()
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """
+    Run a function that reads the database in the async view thread pool
+    (ASYNC_DB_THREADS threads per worker process), so the event loop
+    keeps serving other requests while it runs. The pool bounds the
+    number of concurrent queries of a worker, and its threads keep their
+    database connections between requests.
+
+    Parameters
+    ----------
+    func : callable
+        Function to run.
+    *args, **kwargs
+        func arguments.
+
+    Returns
+    -------
+    Any
+        func return value.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_db_executor(), partial(_run_db_work, func, *args, **kwargs))
+
+
+def async_db_view(view):
+    """Returns an async version of a sync view that runs the view in the
+    async view thread pool (see run_in_db_thread)."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_db_thread(view, request, *args, **kwargs)
+    return wrapper
+
+
+async def iter_in_db_thread(get_chunks):
+    """
+    Async iterator over the chunks of a generator that reads the
+    database, e.g. a streaming response body. The generator runs in one
+    thread of the async view thread pool (see run_in_db_thread), which
+    keeps its database cursor, and hands over up to STREAM_QUEUE_CHUNKS
+    chunks at a time, so it waits while the client receives them. The
+    thread is used until the last chunk is sent or the client leaves.
+
+    Parameters
+    ----------
+    get_chunks : callable
+        Function that returns the generator.
+
+    Yields
+    ------
+    Any
+        Generator chunks.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(STREAM_QUEUE_CHUNKS)
+    stopped = threading.Event()
 
+    def put(chunk):
+        asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
 
+    def produce():
+        chunks = get_chunks()
+        try:
+            for chunk in chunks:
+                put(chunk)
+                if stopped.is_set():
+                    break
+        finally:
+            chunks.close()
+            # None marks the end of the chunks.
+            if not stopped.is_set():
+                put(None)
+
+    producer = asyncio.ensure_future(run_in_db_thread(produce))
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        await producer
+    finally:
+        # Stop the producer if the client has left. A producer waiting
+        # for queue space gets it and then sees the stop flag.
+        stopped.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+
+async def ajax_variants_stream_async(request):
+    """Async version of ajax_variants_stream. The chunks are read in a
+    database thread and sent one at a time (see iter_in_db_thread), not
+    loaded into memory as Django's ASGI handler does with the iterator
+    of a sync streaming response.
+    """
+    try:
+        params = _get_variant_table_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'rows': [], 'total': 0, 'error': str(e)},
+            status=400)
+    return StreamingHttpResponse(
+        iter_in_db_thread(partial(_get_ndjson_chunks, params)),
+        content_type='application/x-ndjson')
+
+
+# Async versions of the variant table and cancer type patient count
+# endpoints served by the ASGI workers (see ASYNC_VIEWS and main/urls.py).
+ajax_variants_async = async_db_view(ajax_variants)
+ajax_variant_cancer_pcs_async = async_db_view(ajax_variant_cancer_pcs)
+ajax_variants_cancer_pcs_async = async_db_view(ajax_variants_cancer_pcs)
+
+
+@csrf_exempt
+@require_POST
+def ajax_variants_batch(request):
+    """Batch variant lookup for annotation pipelines. The request body
+    is a JSON object with a "variants" list of up to MAX_BATCH_LOOKUP_KEYS
+    CHROM-POS-REF-ALT keys (e.g. 17-7675088-C-T) and an optional
+    "cancer_pcs" boolean to include the cancer types patient counts of
+    each variant (see lookups.lookup_variants). The endpoint does not
+    change any data, so it does not require a CSRF token.
+    """
+    try:
+        body = json.loads(request.body)
+        keys = body['variants']
+        if not isinstance(keys, list):
+            raise ValueError('"variants" must be a list')
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({'variants': [], 'error': f'Invalid request: {e}'},
+            status=400)
+    if len(keys) > MAX_BATCH_LOOKUP_KEYS:
+        return JsonResponse({'variants': [], 'error': (
+            f'Too many variants: {len(keys)} (maximum '
+            f'{MAX_BATCH_LOOKUP_KEYS} per request)')}, status=400)
+    try:
+        results = lookup_variants(
+            keys, include_cancer_pcs=bool(body.get('cancer_pcs')))
+    except Exception as e:
+        return JsonResponse({'variants': [], 'error': str(e)}, status=500)
+    return JsonResponse({'variants': results, 'error': ''})
+
+
+@dataset_conditional
 def variants(request):
     """Variants table page, data is loaded via an ajax request."""
     search_key = request.GET.get('search_key', '')
@@ -81,8 +485,36 @@ def variants(request):
         'page_context': {
             'search_value': search_value,
             'variants_data_url': (f"{reverse('main:ajax_variants')}?{query}"),
-            'variant_cancer_patient_counts_url': \
-                reverse('main:ajax_variant_cancer_pcs'),            
+            'variants_stream_url': \
+                f"{reverse('main:ajax_variants_stream')}?{query}",
+            'variants_cancer_patient_counts_url': \
+                reverse('main:ajax_variants_cancer_pcs'),
         },
     }
-    return render(request, 'main/variants.html', context=context_dict)
\ No newline at end of file
+    return render(request, 'main/variants.html', context=context_dict)
+
+
+@never_cache
+def healthz(request):
+    """Readiness check of the web worker for the Docker healthcheck and
+    load balancers. Reports whether the worker was warmed up (see
+    dataset.warm_up) and which dataset and database file it serves,
+    without rendering a page. Returns HTTP 503 if the database cannot
+    be read, e.g. if its file is missing (SQLite would connect to a new
+    empty file).
+    """
+    data = {'status': 'ok', 'pid': os.getpid(), **get_warm_state()}
+    status = 200
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM main_dataset_metadata LIMIT 1')
+    except DatabaseError as e:
+        data.update(status='error', error=str(e))
+        status = 503
+    metadata = get_dataset_metadata()
+    identity = get_db_file_identity()
+    data.update(
+        genie_version=metadata.get('genie_version') or settings.GENIE_VERSION,
+        build_id=metadata.get('build_id'),
+        db_file_identity=list(identity) if identity else None)
+    return JsonResponse(data, status=status)
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nhs_genie_project.settings")
 
 application = get_asgi_application()
+
+if settings.DB_READ_ONLY:
+    # Start reading the read-only databases into the page cache.
+    from main.dataset import warm_db_page_cache
+    warm_db_page_cache()
@@ -17,6 +17,8 @@ from typing import List, Optional
 
 from django.core.exceptions import ImproperlyConfigured
 
+from main.utils import CHROMOSOMES, get_read_only_db_options
+
 # Environment file variables parsing helpers.
 def env_bool(name: str, default: bool = False) -> bool:
     """Boolean environment variable converter."""
@@ -77,6 +79,11 @@ if GENIE_VCF:
 GENIE_CANCER_TYPES_CSV = os.getenv("GENIE_CANCER_TYPES_CSV")
 if GENIE_CANCER_TYPES_CSV:
     GENIE_CANCER_TYPES_CSV = DATA_FOLDER / GENIE_CANCER_TYPES_CSV
+# HGNC gene table (optional) with symbol, prev_symbol and alias_symbol
+# columns, used to resolve previous and alias gene symbols in searches.
+GENE_ALIASES_TSV = os.getenv("GENE_ALIASES_TSV")
+if GENE_ALIASES_TSV:
+    GENE_ALIASES_TSV = DATA_FOLDER / GENE_ALIASES_TSV
 
 ALLOWED_HOSTS = [*env_list("ALLOWED_HOSTS"), "127.0.0.1", "localhost"]
 
@@ -150,6 +157,74 @@ DATABASES = {
     }
 }
 
+# Optional per-chromosome sharded variant storage populated by
+# "db_importer.py --sharded". Variant tables are stored in one database
+# per chromosome (e.g. data/db_shards/chr17.sqlite3) and the default
+# database keeps the rest of the data (e.g. cancer types).
+SHARDED_DB = env_bool("SHARDED_DB", default=False)
+# Chromosomes (keys) and their database aliases (values).
+VARIANT_SHARDS = {}
+if SHARDED_DB:
+    SHARDS_FOLDER = DATABASES["default"]["NAME"].parent / (
+        f"{DATABASES['default']['NAME'].stem}_shards")
+    for chrom in CHROMOSOMES:
+        VARIANT_SHARDS[chrom] = f"shard_{chrom}"
+        DATABASES[VARIANT_SHARDS[chrom]] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": SHARDS_FOLDER / f"chr{chrom}.sqlite3",
+        }
+
+# Read-only serving mode of the web server (not for db_importer.py or
+# migrations). Databases are opened as immutable files with memory-mapped
+# I/O and connections are kept for the life of the worker. Imports must
+# replace the database files (db_importer.py --shadow or --sharded); the
+# workers reconnect when the files change (main/dataset.py). The admin
+# site cannot be used in this mode (logins write to the database).
+DB_READ_ONLY = env_bool("DB_READ_ONLY", default=False)
+# Memory-mapped database size limit in megabytes in the read-only mode.
+DB_MMAP_MB = int(os.getenv("DB_MMAP_MB") or 2048)
+if DB_READ_ONLY:
+    for db_settings in DATABASES.values():
+        db_settings["CONN_MAX_AGE"] = None
+        db_settings["OPTIONS"] = get_read_only_db_options(
+            db_settings["NAME"], DB_MMAP_MB * 2**20)
+
+# ASGI serving mode (nhs_genie_project/asgi.py with uvicorn workers, see
+# gunicorn.conf.py). The variant table and cancer type patient count
+# ajax endpoints are async views that run in a pool of ASYNC_DB_THREADS
+# threads per worker with their own database connections, so slow
+# searches do not block the other requests of the worker.
+ASYNC_VIEWS = env_bool("ASYNC_VIEWS", default=False)
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS") or 4)
+
+# Shared cache of serialised variant query results (main/cache.py),
+# stored next to the database and limited to RESULT_CACHE_MB megabytes
+# (0 disables it). Entries are keyed by the dataset build and cleared by
+# db_importer.py.
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB") or 256)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+if RESULT_CACHE_MB > 0:
+    CACHES["results"] = {
+        "BACKEND": "main.cache.SQLiteLRUCache",
+        "LOCATION": f"{DATABASES['default']['NAME']}.result-cache.sqlite3",
+        "OPTIONS": {"MAX_SIZE_MB": RESULT_CACHE_MB},
+    }
+# Lifetime in seconds of the responses cached by browsers and Nginx
+# (Cache-Control max-age). Expired responses are revalidated with their
+# dataset ETag (main/views.py), which changes after each data update.
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE") or 300)
+# Memory-mapped column index of the variant table written by
+# "db_importer.py --column-index" (main/column_index.py), one folder per
+# dataset build.
+COLUMN_INDEX_FOLDER = Path(f"{DATABASES['default']['NAME']}.column-index")
+# Pre-compressed responses of popular searches written by the warm_cache
+# management command after each import.
+WARM_CACHE_FOLDER = Path(f"{DATABASES['default']['NAME']}.warm-cache")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -22,5 +22,6 @@ from main import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('main/', include('main.urls')),
+    path('healthz', views.healthz, name='healthz'),
     path("admin/", admin.site.urls),
 ]
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nhs_genie_project.settings")
 
 application = get_wsgi_application()
+
+if settings.DB_READ_ONLY:
+    # Start reading the read-only databases into the page cache.
+    from main.dataset import warm_db_page_cache
+    warm_db_page_cache()
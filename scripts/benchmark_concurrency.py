@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+NHS GENIE concurrency benchmark
+
+Measures the latency of quick variant table requests while other clients
+keep sending slow large-gene searches, e.g. to compare the sync gunicorn
+workers with the ASGI workers (ASYNC_VIEWS=1). See
+docs/concurrency-benchmark.md for the procedure and results.
+
+Run the website without the results cache (RESULT_CACHE_MB=0), so every
+request queries the database.
+
+Usage:
+    python scripts/benchmark_concurrency.py --url http://HOST:PORT
+    python scripts/benchmark_concurrency.py --url http://HOST:PORT --slow-clients 6 --fast-clients 2 --duration 30
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Default requests: a variant table page of a large gene filtered by a
+# search text (run in SQL over all variants of the gene) and the first
+# page of a small gene.
+SLOW_QUERY = {"search_key": "gene", "search_value": "TP53", "limit": 400,
+              "search": "missense", "sort": "all_cancers_count",
+              "order": "desc"}
+FAST_QUERY = {"search_key": "gene", "search_value": "KRAS", "limit": 18}
+
+
+def validate_base_url(url: str) -> str:
+    """Validate that a URL uses http:// or https:// scheme."""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in {"http", "https"} or not parsed.netloc:
+        raise argparse.ArgumentTypeError(
+            f"--url must be an http:// or https:// URL (got: {url})"
+        )
+    return url.rstrip("/")
+
+
+def parse_query(text: str) -> dict:
+    """Parse a "key=value&key=value" query string argument."""
+    return dict(urllib.parse.parse_qsl(text, keep_blank_values=True))
+
+
+def run_client(url: str, deadline: float, latencies: list,
+               errors: list) -> None:
+    """Send requests one after another until the deadline and record their
+    latencies (seconds) and errors."""
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=120) as response:
+                response.read()
+        except (urllib.error.URLError, OSError) as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def summarise(latencies: list, errors: list, duration: float) -> dict:
+    """Returns the request count, throughput and latency percentiles (ms)."""
+    summary = {"requests": len(latencies), "errors": len(errors),
+               "requests_per_second": round(len(latencies) / duration, 2)}
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100,
+                                         method="inclusive")
+        summary.update({
+            "p50_ms": round(quantiles[49] * 1000, 1),
+            "p95_ms": round(quantiles[94] * 1000, 1),
+            "p99_ms": round(quantiles[98] * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+        })
+    return summary
+
+
+def benchmark(base_url: str, slow_query: dict, fast_query: dict,
+              slow_clients: int, fast_clients: int, duration: float,
+              baseline_duration: float) -> dict:
+    """Measure the latency of each request sent by a single client, then
+    run the slow and fast clients concurrently for the duration."""
+    endpoint = f"{base_url}/main/ajax_variants/"
+    groups = {
+        "slow": (f"{endpoint}?{urllib.parse.urlencode(slow_query)}",
+                 slow_clients),
+        "fast": (f"{endpoint}?{urllib.parse.urlencode(fast_query)}",
+                 fast_clients),
+    }
+    # Baseline latency of each request without concurrent load.
+    baseline = {}
+    for name, (url, _) in groups.items():
+        latencies, errors = [], []
+        run_client(url, time.perf_counter() + baseline_duration, latencies,
+                   errors)
+        if errors and not latencies:
+            sys.exit(f"{name} request failed: {errors[0]}")
+        baseline[name] = summarise(latencies, errors, baseline_duration)
+
+    results = {name: ([], []) for name in groups}
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(url, deadline, *results[name]))
+        for name, (url, clients) in groups.items()
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "url": base_url,
+        "slow_query": slow_query, "fast_query": fast_query,
+        "slow_clients": slow_clients, "fast_clients": fast_clients,
+        "duration_seconds": duration,
+        "baseline": baseline,
+        "under_load": {name: summarise(*results[name], duration)
+                       for name in groups},
+    }
+
+
+def print_report(report: dict) -> None:
+    """Print the benchmark results as a table."""
+    print(f"{report['url']}: {report['slow_clients']} slow and "
+          f"{report['fast_clients']} fast clients for "
+          f"{report['duration_seconds']:g} s")
+    columns = ("requests", "errors", "requests_per_second", "p50_ms",
+               "p95_ms", "p99_ms", "max_ms")
+    print(f"{'':<18}" + "".join(f"{c:>{len(c) + 2}}" for c in columns))
+    for phase in ("baseline", "under_load"):
+        for name, summary in report[phase].items():
+            print(f"{name + ' ' + phase:<18}" + "".join(
+                f"{summary.get(c, '-'):>{len(c) + 2}}" for c in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure variant table request latencies under "
+                    "concurrent slow searches."
+    )
+    parser.add_argument("--url", required=True, type=validate_base_url,
+                        help="Website base URL, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--slow-query", type=parse_query,
+                        default=SLOW_QUERY,
+                        help="ajax_variants query string of the slow "
+                             "requests (default: %(default)s)")
+    parser.add_argument("--fast-query", type=parse_query,
+                        default=FAST_QUERY,
+                        help="ajax_variants query string of the fast "
+                             "requests (default: %(default)s)")
+    parser.add_argument("--slow-clients", type=int, default=6,
+                        help="Concurrent clients sending slow requests")
+    parser.add_argument("--fast-clients", type=int, default=2,
+                        help="Concurrent clients sending fast requests")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="Load test duration in seconds")
+    parser.add_argument("--baseline", type=float, default=3,
+                        help="Duration of the sequential baseline "
+                             "measurement of each request in seconds")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the results as JSON")
+    args = parser.parse_args()
+
+    report = benchmark(args.url, args.slow_query, args.fast_query,
+                       args.slow_clients, args.fast_clients, args.duration,
+                       args.baseline)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
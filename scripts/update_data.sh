@@ -1,7 +1,7 @@
 #!/bin/bash
 set -euo pipefail
 
-# Download new GENIE data from S3 and re-import the database.
+# Download new GENIE data from S3 and re-import the database without downtime.
 # Usage: scripts/update_data.sh --host <ip> --vcf <s3-uri> --csv <s3-uri> --version <string>
 
 usage() {
@@ -60,19 +60,22 @@ ssh "${SSH_USER}@${HOST}" bash <<EOF
   sed -i "s|^GENIE_CANCER_TYPES_CSV=.*|GENIE_CANCER_TYPES_CSV=${CSV_FILENAME}|" .env
   sed -i "s|^GENIE_VERSION=.*|GENIE_VERSION=${VERSION}|" .env
 
-  echo "Stopping application (downtime starts)..."
-  docker compose stop
-
+  # DB_READ_ONLY=1 in .env is for the web workers only, the migrations
+  # and the import write to the database.
   echo "Running migrations..."
-  docker compose run --rm web python manage.py migrate --noinput
+  docker compose run --rm -e DB_READ_ONLY=0 web python manage.py migrate --noinput
 
-  echo "Running database import..."
-  docker compose run --rm web python db_importer.py
+  # The new database is built next to the live one and swapped in
+  # atomically; running workers reconnect on their next request.
+  echo "Running database import (the application stays online)..."
+  docker compose run --rm -e DB_READ_ONLY=0 web python db_importer.py --shadow --bulk-load --column-index --workers \$(nproc)
 
-  echo "Starting application..."
-  docker compose up -d
+  # Precompute compressed responses of the most popular searches.
+  echo "Warming the variant search cache..."
+  { zcat -f /var/log/nginx/access.log* 2>/dev/null || true; } | \
+    docker compose run --rm -T web python manage.py warm_cache --access-log - --top 100
 
-  echo "Data update complete (downtime ended)."
+  echo "Data update complete."
 EOF
 
 echo "Done. Run 'make verify-db' to check row counts."
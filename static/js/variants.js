@@ -19,86 +19,156 @@ document.addEventListener('DOMContentLoaded', function () {
     // Aggregated cancer types
     const AGG_CANCER_TYPES = new Set(['All Cancers', 'Haemonc Cancers', 'Solid Cancers']);
 
-    // Initialise variant table.
+    // Number of variants (rows) matching all filters, consequences of
+    // all variants and their counts after applying all filters (returned
+    // by the server with each table page).
+    let variantCount = 0;
+    // Number of variants matching the search before the table filters
+    // are applied (null until the first table page is loaded).
+    let totalNotFiltered = null;
+    let allVarCsqs = [];
+    let varCsqCounts = {};
+
+    // Initialise variant table. Pagination, sorting and filtering are
+    // done on the server, which returns only the displayed page. Official
+    // bootstrap-table doc:
+    // https://bootstrap-table.com/docs/api/table-options/#sidepagination
     const $table = $('#table-variants');
     $table.bootstrapTable({
         ajax: ajaxRequest,
+        sidePagination: 'server',
+        queryParams: queryParams,
         detailView: true,
         detailFormatter: detailFormatter,
         method: 'get',
         // Populates extended row subtable on demand. Official bootstrap-table doc:
         // https://bootstrap-table.com/docs/api/events/#onexpandrow
         onExpandRow: function (index, row) {
-            // Get variant subtable ID and data url by variant db id.
+            // Get variant subtable by variant db id.
             let $subtable = $('#' + getVariantCancerTypesSubtableID(row.variant_id));
-            let url = `${context.variant_cancer_patient_counts_url}?variant_id=${row.variant_id}`;
-            
+
             // Load variant cancer type patient counts subtable data using async request.
-            $.get(url)
-                .done(function (res) {
-                    $subtable.bootstrapTable({
-                        data: res.rows,
-                        rowStyle: function (row, index) {
-                            if (AGG_CANCER_TYPES.has(row.cancer_type)) {
-                                return {
-                                    classes: 'fw-bold'  // Make aggregated cancer types bold
-                                };
-                            }
-                            return {};
-                        }
-                    })
-                    
-                    // Get all rows as array of objects.
-                    const data = $subtable.bootstrapTable('getData');
-                    // Get all visible columns.
-                    const columns = $subtable.bootstrapTable('getVisibleColumns');
-                    // Columns with no patients (zeroes) in all cancer types.
-                    const zeroColumns = [];
-                    // Columns to skip in zero-checks.
-                    const skipFields = ['cancer_type', 'category'];
-                    
-                    columns.forEach(column => {
-                        // Ignore non-numeric columns.
-                        if (skipFields.includes(column.field)) return;
-
-                        // Check if all values for this column are zero.
-                        const allZero = data.every(row => {
-                            const val = row[column.field];
-                            // Treat null/undefined as zero.
-                            return val === 0 || val === '0' || val === null || val === undefined;
-                        });
-                        // Add column to the list of columns that are going to be hidden.
-                        if (allZero) zeroColumns.push(column.field);
-                    });
-
-                    // Hide the zero columns.
-                    zeroColumns.forEach(field => {
-                        $subtable.bootstrapTable('hideColumn', field);                
-                    })
-                    // Show the subtable once it is fully ready.
-                    $subtable.removeAttr('hidden');
+            loadCancerTypePatientCounts(row.variant_id)
+                .done(function (rows) {
+                    renderCancerTypesSubtable($subtable, rows);
                 })
-            .fail(function (xhr, status, err) {
-                console.error('Failed to load cancer-type counts:', status || err);
-            });
+                .fail(function (xhr, status, err) {
+                    console.error('Failed to load cancer-type counts:', status || err);
+                });
         }
     })
 
 
+    // Variant cancer type patient counts subtable rows by variant db id,
+    // loaded for all rows of the displayed page at once (see
+    // loadCancerTypePatientCounts).
+    const cancerTypePatientCounts = new Map();
+    // Pending batched requests by variant db id.
+    const cancerTypePatientCountsRequests = new Map();
+    // Maximum number of variants per batched request (the "All" page
+    // size may display thousands of rows).
+    const CANCER_TYPE_PATIENT_COUNTS_BATCH_SIZE = 100;
+
+    /**
+     * Loads variant cancer type patient counts subtable rows. The first
+     * expanded row of a page loads the subtables of all rows of the
+     * page with one request, so expanding the other rows needs no
+     * requests.
+     *
+     * @param {number} - Variant db id
+     * @returns {Object} - jQuery promise of the subtable rows.
+     */
+    function loadCancerTypePatientCounts(variantID) {
+        if (cancerTypePatientCounts.has(variantID)) {
+            return $.Deferred().resolve(cancerTypePatientCounts.get(variantID)).promise();
+        }
+        if (!cancerTypePatientCountsRequests.has(variantID)) {
+            const pageIDs = $table.bootstrapTable('getData', { useCurrentPage: true })
+                .map(pageRow => pageRow.variant_id)
+                .filter(id => id !== variantID && !cancerTypePatientCounts.has(id) && !cancerTypePatientCountsRequests.has(id))
+                .slice(0, CANCER_TYPE_PATIENT_COUNTS_BATCH_SIZE - 1);
+            pageIDs.unshift(variantID);
+            const url = `${context.variants_cancer_patient_counts_url}?variant_ids=${pageIDs.join(',')}`;
+            const request = $.get(url).always(function () {
+                pageIDs.forEach(id => cancerTypePatientCountsRequests.delete(id));
+            });
+            pageIDs.forEach(id => {
+                cancerTypePatientCountsRequests.set(id, request.then(function (res) {
+                    const rows = res.variants[id] || [];
+                    cancerTypePatientCounts.set(id, rows);
+                    return rows;
+                }));
+            });
+        }
+        return cancerTypePatientCountsRequests.get(variantID);
+    }
+
+
+    /**
+     * Renders a variant cancer type patient counts subtable and hides
+     * its columns with no patients in all cancer types.
+     *
+     * @param {Object} - Subtable jQuery element
+     * @param {Array} - Subtable rows
+     * @returns {void}
+     */
+    function renderCancerTypesSubtable($subtable, rows) {
+        $subtable.bootstrapTable({
+            data: rows,
+            rowStyle: function (row, index) {
+                if (AGG_CANCER_TYPES.has(row.cancer_type)) {
+                    return {
+                        classes: 'fw-bold'  // Make aggregated cancer types bold
+                    };
+                }
+                return {};
+            }
+        })
+        
+        // Get all rows as array of objects.
+        const data = $subtable.bootstrapTable('getData');
+        // Get all visible columns.
+        const columns = $subtable.bootstrapTable('getVisibleColumns');
+        // Columns with no patients (zeroes) in all cancer types.
+        const zeroColumns = [];
+        // Columns to skip in zero-checks.
+        const skipFields = ['cancer_type', 'category'];
+        
+        columns.forEach(column => {
+            // Ignore non-numeric columns.
+            if (skipFields.includes(column.field)) return;
+
+            // Check if all values for this column are zero.
+            const allZero = data.every(row => {
+                const val = row[column.field];
+                // Treat null/undefined as zero.
+                return val === 0 || val === '0' || val === null || val === undefined;
+            });
+            // Add column to the list of columns that are going to be hidden.
+            if (allZero) zeroColumns.push(column.field);
+        });
+
+        // Hide the zero columns.
+        zeroColumns.forEach(field => {
+            $subtable.bootstrapTable('hideColumn', field);                
+        })
+        // Show the subtable once it is fully ready.
+        $subtable.removeAttr('hidden');
+    }
+
+
     // Clear all table filter controls.
     function clearFilters() {
-        // Clear filters.
-        $table.bootstrapTable('clearFilterControl');
         // Reset all filter checkboxes.
         $checkboxFilters.each(function() {
             // Use default checked values if specified, otherwise assume that default is checked.
             const defaultChecked = $(this).attr('default-checked')
             this.checked = (defaultChecked !== undefined) ? defaultChecked === "true" : true;
         });
+        // Clear filters.
+        $table.bootstrapTable('clearFilterControl');
         // Reload table data.
         filterTable()
-        // Update the displayed variant count.
-        updateVariantCount();
     };
 
     // Clear filters when user clicks on the button.
@@ -107,15 +177,57 @@ document.addEventListener('DOMContentLoaded', function () {
 
     // Update table variants (rows) count on the UI.
     function updateVariantCount() {
-        const currentCount = $table.bootstrapTable('getData').length;
-        $('#var-count-text').text(currentCount.toLocaleString());
+        $('#var-count-text').text(variantCount.toLocaleString());
     }
 
 
-    // Update table variants (rows) count after each table search.
-    $table.on('search.bs.table', function (e, text) {
-        updateVariantCount();
-    });
+    /**
+     * Adds the checkbox filters to the variant table ajax request params.
+     * Official bootstrap-table doc:
+     * https://bootstrap-table.com/docs/api/table-options/#queryparams
+     *
+     * @param {Object} - bootstrap-table request params (offset, limit,
+     *                   sort, order, search and filter controls values).
+     * @returns {Object} - Request params.
+     */
+    function queryParams(params) {
+        // Consequence and Allele type checkbox values are the same as 
+        // values in consequence_category and allele_type columns.
+        params.consequence_category = $csqFilters.filter(':checked').map(function() {
+            return $(this).val();
+        }).get().join(',');
+        params.allele_type = $alleleFilters.filter(':checked').map(function() {
+            return $(this).val();
+        }).get().join(',');
+        // Request dictionary-encoded columns instead of row objects.
+        params.format = 'columnar';
+        return params;
+    }
+
+
+    /**
+     * Rebuilds variant table rows from the columnar response format:
+     * one array per field, with repeated values replaced by indexes in
+     * per-field dictionaries.
+     *
+     * @param {Object} - Response with "columns" and "dictionaries".
+     * @returns {Array} - Row objects.
+     */
+    function decodeColumnarRows(res) {
+        const fields = Object.keys(res.columns);
+        const rowCount = fields.length > 0 ? res.columns[fields[0]].length : 0;
+        const rows = new Array(rowCount);
+        for (let i = 0; i < rowCount; i++) {
+            const row = {};
+            fields.forEach(field => {
+                const value = res.columns[field][i];
+                const dictionary = res.dictionaries[field];
+                row[field] = dictionary ? dictionary[value] : value;
+            });
+            rows[i] = row;
+        }
+        return rows;
+    }
 
 
     /**
@@ -127,34 +239,164 @@ document.addEventListener('DOMContentLoaded', function () {
      * @returns {void}
      */
     function ajaxRequest(params) {
-        // Ajax url and search value are obtained from the backend.
+        // bootstrap-table sends no limit if the "All" page size is selected.
+        if (params.data.limit === undefined) {
+            streamRequest(params);
+            return;
+        }
+        // Ajax url is obtained from the backend.
         let url = context.variants_data_url;
-        let search_value = context.search_value;
 
         // Add any additional bootstrap-table parameters to the ajax
         // request and load variant table data.
         const sep = url.includes('?') ? '&' : '?';
         $.get(url + sep + $.param(params.data))
             .done(function (res) {
-                params.success(res);
-                // If no variants were found for the provided search params,
-                // update the "Looking for variant data..." message.
-                if (res.total === 0) {
-                    $('#div-table-variants-no-data-message').text(`No variants were found for "${search_value}"`);
-                    if (res.error !== '') {
-                        console.log(`Failed to process the variant query: "${res.error}"`)
-                    }
-                } else {
-                    // Otherwise, hide the message, show the table, 
-                    // and update the displayed variants count.
-                    document.getElementById('div-table-variants').removeAttribute("hidden");
-                    document.getElementById('div-table-variants-no-data-message').setAttribute("hidden", "hidden");
-                    updateVariantCount();
+                if (res.columns) {
+                    res.rows = decodeColumnarRows(res);
                 }
+                variantCount = res.total;
+                totalNotFiltered = res.totalNotFiltered;
+                allVarCsqs = res.consequences || [];
+                varCsqCounts = res.consequence_counts || {};
+                params.success(res);
+                updateNoDataMessage(res.error);
             })
             .fail(function (xhr, status, err) {
-                console.error('Failed to load cancer-type counts:', xhr.status, status || err);
+                console.error('Failed to load variant data:', xhr.status, status || err);
+                params.error(xhr);
+                showLoadError((xhr.responseJSON && xhr.responseJSON.error) || `HTTP ${xhr.status}`);
+            });
+    }
+
+
+    /**
+     * Updates the "Looking for variant data..." message after the table
+     * data is loaded: shows "No variants were found" if the search
+     * matched no variants, otherwise hides the message, shows the table
+     * and updates the displayed variants count.
+     *
+     * @param {string} - Variant query error returned with the data.
+     * @returns {void}
+     */
+    function updateNoDataMessage(error) {
+        if (totalNotFiltered === 0) {
+            $('#div-table-variants-no-data-message').text(`No variants were found for "${context.search_value}"`);
+            if (error) {
+                console.log(`Failed to process the variant query: "${error}"`)
+            }
+        } else {
+            document.getElementById('div-table-variants').removeAttribute("hidden");
+            document.getElementById('div-table-variants-no-data-message').setAttribute("hidden", "hidden");
+            updateVariantCount();
+        }
+    }
+
+
+    /**
+     * Shows a variant data loading error in the "Looking for variant
+     * data..." message.
+     *
+     * @param {string} - Error message
+     * @returns {void}
+     */
+    function showLoadError(message) {
+        $('#div-table-variants-no-data-message')
+            .text(`Failed to load variant data: ${message}`)
+            .removeAttr('hidden');
+    }
+
+
+    // Number of streamed rows added to the table at a time (each addition
+    // re-renders the table).
+    const STREAM_RENDER_ROWS = 1000;
+
+    /**
+     * Loads all variant table rows as a newline-delimited JSON stream
+     * (used with the "All" page size). Rows are added to the table while
+     * they arrive, so the first rows are displayed before the last rows
+     * are sent.
+     *
+     * @param {Object} - An object with additional bootstrap-table ajax 
+     *                   request params (e.g. sort order).
+     * @returns {void}
+     */
+    async function streamRequest(params) {
+        const url = context.variants_stream_url;
+        const sep = url.includes('?') ? '&' : '?';
+        let loaded = false;
+        let buffer = '';
+        let rows = [];
+        let status = 0;
+        variantCount = 0;
+        varCsqCounts = {};
+
+        // Add parsed rows to the table (the first rows replace the table data).
+        function addRows() {
+            rows.forEach(row => {
+                varCsqCounts[row.consequence] = (varCsqCounts[row.consequence] || 0) + 1;
             });
+            variantCount += rows.length;
+            if (!loaded) {
+                loaded = true;
+                params.success({ rows: rows, total: rows.length,
+                                 totalNotFiltered: totalNotFiltered ?? rows.length });
+            } else if (rows.length > 0) {
+                $table.bootstrapTable('append', rows);
+                updateVariantCount();
+            }
+            rows = [];
+        }
+
+        try {
+            const response = await fetch(url + sep + $.param(params.data));
+            status = response.status;
+            if (!response.ok) {
+                // Invalid parameters are rejected with a JSON error.
+                const res = await response.json().catch(() => ({}));
+                throw new Error(res.error || `HTTP ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                // Keep the incomplete last line until the next chunk.
+                buffer = lines.pop();
+                lines.forEach(line => {
+                    if (!line) return;
+                    const row = JSON.parse(line);
+                    // A query error ends the stream with an error line.
+                    if (row.error !== undefined) {
+                        throw new Error(`Failed to process the variant query: "${row.error}"`);
+                    }
+                    rows.push(row);
+                });
+                if (rows.length >= STREAM_RENDER_ROWS) addRows();
+            }
+            addRows();
+            // Consequences of the variants of earlier table pages and
+            // of the streamed rows.
+            allVarCsqs = [...new Set([...allVarCsqs, ...Object.keys(varCsqCounts)])].sort();
+            if (totalNotFiltered === null) {
+                totalNotFiltered = variantCount;
+            }
+            updateNoDataMessage('');
+            updateTableSelectControls();
+        } catch (err) {
+            console.error('Failed to stream variant data:', err);
+            if (!loaded) {
+                params.error({ status: status, responseJSON: { error: err.message } });
+                showLoadError(err.message);
+            } else {
+                // Keep the rows that were added, but say that they are
+                // incomplete.
+                updateTableSelectControls();
+                showLoadError(`only the first ${variantCount.toLocaleString()} variants are shown (${err.message})`);
+            }
+        }
     }
 
 
@@ -193,189 +435,36 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
 
-    /**
-     * A custom filter for the HGVS columns. The default bootstrap table
-     * filter control process '>' as a comparison command for numeric values
-     * and does not work with HGVS nomenclature (e.g. ENST00000358273.4:c.1A>G)
-     * Official bootstrap-table doc:
-     * https://bootstrap-table.com/docs/api/table-options/#detailformatter
-     * 
-     * @param {text} - The search text.
-     * @param {value} - The value of the column to compare.
-     * @param {field} - The column field name.
-     * @param {data} - The table data.
-     * @returns {Boolean} - Return false to filter out the current column/row.
-     *                      Return true to not filter out the current column/row.
-     */
-    window.filterCustomTextSearch = function (text, value, field, data) {
-        if (!text) return true;
-        return String(value).toLowerCase().indexOf(String(text).toLowerCase()) !== -1;
-    }
-
-
-    /**
-     * Parses a position value into a { start, end } object.
-     * Accepts integers ("45"), ranges ("45-120"), or partial ranges where
-     * either bound is unknown ("45-?" or "?-4"). Unknown bounds collapse to
-     * the known bound, giving a point range (e.g. "45-?" → { start: 45, end: 45 },
-     * "?-4" → { start: 4, end: 4 }). Returns null for fully unknown/missing values.
-     *
-     * @param {*} val - Raw position value from the table cell.
-     * @returns {{ start: number, end: number } | null}
-     */
-    function parsePosition(val) {
-        if (val == null) return null;
-
-        const str = String(val).trim();
-
-        // Empty, unknown ("?"), bare dash, or null string → missing value
-        if (!str || str === '?' || str === '-' || str === 'null') return null;
-
-        if (str.includes('-')) {
-            const [rawStart, rawEnd] = str.split('-');
-
-            const startUnknown = rawStart === '?' || rawStart === '';
-            const endUnknown   = rawEnd   === '?' || rawEnd   === '';
-
-            const startNum = startUnknown ? null : Number(rawStart);
-            const endNum   = endUnknown   ? null : Number(rawEnd);
-
-            // Both bounds unknown → missing value
-            if (startUnknown && endUnknown) return null;
-
-            // Unparseable numeric bound → invalid, treat as missing
-            if (!startUnknown && Number.isNaN(startNum)) return null;
-            if (!endUnknown   && Number.isNaN(endNum))   return null;
-
-            // Collapse unknown bound to the known one (point range)
-            const start = startUnknown ? endNum   : startNum;
-            const end   = endUnknown   ? startNum : endNum;
-
-            return { start, end };
-        }
-
-        const num = Number(str);
-        if (Number.isNaN(num)) return null;
-        return { start: num, end: num };
-    }
-
-
-    /**
-     * A custom filter for numeric position columns. Supports four query formats:
-     *   ">N"      → values strictly greater than N
-     *   "<N"      → values strictly less than N
-     *   "A-B"     → range overlap (does the position span overlap [A, B]?)
-     *   "N"       → exact point-in-range (does the position span include N?)
-     *   other     → plain text fallback (string contains query?)
-     * Unknown/missing positions never match numeric queries.
-     * Used for both the Position (pos) and Protein position (protein_pos) columns.
-     *
-     * @param {string} text  - The search text entered by the user.
-     * @param {*}      value - The raw cell value to test.
-     * @returns {boolean} - true to show the row, false to hide it.
-     */
-
-    window.filterCustomRangeFieldSearch = function (text, value) {
-        if (!text) return true; // No active filter → always show
-
-        const pos = parsePosition(value);
-        const query = String(text).trim();
-
-        // >N: strictly greater than N (pos must extend past N)
-        if (query.startsWith('>')) {
-            const n = Number(query.slice(1).trim());
-            return !Number.isNaN(n) && !!pos && pos.end > n;
-        }
-
-        // <N: strictly less than N (pos must start before N)
-        if (query.startsWith('<')) {
-            const n = Number(query.slice(1).trim());
-            return !Number.isNaN(n) && !!pos && pos.start < n;
-        }
-
-        // Range query: check if [pos.start, pos.end] overlaps [start, end]
-        if (query.includes('-')) {
-            const queryPos = parsePosition(query);
-            if (queryPos) {
-                return !!pos && pos.start <= queryPos.end && pos.end >= queryPos.start;
-            }
-            // Non-numeric dashed query: use text fallback
-            return String(value ?? '').toLowerCase().includes(query.toLowerCase());
-        }
-
-        // Exact position: check if the number falls within the position's span
-        const exact = Number(query);
-        if (!Number.isNaN(exact)) {
-            return !!pos && pos.start <= exact && pos.end >= exact;
-        }
-
-        // Non-numeric query: plain string match against the raw value
-        return String(value ?? '').toLowerCase().includes(query.toLowerCase());
-    };
-
-
-    // Filter table based on selected variant categories and allele types.
+    // Reload the first table page with the selected variant categories
+    // and allele types (see queryParams).
     function filterTable() {
-        // Consequence and Allele type checkbox values are the same as 
-        // values in consequence_category and allele_type columns.
-        const selectedCsqFilters = $csqFilters.filter(':checked').map(function() {
-            return $(this).val();
-        }).get();
-        const selectedAlleleFilters = $alleleFilters.filter(':checked').map(function() {
-            return $(this).val();
-        }).get();
-        $table.bootstrapTable('filterBy', {
-            consequence_category: selectedCsqFilters,
-            allele_type: selectedAlleleFilters,
-        });
+        $table.bootstrapTable('refresh', { pageNumber: 1 });
     }
 
 
-    // Recalculate table and variant counts when checkbox filters change.
-    $checkboxFilters.on('change', function() {
-        filterTable();
-        updateVariantCount();
-    });
+    // Reload table data when checkbox filters change.
+    $checkboxFilters.on('change', filterTable);
 
 
     /**
-     * Bootstrap Table triggers multiple "post-header.bs.table" events during
-     * the initial load, both before and after "load-success.bs.table".
-     *
-     * The "Consequence" select lists all unfiltered options
-     * when filters are applied, so they may show options with
-     * no matching results.
+     * The "Consequence" select lists all consequences of the searched
+     * variants, so it may show options with no matching results.
      *
      * To improve usability, each option displays the count of matching variants
      * based on active filters (e.g., "Missense variant (1234)"). Counts are
-     * recalculated only after the table fully loads and when filters change.
+     * returned by the server with each table page.
      */
 
-    // Tracks whether the table has completed its first successful load
-    let tableInitialized = false
-    // Lists of all possible "Consequence" values (from unfiltered data)
-    let allVarCsqs = []
-    // Stores the last known filter set to detect when filters change
-    let currentFilters = null;
-
     
     /**
      * Updates a <select> control with option labels that include counts of
      * matching items (e.g., "Missense (1234)").
      * @param {HTMLSelectElement} selectElement - Target <select> element
      * @param {Array} allValues - All possible values for this field
-     * @param {Array} filteredData - Table data currently visible under active filters
-     * @param {String} property - Table property to count (e.g. "consequence")
+     * @param {Object} counts - Values (keys) and their counts under active filters (values)
      * @returns {void}
      */
-    function updateSelectWithCounts(selectElement, allValues, filteredData, property) {
-        // Count how many rows match each property value
-        const counts = filteredData.reduce((acc, row) => {
-            const key = row[property];
-            acc[key] = (acc[key] || 0) + 1;
-            return acc;
-        }, {});
-
+    function updateSelectWithCounts(selectElement, allValues, counts) {
         // Compute total number of matching rows
         const all_count = Object.values(counts).reduce((sum, val) => sum + val, 0);
 
@@ -398,83 +487,35 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
-    
-    /**
-     * Combines full and partial Bootstrap Table filters into one object.
-     * Partial filters override full filters when both exist.
-     */
-    function getCombinedFilters() {
-        const instance = $table.data('bootstrap.table');
-        if (!instance) return {};
-
-        const filters = instance.filterColumns || {};
-        const partialFilters = instance.filterColumnsPartial || {};
-
-        return { ...filters, ...partialFilters };
-    }
-
-    
-    // Compares two filter objects for equality by key and value.
-    function filtersEqual(a, b) {
-        const aKeys = Object.keys(a);
-        const bKeys = Object.keys(b);
-        if (aKeys.length !== bKeys.length) return false;
-        return aKeys.every(k => JSON.stringify(a[k]) === JSON.stringify(b[k]));
-    }
-
 
     /**
      * Refreshes the "Consequence" select controls
      * to reflect the number of matching variants for each option.
-     * Runs with a small delay to ensure filters and data are fully updated.
+     * Runs with a small delay to ensure the table header is fully rendered.
      */    
     function updateTableSelectControls() {
         setTimeout(function() {
-            let newFilters = getCombinedFilters();
-
-            // Skip update if filters haven't changed
-            if (currentFilters !== null && filtersEqual(newFilters, currentFilters)) {
-                return;
+            const csqSelect = $('select.bootstrap-table-filter-control-consequence')[0];
+            if (csqSelect) {
+                updateSelectWithCounts(csqSelect, allVarCsqs, varCsqCounts);
             }
-            currentFilters = newFilters
-
-            // Get filtered table data
-            const data = $table.bootstrapTable('getData', { useCurrentPage: false });
-
-            // Update both select controls with new counts
-            var csqSelect = $('select.bootstrap-table-filter-control-consequence')[0];
-            updateSelectWithCounts(csqSelect, allVarCsqs, data, 'consequence')
         }, 50);
     }
 
 
-    /**
-     * After table data loads successfully for the first time:
-     * - Mark table as initialized
-     * - Extract all unique "consequence" values
-     * - Initialize the select controls with counts
-     */
+    // Update the variant count and select controls after each table page load.
     $table.on('load-success.bs.table', function () {
-        // Get consequences and classes based on the table unfiltered data.
-        const data = $table.bootstrapTable('getData', { useCurrentPage: false });
-        allVarCsqs = [...new Set(data.map(row => row.consequence))].sort();
-
-        // Apply default table filters.
-        clearFilters()
-
-        setTimeout(function() {
-            tableInitialized = true;
-            updateTableSelectControls();
-        }, 1000); // Delay to ensure table is fully rendered
+        updateVariantCount();
+        updateTableSelectControls();
     });
 
 
     /**
      * When table headers are re-rendered (e.g., due to sort/filter changes),
-     * update select controls if the table has already finished initializing.
+     * filter-control rebuilds the select options from the current page,
+     * so the options with counts are restored.
      */
     $table.on('post-header.bs.table', function () {
-        if (!tableInitialized) return;
         updateTableSelectControls();
     });
 
@@ -491,6 +532,5 @@ document.addEventListener('DOMContentLoaded', function () {
 
         // Filter table.
         filterTable();
-        updateVariantCount();
     });
 });
\ No newline at end of file